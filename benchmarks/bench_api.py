@@ -0,0 +1,146 @@
+"""Prueba de carga de la API HTTP/JSON (``plas2.api``) servida con uvicorn.
+
+Crea una BD sintética, arranca ``python -m plas2 serve`` en un subproceso y
+lanza ``--clients`` clientes con conexiones keep-alive durante ``--seconds``
+segundos por escenario:
+
+- ``calc-cache``: ``GET /calc`` con un conjunto pequeño de entradas repetidas
+  (respuestas servidas desde la caché);
+- ``calc-nuevo``: ``GET /calc`` con entradas distintas en cada petición;
+- ``lote``: ``POST /calc/batch`` de una categoría con totales.
+
+Uso:
+    python benchmarks/bench_api.py [--machines 2000] [--clients 16] [--seconds 5] [--port 8765]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plas2 import schema # noqa: E402
+from plas2.db import connect # noqa: E402
+
+
+def create_db(path, n_machines):
+    conn = connect(path)
+    schema.migrate(conn)
+    rows = [(f"M{i:06d}", ("Manual", "Semi-Automática", "Automática")[i % 3], "", f"Cat {i % 20}",
+             "2025-04-27 12:10:02", None, 10, 30, 4, 15, 30, 10, 5, 60, 48, 45.3, 32, 27, 0.84375, None)
+            for i in range(n_machines)]
+    conn.execute("BEGIN")
+    conn.executemany(schema.INSERT_MACHINE_SQL, rows)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("El servidor no arrancó")
+
+
+def make_request(kind, rnd, n_machines):
+    if kind == "calc-cache":
+        return "GET", f"/calc?machine=M{rnd.randrange(50):06d}&turno_horas=8&cambios_rollo={rnd.randrange(3)}", None
+    if kind == "calc-nuevo":
+        return ("GET", f"/calc?machine=M{rnd.randrange(n_machines):06d}&turno_horas={rnd.randrange(4, 24)}"
+                       f"&cambios_rollo={rnd.randrange(20)}&cambios_producto={rnd.randrange(20)}", None)
+    body = {"categories": [f"Cat {rnd.randrange(20)}"], "scenario": {"turno_horas": 8, "cambios_rollo": rnd.randrange(3)},
+            "rollup": True}
+    return "POST", "/calc/batch", json.dumps(body)
+
+
+def run(kind, port, clients, seconds, n_machines):
+    counts = {"ok": 0, "errors": 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(seed):
+        rnd = random.Random(seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        ok = errors = 0
+        local_latencies = []
+        while time.perf_counter() < deadline:
+            method, path, body = make_request(kind, rnd, n_machines)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    ok += 1
+                else:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            local_latencies.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            counts["ok"] += ok
+            counts["errors"] += errors
+            latencies.extend(local_latencies)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "scenario": kind,
+        "clients": clients,
+        "requests_per_s": round(counts["ok"] / elapsed, 1),
+        "errors": counts["errors"],
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "api.db")
+        create_db(db_path, args.machines)
+        server = subprocess.Popen([sys.executable, "-m", "plas2", "--db", db_path, "serve", "--port", str(args.port)], cwd=ROOT)
+        try:
+            wait_for_port(args.port)
+            results = [run(kind, args.port, args.clients, args.seconds, args.machines)
+                       for kind in ("calc-cache", "calc-nuevo", "lote")]
+        finally:
+            server.terminate()
+            server.wait()
+    for r in results:
+        print(f"{r['scenario']:>10}: {r['clients']} clientes | peticiones/s {r['requests_per_s']:>8} | "
+              f"p50 {r['p50_ms']} ms | p95 {r['p95_ms']} ms | errores {r['errors']}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
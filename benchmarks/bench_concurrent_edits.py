@@ -0,0 +1,160 @@
+"""Prueba de carga de ediciones concurrentes: actualizaciones perdidas y coste de refresco.
+
+Varias sesiones (hilos, cada uno con su propio ``MachineRepository``, como
+procesos distintos) editan a la vez unas pocas máquinas: leen la máquina,
+esperan un tiempo de "edición" y guardan ``otros + 1``. Al final, ``otros``
+debe haber subido exactamente tantas veces como guardados se confirmaron:
+
+- ``optimista``: guardado con la versión leída; un conflicto se descarta y la
+  sesión vuelve a leer (lo que hace el formulario). No debe perder nada.
+- ``sin_version``: el guardado anterior, que sobrescribe por nombre.
+
+Después mide, para flotas de distinto tamaño, lo que cuesta a una sesión ver
+la edición de otra: refresco incremental (filas del registro de cambios)
+frente a recarga completa de la tabla.
+
+Uso:
+    python benchmarks/bench_concurrent_edits.py [--sessions 8] [--seconds 3] [--hot 4] [--sizes 1000,10000,100000]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import instrument, machines, schema # noqa: E402
+from plas2.db import connect, get_pool # noqa: E402
+from plas2.repository import MachineRepository # noqa: E402
+
+INITIAL_OTROS = 30
+
+
+def create_db(path, n_machines):
+    rnd = random.Random(0)
+    conn = connect(path)
+    schema.migrate(conn)
+    rows = [(f"M{i:06d}", "Manual", "", f"Cat {i % 20}", "2025-04-27 12:10:02", None,
+             10, INITIAL_OTROS, 4, 15, 30, 10, 5, 60, rnd.randint(20, 60), 45.3, 32, 27, 0.84375, None)
+            for i in range(n_machines)]
+    conn.execute("BEGIN")
+    conn.executemany(schema.INSERT_MACHINE_SQL, rows)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def edited(config):
+    setup = {**config["setup_params"], "otros": config["setup_params"]["otros"] + 1}
+    return {**config, "setup_params": setup, "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def lost_updates(path, mode, sessions, seconds, hot, think_ms):
+    """Lanza ``sessions`` editores sobre ``hot`` máquinas y compara guardados con incrementos."""
+    names = [f"M{i:06d}" for i in range(hot)]
+    with get_pool(path).read() as conn:
+        before = {name: otros for name, otros in conn.execute(
+            f"SELECT name, otros FROM machines WHERE name IN ({', '.join('?' for _ in names)})", names)}
+    saves, conflicts = [0] * sessions, [0] * sessions
+    repos = [MachineRepository(path) for _ in range(sessions)]
+    stop = threading.Event()
+
+    def editor(session):
+        rnd = random.Random(session)
+        repo = repos[session]
+        while not stop.is_set():
+            config = repo.get_all()[rnd.choice(names)]
+            time.sleep(rnd.random() * think_ms / 1000) # El planificador edita el formulario
+            expected = config["row_version"] if mode == "optimista" else None
+            try:
+                machines.update_machine(path, config["name"], edited(config), expected)
+                saves[session] += 1
+            except machines.StaleMachineError:
+                conflicts[session] += 1
+
+    threads = [threading.Thread(target=editor, args=(session,), daemon=True) for session in range(sessions)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    with get_pool(path).read() as conn:
+        after = dict(conn.execute(
+            f"SELECT name, otros FROM machines WHERE name IN ({', '.join('?' for _ in names)})", names))
+    applied = sum(after[name] - before[name] for name in names)
+    fresh = MachineRepository(path).get_all()
+    consistent = all(all(repo.get_all()[name] == fresh[name] for name in fresh) for repo in repos)
+    return {"saves": sum(saves), "applied": applied, "lost": sum(saves) - applied, "conflicts": sum(conflicts),
+            "full_loads": sum(repo.loads for repo in repos), "patches": sum(repo.patches for repo in repos),
+            "cache_consistente": consistent}
+
+
+def refresh_cost(path, n_machines, repeat):
+    """ms y filas leídas para que una sesión vea una edición ajena: incremental frente a completa."""
+    rnd = random.Random(n_machines)
+    repo = MachineRepository(path)
+    repo.get_all()
+    results = {}
+    for label in ("incremental", "completa"):
+        times, rows = [], []
+        for _ in range(repeat):
+            name = f"M{rnd.randrange(n_machines):06d}"
+            machines.update_machine(path, name, edited(repo.get_all()[name])) # Edición de otra sesión
+            if label == "completa":
+                repo.invalidate()
+            with instrument.recording("refresh") as recorder:
+                start = time.perf_counter()
+                repo.get_all()
+                times.append(time.perf_counter() - start)
+            rows.append(recorder.rows_read)
+        results[label] = {"median_ms": round(statistics.median(times) * 1000, 3), "rows_read": max(rows)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duración de cada modo de edición")
+    parser.add_argument("--hot", type=int, default=4, help="Máquinas que editan todas las sesiones")
+    parser.add_argument("--think-ms", type=float, default=5.0, help="Espera máxima entre leer y guardar")
+    parser.add_argument("--machines", type=int, default=1000, help="Tamaño de la flota en la prueba de ediciones")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Tamaños de flota para el coste de refresco")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {"sessions": args.sessions, "hot_machines": args.hot, "edits": {}, "refresh": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("optimista", "sin_version"):
+            path = os.path.join(tmp, f"ediciones_{mode}.db")
+            create_db(path, args.machines)
+            results["edits"][mode] = lost_updates(path, mode, args.sessions, args.seconds, args.hot, args.think_ms)
+            get_pool(path).close()
+        for size in (int(value) for value in args.sizes.split(",")):
+            path = os.path.join(tmp, f"flota_{size}.db")
+            create_db(path, size)
+            results["refresh"][size] = refresh_cost(path, size, args.repeat)
+            get_pool(path).close()
+
+    for mode, r in results["edits"].items():
+        print(f"{mode:>12}: {r['saves']:,} guardados, {r['applied']:,} aplicados, {r['lost']:,} perdidos, "
+              f"{r['conflicts']:,} conflictos | {r['patches']:,} refrescos incrementales, "
+              f"{r['full_loads']:,} completos | caché {'coherente' if r['cache_consistente'] else 'INCOHERENTE'}")
+    for size, r in results["refresh"].items():
+        inc, full = r["incremental"], r["completa"]
+        print(f"{size:>9,} máquinas: incremental {inc['median_ms']} ms ({inc['rows_read']} filas) | "
+              f"completa {full['median_ms']} ms ({full['rows_read']:,} filas)")
+    print(json.dumps(results))
+    optimistic = results["edits"]["optimista"]
+    if optimistic["lost"] or not optimistic["cache_consistente"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
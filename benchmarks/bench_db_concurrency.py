@@ -0,0 +1,129 @@
+"""Benchmark de throughput de lectura/escritura con varias sesiones concurrentes.
+
+Compara el acceso original (una conexión nueva por operación, journal por
+defecto) con el pool de ``plas2.db`` (WAL, pragmas, reintentos). Cada hilo
+simula la sesión de un planificador que mezcla lecturas y ediciones.
+
+Uso:
+    python benchmarks/bench_db_concurrency.py [--sessions 8] [--seconds 5] [--machines 2000] [--write-ratio 0.2]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2.db import ConnectionPool # noqa: E402
+
+SETUP = {"calibracion": 10, "otros": 30, "cambio_rollo": 4, "cambio_producto": 15,
+         "cambio_cuchillo": 30, "cambio_perforador": 10, "cambio_paquete": 5, "empaque": 60}
+PRODUCTION = {"unidades_por_minuto": 48, "peso_por_unidad": 45.3, "ciclo_total": 32,
+              "ciclo_productivo": 27, "ratio_productivo": 0.84375}
+
+READ_SQL = "SELECT * FROM machines WHERE category = ? ORDER BY name"
+WRITE_SQL = "UPDATE machines SET description = ?, updated_at = ? WHERE name = ?"
+
+
+def create_db(path, n_machines):
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE machines (name TEXT PRIMARY KEY, type TEXT NOT NULL, description TEXT,
+                    setup_params TEXT NOT NULL, production_params TEXT NOT NULL, created_at TEXT NOT NULL,
+                    updated_at TEXT, category TEXT DEFAULT 'General')""")
+    conn.executemany(
+        "INSERT INTO machines VALUES (?, 'Manual', '', ?, ?, '2025-04-27 12:10:02', NULL, ?)",
+        [(f"M{i:06d}", json.dumps(SETUP), json.dumps(PRODUCTION), f"Cat {i % 20}") for i in range(n_machines)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(path, category):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(READ_SQL, (category,)).fetchall()
+
+
+def legacy_write(path, name):
+    with sqlite3.connect(path) as conn:
+        conn.execute(WRITE_SQL, ("bench", time.strftime("%Y-%m-%d %H:%M:%S"), name))
+        conn.commit()
+
+
+def run(mode, path, sessions, seconds, n_machines, write_ratio):
+    pool = ConnectionPool(path, size=sessions) if mode == "pool" else None
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def session(seed):
+        rnd = random.Random(seed)
+        local = {"reads": 0, "writes": 0, "errors": 0}
+        while time.perf_counter() < deadline:
+            try:
+                if rnd.random() < write_ratio:
+                    name = f"M{rnd.randrange(n_machines):06d}"
+                    if pool:
+                        pool.run_write(lambda conn: conn.execute(WRITE_SQL, ("bench", time.strftime("%Y-%m-%d %H:%M:%S"), name)))
+                    else:
+                        legacy_write(path, name)
+                    local["writes"] += 1
+                else:
+                    category = f"Cat {rnd.randrange(20)}"
+                    if pool:
+                        with pool.read() as conn:
+                            conn.execute(READ_SQL, (category,)).fetchall()
+                    else:
+                        legacy_read(path, category)
+                    local["reads"] += 1
+            except sqlite3.OperationalError:
+                local["errors"] += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if pool:
+        pool.close()
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "reads_per_s": round(counts["reads"] / elapsed, 1),
+        "writes_per_s": round(counts["writes"] / elapsed, 1),
+        "lock_errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--machines", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for mode in ("legacy", "pool"):
+            path = os.path.join(tmp, f"{mode}.db")
+            create_db(path, args.machines)
+            results.append(run(mode, path, args.sessions, args.seconds, args.machines, args.write_ratio))
+    for r in results:
+        print(f"{r['mode']:>7}: {r['sessions']} sesiones | lecturas/s {r['reads_per_s']:>9} | "
+              f"escrituras/s {r['writes_per_s']:>8} | errores de bloqueo {r['lock_errors']}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
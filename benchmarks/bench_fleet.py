@@ -0,0 +1,150 @@
+"""Benchmark de la flota en memoria: dict de dicts frente a ``FleetTable`` columnar.
+
+Crea una BD sintética con ``--machines`` máquinas en ``--categories``
+categorías y compara la representación anterior (un dict por máquina con
+``setup_params``/``production_params`` anidados, agrupada por categoría en
+Python) con ``fleet.FleetTable``:
+
+- memoria retenida por la flota cargada (``tracemalloc``) y tiempo de carga;
+- agrupar por categoría, filtrar por texto, seleccionar una categoría, construir
+  el ``MachineBatch`` de toda la flota y el cálculo por lote completo.
+
+Uso:
+    python benchmarks/bench_fleet.py [--machines 100000] [--categories 50] [--repeat 5]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import batch, engine, schema # noqa: E402
+from plas2.db import connect # noqa: E402
+from plas2.fleet import load_fleet # noqa: E402
+
+SCENARIO = {"turno_horas": 8, "desayuno": True, "almuerzo": True, "cambios_rollo": 2, "cambios_producto": 1}
+
+
+def create_db(path, n_machines, n_categories):
+    rnd = random.Random(0)
+    conn = connect(path)
+    schema.migrate(conn)
+    rows = []
+    for i in range(n_machines):
+        machine_type = rnd.choice(("Manual", "Semi-Automática", "Automática"))
+        cycle = machine_type != "Automática"
+        rows.append((f"M{i:06d}", machine_type, f"Máquina sintética {i}", f"Cat {i % n_categories:02d}",
+                     "2025-04-27 12:10:02", None, rnd.randint(5, 20), rnd.randint(10, 40), rnd.randint(2, 8),
+                     rnd.randint(10, 30), 30 if cycle else None, 10 if cycle else None, 5 if cycle else None,
+                     60 if machine_type == "Manual" else None, rnd.randint(20, 60), round(rnd.uniform(10, 60), 1),
+                     32 if cycle else None, 27 if cycle else None, 0.84375 if cycle else None, None))
+    conn.execute("BEGIN")
+    conn.executemany(schema.INSERT_MACHINE_SQL, rows)
+    conn.execute("COMMIT")
+    return conn
+
+
+# --- Representación anterior (dict de dicts) ---
+
+def load_dicts(conn):
+    machines = {}
+    for row in conn.execute(schema.SELECT_MACHINES_SQL):
+        machine = schema.machine_from_row(row)
+        machines[machine["name"]] = machine
+    return machines
+
+
+def group_dicts(machines):
+    groups = {}
+    for name, machine in machines.items():
+        groups.setdefault(machine["category"], []).append(name)
+    return {category: tuple(sorted(groups[category])) for category in sorted(groups)}
+
+
+def filter_dicts(machines, groups, text):
+    matches = lambda m: any(text in (m.get(field) or "").lower() for field in ("name", "category", "description", "profile"))
+    return {category: found for category, names in groups.items()
+            if (found := [name for name in names if matches(machines[name])])}
+
+
+def load_old(conn):
+    machines = load_dicts(conn)
+    return machines, group_dicts(machines)
+
+
+def load_new(conn):
+    fleet, _ = load_fleet(conn)
+    fleet.by_category() # Como el repositorio: el índice de grupos se calcula al cargar
+    return fleet
+
+
+# --- Medición ---
+
+def retained(load):
+    """``(objeto, MB retenidos)`` de ``load()``, medido con tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    obj = load()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, round(current / 2**20, 1)
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - start) / repeat * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_db(os.path.join(tmp, "fleet.db"), args.machines, args.categories)
+        (dicts, groups), dict_mb = retained(lambda: load_old(conn))
+        fleet, fleet_mb = retained(lambda: load_new(conn))
+        dict_load_ms = timed(lambda: load_old(conn), 1)
+        fleet_load_ms = timed(lambda: load_new(conn), 1)
+        conn.close()
+
+    category = "Cat 07"
+    text = "máquina sintética 12"
+    names = groups[category]
+    fleet.matching(text) # El texto de búsqueda se prepara una vez por tabla, como en la app
+    ops = {
+        "agrupar": (lambda: group_dicts(dicts), lambda: fleet.by_category(fleet.category_mask(fleet.category_values))),
+        "filtrar": (lambda: filter_dicts(dicts, groups, text), lambda: fleet.by_category(fleet.matching(text))),
+        "seleccionar_categoria": (lambda: [dicts[name] for name in names],
+                                  lambda: fleet.take(fleet.category_rows(category))),
+        "lote_maquinas": (lambda: engine.MachineBatch.from_configs(dicts.values()), fleet.machine_batch),
+        "calculo_lote": (lambda: batch.compute_columns(dicts.values(), SCENARIO),
+                         lambda: batch.compute_columns(fleet, SCENARIO)),
+        "buscar_una": (lambda: dicts["M004242"], lambda: fleet["M004242"]),
+    }
+    results = {"machines": args.machines, "memory_mb": {"dicts": dict_mb, "fleet": fleet_mb},
+               "load_ms": {"dicts": dict_load_ms, "fleet": fleet_load_ms}, "ops_ms": {}}
+    print(f"{args.machines:,} máquinas: memoria {dict_mb} MB (dicts) -> {fleet_mb} MB (columnar); "
+          f"carga {dict_load_ms} ms -> {fleet_load_ms} ms")
+    for label, (old, new) in ops.items():
+        old_ms, new_ms = timed(old, args.repeat), timed(new, args.repeat)
+        results["ops_ms"][label] = {"dicts": old_ms, "fleet": new_ms}
+        print(f"{label:>22}: {old_ms:>10} ms (dicts) | {new_ms:>10} ms (columnar)")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark del historial de cálculos: registro por lotes y consultas de tendencia.
+
+Genera un año de historial sintético (``--machines`` máquinas en 20
+categorías, ``--runs-per-day`` lotes diarios) con ``history.record_batch`` y
+compara la tendencia diaria/semanal leída de ``calc_rollups`` con la misma
+agregación hecha sobre las filas de ``calc_history``.
+
+Uso:
+    python benchmarks/bench_history.py [--machines 200] [--runs-per-day 10] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import history, schema # noqa: E402
+from plas2.db import connect # noqa: E402
+
+SCENARIO = {"turno_horas": 8, "desayuno": True, "almuerzo": True, "cambios_rollo": 2}
+RAW_TREND_SQL = {
+    period: f"""
+        SELECT {start.format(col='calculated_at')} AS period_start, COUNT(*), SUM(unidades), AVG(unidades),
+               SUM(peso_kg), AVG(eficiencia), MIN(unidades), MAX(unidades), SUM(NOT valido)
+        FROM calc_history
+        WHERE {{scope}} = ? AND calculated_at BETWEEN ? AND ?
+        GROUP BY 1 ORDER BY 1
+    """
+    for period, start in schema.ROLLUP_PERIODS.items()
+}
+
+
+def populate(conn, n_machines, runs_per_day, days):
+    rng = np.random.default_rng(0)
+    names = np.array([f"M{i:05d}" for i in range(n_machines)], dtype=object)
+    categories = np.array([f"Cat {i % 20}" for i in range(n_machines)], dtype=object)
+    first_day = date.today() - timedelta(days=days)
+    for day in range(days):
+        day_str = (first_day + timedelta(days=day)).isoformat()
+        conn.execute("BEGIN")
+        for run in range(runs_per_day):
+            unidades = rng.uniform(8000, 16000, n_machines)
+            columns = {"name": names, "category": categories, "unidades": unidades, "peso_kg": unidades * 0.045,
+                       "eficiencia": rng.uniform(40, 70, n_machines), "tiempo_efectivo": unidades / 48,
+                       "tiempo_perdido": 480 - unidades / 48, "valido": np.ones(n_machines, dtype=bool)}
+            history.record_batch(conn, columns, SCENARIO, 1, calculated_at=f"{day_str} {8 + run % 12:02d}:00:00")
+        conn.execute("COMMIT")
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - start) / repeat * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--runs-per-day", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(os.path.join(tmp, "history.db"))
+        schema.migrate(conn)
+        start = time.perf_counter()
+        populate(conn, args.machines, args.runs_per_day, args.days)
+        n_rows = conn.execute("SELECT COUNT(*) FROM calc_history").fetchone()[0]
+        insert_s = time.perf_counter() - start
+        print(f"{n_rows:,} cálculos registrados en {insert_s:.1f} s ({n_rows / insert_s:,.0f} filas/s, con agregados)")
+
+        results = []
+        for scope, key in (("machine", "M00000"), ("category", "Cat 0")):
+            for period in schema.ROLLUP_PERIODS:
+                rollup_ms = timed(lambda: history.trend(conn, scope, key, period), args.repeat)
+                raw_sql = RAW_TREND_SQL[period].format(scope=scope)
+                raw_ms = timed(lambda: conn.execute(raw_sql, (key, "0000", "9999")).fetchall(), args.repeat)
+                results.append({"scope": scope, "period": period, "rollup_ms": rollup_ms, "raw_ms": raw_ms})
+        conn.close()
+    for r in results:
+        print(f"{r['scope']:>9} / {r['period']:<4}: agregados {r['rollup_ms']:>8} ms | filas crudas {r['raw_ms']:>9} ms")
+    print(json.dumps({"rows": n_rows, "insert_rows_per_s": round(n_rows / insert_s), "queries": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark de la simulación Monte Carlo (``plas2.montecarlo``) para una categoría sintética.
+
+Mide ``simulate`` para ``--machines`` máquinas × ``--trials`` turnos simulados,
+y para una sola máquina (la calculadora individual).
+
+Uso:
+    python benchmarks/bench_montecarlo.py [--machines 200] [--trials 10000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import montecarlo # noqa: E402
+from plas2.constants import SETUP_PARAM_KEYS # noqa: E402
+
+SCENARIO = {"turno_horas": 8, "desayuno": True, "almuerzo": True,
+            "cambios_rollo": 2, "cambios_producto": 1, "cambios_cuchillo": 1}
+
+
+def synthetic_configs(n_machines):
+    rnd = random.Random(0)
+    configs = []
+    for i in range(n_machines):
+        machine_type = rnd.choice(("Manual", "Semi-Automática", "Automática"))
+        configs.append({
+            "name": f"P{i:04d}",
+            "type": machine_type,
+            "setup_params": {key: rnd.randint(1, 20) for key in SETUP_PARAM_KEYS},
+            "production_params": {"unidades_por_minuto": rnd.randint(10, 80), "peso_por_unidad": rnd.uniform(5, 50),
+                                  "ratio_productivo": 1.0 if machine_type == "Automática" else rnd.uniform(0.6, 0.95)},
+        })
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--trials", type=int, default=10_000)
+    args = parser.parse_args()
+
+    configs = synthetic_configs(args.machines)
+    results = []
+    for mode, selection in (("categoria", configs), ("maquina", configs[:1])):
+        start = time.perf_counter()
+        sim = montecarlo.simulate(selection, SCENARIO, trials=args.trials, seed=0)
+        elapsed = time.perf_counter() - start
+        p10, p50, p90 = sim.total_percentiles("unidades")
+        results.append({"mode": mode, "machines": len(selection), "seconds": round(elapsed, 3),
+                        "total_p10": round(p10), "total_p50": round(p50), "total_p90": round(p90)})
+    for r in results:
+        print(f"{r['mode']:>9} ({r['machines']} máquinas): {r['seconds']:>7} s | "
+              f"unidades totales P10/P50/P90 {r['total_p10']:,} / {r['total_p50']:,} / {r['total_p90']:,}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
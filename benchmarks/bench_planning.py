@@ -0,0 +1,82 @@
+"""Benchmark de la planificación de capacidad (``plas2.planning``).
+
+Mide el cálculo completo de una flota sintética sobre un horizonte de días con
+un patrón semanal de dos turnos, festivos y planes de cambios, y el coste de
+los cambios incrementales (un día, una máquina, un mantenimiento) frente a
+recalcular todo.
+
+Uso:
+    python benchmarks/bench_planning.py [--machines 10000] [--days 182] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import planning # noqa: E402
+
+TYPES = ("Manual", "Semi-Automática", "Automática")
+
+
+def make_configs(n):
+    return [{
+        "name": f"M{i:05d}", "type": TYPES[i % 3], "category": f"Cat {i % 20}",
+        "setup_params": {"calibracion": 10 + i % 7, "otros": 30, "cambio_rollo": 4, "cambio_producto": 15,
+                         "cambio_cuchillo": 30, "cambio_perforador": 10, "cambio_paquete": 5, "empaque": 60},
+        "production_params": {"unidades_por_minuto": 40 + i % 20, "peso_por_unidad": 45.3, "ratio_productivo": 0.85},
+    } for i in range(n)]
+
+
+def make_calendar(start, days):
+    shift = {"turno_horas": 8, "desayuno": True, "almuerzo": True, "cambios_rollo": 2, "cambios_producto": 1}
+    pattern = {weekday: [shift, {**shift, "turno_horas": 7}] for weekday in range(5)}
+    pattern.update({5: [shift], 6: []})
+    holidays = {start + timedelta(days=d) for d in range(13, days, 45)}
+    overrides = {start + timedelta(days=d): planning.with_changeovers(pattern[(start + timedelta(days=d)).weekday()],
+                                                                      {"cambios_producto": 1 + d % 4})
+                 for d in range(2, days, 9)}
+    return planning.ShiftCalendar(start, days, pattern, holidays, overrides)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - start) / repeat * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=182)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    configs = make_configs(args.machines)
+    start = date(2025, 1, 6)
+    calendar = make_calendar(start, args.days)
+    plan = planning.CapacityPlan(configs, calendar)
+    day = start + timedelta(days=10)
+    edited = {**configs[5], "production_params": {**configs[5]["production_params"], "unidades_por_minuto": 99}}
+    results = {
+        "cells": args.machines * args.days,
+        "full_ms": timed(lambda: planning.CapacityPlan(configs, calendar), args.repeat),
+        "set_day_ms": timed(lambda: plan.set_day(day, planning.with_changeovers(calendar.shifts_for(day), {"cambios_rollo": 5})), args.repeat),
+        "set_machine_ms": timed(lambda: plan.set_machine(edited), args.repeat),
+        "set_maintenance_ms": timed(lambda: plan.set_maintenance("M00007", day, 120), args.repeat),
+        "apply_calendar_noop_ms": timed(lambda: plan.apply_calendar(calendar), args.repeat),
+        "table_week_category_ms": timed(lambda: plan.table("week", "category"), args.repeat),
+        "table_month_machine_ms": timed(lambda: plan.table("month", "machine"), args.repeat),
+    }
+    for key, value in results.items():
+        print(f"{key:>24}: {value:,}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
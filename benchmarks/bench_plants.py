@@ -0,0 +1,122 @@
+"""Benchmark de plantas en BD separadas frente a una única BD compartida.
+
+Crea ``--plants`` plantas de ``--machines`` máquinas y mide:
+
+- aislamiento: latencia de las ediciones de la planta 0 mientras cada una de
+  las demás plantas escribe sin pausa, con una BD por planta y con todas las
+  plantas en la misma BD (el esquema anterior, un solo bloqueo de escritura);
+- informe de flota: ``plants.fleet_report`` (plantas en paralelo) frente a
+  consultarlas una tras otra.
+
+Uso:
+    python benchmarks/bench_plants.py [--plants 8] [--machines 5000] [--seconds 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import plants, queries, schema # noqa: E402
+from plas2.db import connect, get_pool # noqa: E402
+
+UPDATE_SQL = "UPDATE machines SET description = ?, updated_at = ? WHERE name = ?"
+
+
+def create_db(path, plant_ids, n_machines):
+    rnd = random.Random(0)
+    conn = connect(path)
+    schema.migrate(conn)
+    rows = []
+    for plant in plant_ids:
+        for i in range(n_machines):
+            rows.append((f"P{plant}-M{i:05d}", "Manual", "", f"Cat {i % 20}", "2025-04-27 12:10:02", None,
+                         10, 30, 4, 15, 30, 10, 5, 60, rnd.randint(20, 60), 45.3, 32, 27, 0.84375, None))
+    conn.execute("BEGIN")
+    conn.executemany(schema.INSERT_MACHINE_SQL, rows)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def edit(path, name):
+    get_pool(path).run_write(lambda conn: conn.execute(UPDATE_SQL, ("bench", time.strftime("%H:%M:%S"), name)))
+
+
+def isolation(paths, n_machines, seconds):
+    """Latencias (ms) de editar la planta 0 con las demás escribiendo; ``paths[p]`` es la BD de la planta p."""
+    stop = threading.Event()
+
+    def writer(plant):
+        rnd = random.Random(plant)
+        while not stop.is_set():
+            edit(paths[plant], f"P{plant}-M{rnd.randrange(n_machines):05d}")
+
+    threads = [threading.Thread(target=writer, args=(plant,), daemon=True) for plant in range(1, len(paths))]
+    for t in threads:
+        t.start()
+    rnd = random.Random(0)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        edit(paths[0], f"P0-M{rnd.randrange(n_machines):05d}")
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.002)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 2)
+    return {"edits": len(latencies), "p50_ms": pick(0.5), "p99_ms": pick(0.99), "max_ms": pick(1.0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plants", type=int, default=8)
+    parser.add_argument("--machines", type=int, default=5000, help="Máquinas por planta")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sharded = {f"Planta {p}": os.path.join(tmp, f"planta_{p}.db") for p in range(args.plants)}
+        for p, path in enumerate(sharded.values()):
+            create_db(path, [p], args.machines)
+        shared = os.path.join(tmp, "compartida.db")
+        create_db(shared, range(args.plants), args.machines)
+
+        results = {"plants": args.plants, "machines_per_plant": args.machines, "isolation": {
+            "una_bd_por_planta": isolation(list(sharded.values()), args.machines, args.seconds),
+            "bd_compartida": isolation([shared] * args.plants, args.machines, args.seconds),
+        }}
+
+        def serial():
+            for path in sharded.values():
+                with get_pool(path).read() as conn:
+                    queries.fleet_capacity(conn)
+
+        report = {}
+        for label, fn in (("secuencial", serial), ("paralelo", lambda: plants.fleet_report(sharded))):
+            fn()
+            start = time.perf_counter()
+            for _ in range(5):
+                fn()
+            report[label] = round((time.perf_counter() - start) / 5 * 1000, 2)
+        results["fleet_report_ms"] = report
+        for path in [*sharded.values(), shared]:
+            get_pool(path).close()
+
+    for label, r in results["isolation"].items():
+        print(f"{label:>18}: {r['edits']:,} ediciones en la planta 0 | p50 {r['p50_ms']} ms, p99 {r['p99_ms']} ms, "
+              f"máx {r['max_ms']} ms")
+    print(f"informe de flota: {report['secuencial']} ms (secuencial) -> {report['paralelo']} ms (paralelo)")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
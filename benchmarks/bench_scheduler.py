@@ -0,0 +1,80 @@
+"""Benchmark del programador de pedidos (``plas2.scheduler``).
+
+Genera ``--orders`` pedidos sintéticos (``--products`` productos, 70 % en
+unidades y 30 % en kg, entregas repartidas en ``--days`` días) para una flota
+de ``--machines`` máquinas (con los valores por defecto, carga ~80 %) y
+compara la construcción voraz con el resultado tras la búsqueda local para
+cada presupuesto de tiempo.
+
+Uso:
+    python benchmarks/bench_scheduler.py [--machines 200] [--orders 3000] [--budgets 1 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import scheduler # noqa: E402
+
+TYPES = ("Manual", "Semi-Automática", "Automática")
+DAY_SHIFTS = [{"turno_horas": 8, "desayuno": True, "almuerzo": True}] * 2
+
+
+def make_configs(n):
+    return [{
+        "name": f"M{i:04d}", "type": TYPES[i % 3], "category": "Cat",
+        "setup_params": {"calibracion": 10, "otros": 30, "cambio_producto": 15 + (i % 5) * 5},
+        "production_params": {"unidades_por_minuto": 40 + i % 20, "peso_por_unidad": 45.3, "ratio_productivo": 0.85},
+    } for i in range(n)]
+
+
+def make_orders(n, products, days, start):
+    rnd = random.Random(1)
+    orders = []
+    for i in range(n):
+        in_kg = rnd.random() < 0.3
+        quantity = rnd.choice([100, 300, 800]) if in_kg else rnd.choice([2000, 8000, 20000])
+        orders.append(scheduler.Order(f"P{i:05d}", f"prod{rnd.randrange(products)}", quantity, "kg" if in_kg else "uds",
+                                      start + timedelta(days=rnd.uniform(0.5, days))))
+    return orders
+
+
+def summary(schedule, seconds):
+    return {"seconds": round(seconds, 2), "cost": round(schedule.cost), "changeover_min": round(schedule.changeover_min),
+            "lateness_h": round(schedule.lateness_min / 60, 1), "late_orders": schedule.late_orders,
+            "iterations": schedule.iterations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=3000)
+    parser.add_argument("--products", type=int, default=40)
+    parser.add_argument("--days", type=float, default=6)
+    parser.add_argument("--budgets", type=float, nargs="+", default=[1, 5])
+    args = parser.parse_args()
+
+    start = datetime(2025, 1, 6)
+    configs = make_configs(args.machines)
+    orders = make_orders(args.orders, args.products, args.days, start)
+    results = {}
+    began = time.perf_counter()
+    results["voraz"] = summary(scheduler.schedule(configs, orders, start, DAY_SHIFTS, time_budget=0), time.perf_counter() - began)
+    for budget in args.budgets:
+        began = time.perf_counter()
+        result = scheduler.schedule(configs, orders, start, DAY_SHIFTS, time_budget=budget)
+        results[f"{budget:g}s"] = summary(result, time.perf_counter() - began)
+    for name, r in results.items():
+        print(f"{name:>6}: {r['seconds']:>6} s | coste {r['cost']:>12,} | cambios {r['changeover_min']:>8,} min | "
+              f"retraso {r['lateness_h']:>9,} h ({r['late_orders']} pedidos) | iteraciones {r['iterations']:,}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
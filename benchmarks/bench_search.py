@@ -0,0 +1,79 @@
+"""Benchmark de latencia de la búsqueda incremental (``plas2.search``) sobre una flota sintética.
+
+Crea una base migrada con ``--machines`` máquinas y mide, para cada consulta
+típica de un selector con búsqueda mientras se escribe, la mediana y el p95
+de ``search_machines`` con el límite por defecto.
+
+Uso:
+    python benchmarks/bench_search.py [--machines 100000] [--repeat 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plas2 import schema, search # noqa: E402
+from plas2.db import connect # noqa: E402
+
+CATEGORIES = ("Línea {}", "Prensas Hidráulicas {}", "Extrusión {}", "Envasado {}", "Bolsas {}")
+WORDS = ("prensa", "hidráulica", "extrusora", "selladora", "bobinadora", "perforadora", "turno", "noche", "planta", "nueva")
+QUERIES = ("p", "p0", "p0001", "p012345", "lin", "línea 4", "hidraul", "hidraulicas", "prensa hidr",
+           "extrusion 3", "zzz", "selladora noche", "p0 linea", "prensa zz", "x linea") # Las tres últimas, entre campos
+
+
+def create_db(path, n_machines):
+    conn = connect(path)
+    schema.migrate(conn)
+    rnd = random.Random(0)
+    rows = []
+    for i in range(n_machines):
+        category = rnd.choice(CATEGORIES).format(rnd.randrange(50))
+        description = " ".join(rnd.sample(WORDS, 3))
+        rows.append((f"P{i:06d}", rnd.choice(("Manual", "Semi-Automática", "Automática")), description, category,
+                     "2025-04-27 12:10:02", None, 10, 30, 4, 15, 30, 10, 5, 60, 48, 45.3, 32, 27, 0.84375, None))
+    conn.execute("BEGIN")
+    conn.executemany(schema.INSERT_MACHINE_SQL, rows)
+    conn.execute("COMMIT")
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        conn = create_db(os.path.join(tmp, "search.db"), args.machines)
+        print(f"{args.machines} máquinas creadas e indexadas en {time.perf_counter() - start:.1f} s")
+        results = []
+        for query in QUERIES:
+            search.search_machines(conn, query) # Calentar caché de páginas
+            timings = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                found = search.search_machines(conn, query)
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            results.append({
+                "query": query,
+                "results": len(found),
+                "median_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+            })
+        conn.close()
+    for r in results:
+        print(f"{r['query']!r:>18}: {r['results']:>3} resultados | mediana {r['median_ms']:>7} ms | p95 {r['p95_ms']:>7} ms")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Suite de benchmarks reproducible: capa de BD, cálculo del turno y render HTML.
+
+Para cada tamaño de ``--sizes`` genera una tabla ``machines`` sintética con el
+formato original (parámetros JSON), modelada sobre las filas de
+``--template`` (por defecto ``production_data_v3.db``): mismos parámetros, con
+variaciones de ±20 %, los tres tipos de máquina y ``--categories`` categorías.
+Con semilla fija, dos ejecuciones generan exactamente las mismas tablas.
+
+Mide (mediana de ``--repeat`` repeticiones, en ms):
+
+- ``init_db``: migrar la tabla original al esquema actual (``init_db_migrar``)
+  y la llamada sin migraciones pendientes (``init_db_al_dia``);
+- ``get_all_machines_db``: carga completa (``get_all_frio``) y consulta con la
+  caché del repositorio al día (``get_all_caliente``);
+- ``add``/``update``/``delete`` de una máquina (media de ``--ops`` operaciones);
+- el cálculo del turno por lote de toda la flota (``calculo_lote``);
+
+y, una sola vez, el cálculo de una máquina (``compute_single``),
+``render_analysis_table``/``render_interruptions_table`` (``plas2/render.py``) y el
+render de 2.000 tarjetas de máquina con la caché caliente y vacía.
+
+El resultado se escribe como JSON (``--output``). Con ``--baseline`` se compara
+con un resultado guardado: las mediciones más lentas que la base en más de
+``--tolerance`` (y de ``--min-ms``) se listan como regresiones y el script
+termina con código 1.
+
+Uso:
+    python benchmarks/bench_suite.py [--sizes 100,1000,10000,100000] [--repeat 5] [--output actual.json] [--baseline base.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plas2 import batch, engine, machines, render # noqa: E402
+from plas2.constants import MACHINE_TYPES # noqa: E402
+from plas2.db import get_pool # noqa: E402
+from plas2.repository import MachineRepository # noqa: E402
+from plas2.schema import SELECT_MACHINES_SQL, machine_from_row # noqa: E402
+
+SCENARIO = {"turno_horas": 8, "desayuno": True, "almuerzo": True, "cambios_rollo": 2, "cambios_producto": 1,
+            "cambios_cuchillo": 1, "cambios_perforador": 0, "cambios_paquete": 1, "cambios_empaque": 2}
+TEMPLATE = { # Fila de production_data_v3.db, por si no se encuentra la BD
+    "type": "Manual",
+    "setup_params": {"calibracion": 10, "otros": 30, "cambio_rollo": 4, "cambio_producto": 15, "cambio_cuchillo": 30,
+                     "cambio_perforador": 10, "cambio_paquete": 5, "empaque": 60},
+    "production_params": {"unidades_por_minuto": 48, "peso_por_unidad": 45.3, "ciclo_total": 32,
+                          "ciclo_productivo": 27, "ratio_productivo": 0.84375},
+}
+CARD_PAGE = 2000 # Tarjetas de máquina por "página" en la medición del render
+CYCLE_SETUP = ("cambio_cuchillo", "cambio_perforador", "cambio_paquete")
+LEGACY_TABLE_SQL = """
+    CREATE TABLE machines (name TEXT PRIMARY KEY, type TEXT NOT NULL, description TEXT, setup_params TEXT NOT NULL,
+                           production_params TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT,
+                           category TEXT DEFAULT 'General')
+"""
+
+
+# --- Datos sintéticos ---
+
+def load_templates(path):
+    """Configuraciones de las máquinas de ``path`` (formato JSON original o esquema actual)."""
+    if not path or not os.path.exists(path):
+        return [TEMPLATE]
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(machines)")]
+        if "setup_params" in columns:
+            rows = conn.execute("SELECT type, setup_params, production_params FROM machines").fetchall()
+            templates = [{"type": t, "setup_params": json.loads(s), "production_params": json.loads(p)}
+                         for t, s, p in rows]
+        else:
+            templates = [machine_from_row(row) for row in conn.execute(SELECT_MACHINES_SQL)]
+    except (sqlite3.Error, ValueError):
+        templates = []
+    finally:
+        conn.close()
+    return templates or [TEMPLATE]
+
+
+def as_type(template, machine_type):
+    """Adapta los parámetros de ``template`` a ``machine_type`` como lo hace el formulario de la app."""
+    setup = dict(template["setup_params"])
+    production = dict(template["production_params"])
+    if machine_type != "Manual":
+        setup.pop("empaque", None)
+    if machine_type == "Automática":
+        for key in CYCLE_SETUP:
+            setup.pop(key, None)
+        production.update(ciclo_total=0, ciclo_productivo=0, ratio_productivo=1.0)
+    return setup, production
+
+
+def jitter(params, rnd):
+    """Varía cada parámetro ±20 %, conservando enteros como enteros."""
+    varied = {}
+    for key, value in params.items():
+        if key == "ratio_productivo" or not value:
+            varied[key] = value
+        elif isinstance(value, int):
+            varied[key] = max(1, round(value * rnd.uniform(0.8, 1.2)))
+        else:
+            varied[key] = round(value * rnd.uniform(0.8, 1.2), 2)
+    if varied.get("ciclo_total"):
+        varied["ciclo_productivo"] = min(varied["ciclo_productivo"], varied["ciclo_total"])
+        varied["ratio_productivo"] = varied["ciclo_productivo"] / varied["ciclo_total"]
+    return varied
+
+
+def synthetic_rows(n, n_categories, templates, seed=0):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        machine_type = MACHINE_TYPES[rnd.randrange(len(MACHINE_TYPES))]
+        setup, production = as_type(templates[i % len(templates)], machine_type)
+        rows.append((f"M{i:06d}", machine_type, f"Máquina sintética {i}", json.dumps(jitter(setup, rnd)),
+                     json.dumps(jitter(production, rnd)), "2025-04-27 12:10:02", None, f"Cat {i % n_categories:03d}"))
+    return rows
+
+
+def create_legacy_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_TABLE_SQL)
+    conn.executemany("INSERT INTO machines VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+# --- Medición ---
+
+def median_ms(fn, repeat, setup=None):
+    """Mediana en ms de ``fn(setup())`` (o ``fn()``); ``setup`` no se cronometra."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 3)
+
+
+def per_call_ms(fn, calls, repeat):
+    """Mediana en ms por llamada de ``calls`` llamadas seguidas de ``fn(i)``."""
+    def run():
+        for i in range(calls):
+            fn(i)
+    return round(median_ms(run, repeat) / calls, 4)
+
+
+def bench_size(n, args, templates, tmp):
+    legacy = os.path.join(tmp, f"legacy_{n}.db")
+    create_legacy_db(legacy, synthetic_rows(n, args.categories, templates))
+    copies = itertools.count()
+
+    def fresh_copy():
+        path = os.path.join(tmp, f"migrate_{n}_{next(copies)}.db")
+        shutil.copy(legacy, path)
+        return path
+
+    def migrate(path):
+        machines.init_db(path)
+        get_pool(path).close()
+
+    results = {"init_db_migrar": median_ms(migrate, args.repeat, setup=fresh_copy)}
+    db_path = fresh_copy()
+    machines.init_db(db_path)
+    results["init_db_al_dia"] = median_ms(lambda: machines.init_db(db_path), args.repeat)
+    results["get_all_frio"] = median_ms(lambda: MachineRepository(db_path).get_all(), args.repeat)
+    repo = MachineRepository(db_path)
+    fleet = repo.get_all()
+    results["get_all_caliente"] = median_ms(repo.get_all, args.repeat)
+
+    config = fleet[fleet.names[0]]
+    round_no = [0]
+    name = lambda i: f"BENCH-{round_no[0]}-{i}"
+
+    def add(i):
+        machines.add_machine(db_path, {**config, "name": name(i)})
+
+    def update(i):
+        machines.update_machine(db_path, name(i), {**config, "name": name(i), "description": f"editada {i}"})
+
+    def delete(i):
+        machines.delete_machine(db_path, name(i))
+
+    results.update(add_machine=[], update_machine=[], delete_machine=[])
+    for round_no[0] in range(args.repeat): # Cada ronda añade, edita y borra sus propias máquinas
+        for label, fn in (("add_machine", add), ("update_machine", update), ("delete_machine", delete)):
+            results[label].append(per_call_ms(fn, args.ops, 1))
+    for label in ("add_machine", "update_machine", "delete_machine"):
+        results[label] = statistics.median(results[label])
+
+    fleet = repo.get_all()
+    results["calculo_lote"] = median_ms(lambda: batch.compute_columns(fleet, SCENARIO), args.repeat)
+    get_pool(db_path).close()
+    return results
+
+
+def bench_common(args, templates):
+    """Cálculo de una máquina y render HTML: no dependen del tamaño de la flota."""
+    setup, production = as_type(templates[0], "Manual")
+    config = {"name": "M", "type": "Manual", "setup_params": setup, "production_params": production}
+    resultado = engine.compute_single(config, SCENARIO)
+    interrupciones = {"Calibración Fija": setup.get("calibracion", 0), "Otros Fijos": setup.get("otros", 0),
+                      "Comidas": resultado["tiempo_comidas"], **resultado["detalle_interrupciones"]}
+    calls = args.calls
+    cards = [{"name": f"M{i:06d}", "type": MACHINE_TYPES[i % len(MACHINE_TYPES)], "category": f"Cat {i % 50:03d}",
+              "description": f"Máquina sintética {i}", "created_at": "2025-04-27 12:10:02", "updated_at": None}
+             for i in range(CARD_PAGE)]
+    render_page = lambda *_: [render.render_machine_card(card) for card in cards]
+    render_page() # Caché caliente, como en los reruns de la página de configuración
+    # Las tablas se miden sin su LRU (``__wrapped__``): con los mismos argumentos sólo se medirían aciertos
+    analysis_table = render.render_analysis_table.__wrapped__
+    interruptions_table = render.interruptions_table_html.__wrapped__
+    interruption_items = tuple(interrupciones.items())
+    return {
+        "compute_single": per_call_ms(lambda i: engine.compute_single(config, SCENARIO), calls, args.repeat),
+        "render_analysis_table": per_call_ms(
+            lambda i: analysis_table(resultado["turno_minutos"], resultado["tiempo_efectivo"],
+                                     resultado["tiempo_perdido"], resultado["eficiencia"]),
+            calls, args.repeat),
+        "render_interruptions_table": per_call_ms(
+            lambda i: interruptions_table(interruption_items, resultado["turno_minutos"]), calls, args.repeat),
+        "tarjetas_pagina": median_ms(render_page, args.repeat),
+        "tarjetas_pagina_sin_cache": median_ms(render_page, args.repeat, setup=render.machine_card_html.cache_clear),
+    }
+
+
+# --- Comparación con la base ---
+
+def flatten(results):
+    return {f"{group}/{label}": value for group, values in results.items() for label, value in values.items()}
+
+
+def compare(current, baseline, tolerance, min_ms):
+    """Filas ``(medición, base, actual, ratio, regresión)`` de las mediciones presentes en ambos."""
+    now, base = flatten(current["results"]), flatten(baseline["results"])
+    rows = []
+    for key in now.keys() & base.keys():
+        ratio = now[key] / base[key] if base[key] else float("inf")
+        regression = now[key] > base[key] * (1 + tolerance) and now[key] - base[key] > min_ms
+        rows.append((key, base[key], now[key], round(ratio, 3), regression))
+    return sorted(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="Tamaños de flota separados por comas")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ops", type=int, default=50, help="Altas/ediciones/bajas por repetición")
+    parser.add_argument("--calls", type=int, default=2000, help="Llamadas por repetición en las mediciones comunes")
+    parser.add_argument("--template", default=os.path.join(ROOT, "production_data_v3.db"))
+    parser.add_argument("--output", help="Fichero JSON donde guardar el resultado (p. ej. la nueva base)")
+    parser.add_argument("--baseline", help="Resultado guardado con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Margen relativo antes de marcar regresión")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="Diferencia absoluta mínima para marcar regresión")
+    args = parser.parse_args()
+
+    templates = load_templates(args.template)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    current = {
+        "meta": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform(),
+                 "sizes": sizes, "repeat": args.repeat, "templates": len(templates),
+                 "created_at": time.strftime("%Y-%m-%d %H:%M:%S")},
+        "results": {"comun": bench_common(args, templates)},
+    }
+    print(" ".join(f"{label}={ms} ms" for label, ms in current["results"]["comun"].items()))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            current["results"][str(n)] = bench_size(n, args, templates, tmp)
+            print(f"{n:>7,}: " + " ".join(f"{label}={ms}" for label, ms in current["results"][str(n)].items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=1)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(current, json.load(f), args.tolerance, args.min_ms)
+        for key, base, now, ratio, regression in rows:
+            print(f"{'REGRESIÓN ' if regression else '':>10}{key:>35}: {base:>10} -> {now:>10} ms (x{ratio})")
+        regressions = [row[0] for row in rows if row[4]]
+        current["regressions"] = regressions
+    print(json.dumps(current))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
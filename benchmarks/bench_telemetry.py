@@ -0,0 +1,191 @@
+"""Benchmark de la ingesta de telemetría (``python -m plas2 ingest``).
+
+Crea una BD sintética y mide dos modos, cada uno con el ingestor en un
+subproceso (como en producción, separado de la aplicación):
+
+- ``socket``: ``--clients`` simuladores envían eventos JSONL por TCP a
+  ``--rate`` eventos/s en total durante ``--seconds`` segundos;
+- ``directorio``: ``--file-events`` eventos escritos en un CSV que
+  ``ingest --dir --once`` procesa desde cero.
+
+Mientras tanto un hilo lector consulta los agregados reales de una máquina
+(la lectura que hace la calculadora) y se informa su latencia, para comprobar
+que las escrituras por lotes no bloquean las lecturas.
+
+Uso:
+    python benchmarks/bench_telemetry.py [--machines 500] [--clients 4] [--rate 20000] [--seconds 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plas2 import schema, telemetry # noqa: E402
+from plas2.db import connect # noqa: E402
+
+
+def create_db(path, n_machines):
+    conn = connect(path)
+    schema.migrate(conn)
+    rows = [(f"M{i:05d}", "Automática", "", f"Cat {i % 20}", "2025-04-27 12:10:02", None,
+             10, 30, 4, 15, 30, 10, 5, 60, 48, 45.3, 32, 27, 0.84375, None) for i in range(n_machines)]
+    conn.execute("BEGIN")
+    conn.executemany(schema.INSERT_MACHINE_SQL, rows)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def event(rnd, n_machines, when):
+    machine = f"M{rnd.randrange(n_machines):05d}"
+    if rnd.random() < 0.05:
+        return {"machine": machine, "event_at": when, "kind": "parada", "minutos": round(rnd.uniform(1, 30), 1)}
+    return {"machine": machine, "event_at": when, "kind": "produccion", "unidades": rnd.randrange(20, 60)}
+
+
+def count_events(db_path):
+    conn = connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM production_events").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class Reader(threading.Thread):
+    """Consulta los agregados de una máquina en bucle y guarda las latencias."""
+
+    def __init__(self, db_path):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.stop = threading.Event()
+        self.latencies = []
+
+    def run(self):
+        conn = connect(self.db_path)
+        while not self.stop.is_set():
+            start = time.perf_counter()
+            telemetry.actuals(conn, "M00000")
+            self.latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+        conn.close()
+
+    def summary(self):
+        lat = sorted(self.latencies)
+        pick = lambda q: round(lat[min(len(lat) - 1, int(len(lat) * q))] * 1000, 2) if lat else None
+        return {"reads": len(lat), "read_p50_ms": pick(0.5), "read_p99_ms": pick(0.99), "read_max_ms": pick(1.0)}
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("El ingestor no arrancó")
+
+
+def wait_until_stable(db_path, expected, timeout=60):
+    deadline = time.monotonic() + timeout
+    count = count_events(db_path)
+    while count < expected and time.monotonic() < deadline:
+        time.sleep(0.1)
+        count = count_events(db_path)
+    return count
+
+
+def bench_socket(db_path, n_machines, clients, rate, seconds, port):
+    server = subprocess.Popen([sys.executable, "-m", "plas2", "--db", db_path, "ingest", "--listen", str(port),
+                               "--report-every", "3600"], cwd=ROOT, stderr=subprocess.DEVNULL)
+    reader = Reader(db_path)
+    sent = [0] * clients
+    try:
+        wait_for_port(port)
+        before = count_events(db_path)
+        reader.start()
+
+        def client(i):
+            rnd = random.Random(i)
+            sock = socket.create_connection(("127.0.0.1", port))
+            per_tick = max(1, rate // clients // 100) # Ráfagas cada 10 ms
+            deadline = time.perf_counter() + seconds
+            next_tick = time.perf_counter()
+            while time.perf_counter() < deadline:
+                when = time.strftime("%Y-%m-%d %H:%M:%S")
+                sock.sendall("".join(json.dumps(event(rnd, n_machines, when)) + "\n" for _ in range(per_tick)).encode())
+                sent[i] += per_tick
+                next_tick += 0.01
+                time.sleep(max(0.0, next_tick - time.perf_counter()))
+            sock.close()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stored = wait_until_stable(db_path, before + sum(sent)) - before
+        elapsed = time.perf_counter() - start
+    finally:
+        reader.stop.set()
+        server.terminate()
+        server.wait()
+    return {"mode": "socket", "sent": sum(sent), "stored": stored, "events_per_s": round(stored / elapsed),
+            **reader.summary()}
+
+
+def bench_directory(db_path, n_machines, n_events, tmp):
+    drop = os.path.join(tmp, "drop")
+    os.makedirs(drop)
+    rnd = random.Random(0)
+    with open(os.path.join(drop, "eventos.csv"), "w", encoding="utf-8") as f:
+        f.write(",".join(telemetry.EVENT_FIELDS) + "\n")
+        for i in range(n_events):
+            e = event(rnd, n_machines, f"2025-06-{1 + i * 28 // n_events:02d} 08:00:00")
+            f.write(",".join(str(e.get(field, "")) for field in telemetry.EVENT_FIELDS) + "\n")
+    before = count_events(db_path)
+    reader = Reader(db_path)
+    reader.start()
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "plas2", "--db", db_path, "ingest", "--dir", drop, "--once",
+                    "--report-every", "3600"], cwd=ROOT, check=True, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    reader.stop.set()
+    stored = count_events(db_path) - before
+    return {"mode": "directorio", "sent": n_events, "stored": stored, "events_per_s": round(stored / elapsed),
+            **reader.summary()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--rate", type=int, default=20000, help="Eventos/s totales de los simuladores")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--file-events", type=int, default=200000)
+    parser.add_argument("--port", type=int, default=8791)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "telemetria.db")
+        create_db(db_path, args.machines)
+        results = [bench_socket(db_path, args.machines, args.clients, args.rate, args.seconds, args.port),
+                   bench_directory(db_path, args.machines, args.file_events, tmp)]
+    for r in results:
+        print(f"{r['mode']:>10}: {r['stored']:,}/{r['sent']:,} eventos | {r['events_per_s']:,} eventos/s | "
+              f"lectura p50 {r['read_p50_ms']} ms, p99 {r['read_p99_ms']} ms, máx {r['read_max_ms']} ms")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,115 +1,175 @@
 import streamlit as st
 import pandas as pd
 import math
-import json
-import os
+import io
+import csv
 import sqlite3
-from datetime import datetime
+import tempfile
+import functools
+from datetime import datetime, time, timedelta
 from collections import defaultdict # Para agrupar fácilmente
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
-# --- Configuración de la Página ---
-st.set_page_config(page_title="Calculadora de Producción v3 (Categorías)", layout="wide")
+import altair as alt
+import numpy as np
+
+from plas2.constants import DEFAULT_CATEGORY, MACHINE_TYPES, CYCLE_MACHINE_TYPES
+from plas2 import batch, bulk_io, engine, history, instrument, machines, montecarlo, plants, profiles, planning, queries, render, scheduler, schema, search, sweep, telemetry
+from plas2.db import get_pool
+from plas2.render import render_analysis_table, render_interruptions_table, render_machine_card
+from plas2.repository import get_repository
 
 # --- Nombre del Archivo de Base de Datos ---
-DATABASE_FILE = "production_data_v3.db" # Cambiar nombre para evitar conflictos si hay DB vieja
-DEFAULT_CATEGORY = "General" # Categoría por defecto
+DATABASE_FILE = "production_data_v3.db" # BD de la planta por defecto; las demás, en plants.PLANTS_DIR
 
 # --- Funciones de Base de Datos ---
+# Todas usan el pool de conexiones compartido (WAL, busy_timeout, reintentos); ver plas2/db.py.
+# El esquema (columnas tipadas de parámetros) y sus sentencias SQL viven en plas2/schema.py.
+# Cada planta tiene su propia BD (ver plas2/plants.py); los helpers usan la de la planta elegida.
+
+PLANT_STATE_KEYS = ("capacity_plan", "schedule_result", "sweep_job", "batch_machines")
+# Widgets del formulario de edición: se vacían al abrirlo para que muestren la versión leída
+EDIT_FORM_KEYS = ("edit_machine_name", "edit_machine_type", "edit_machine_category", "edit_machine_description",
+                  "edit_machine_profile", "edit_calibracion", "edit_otros", "edit_cambio_rollo", "edit_cambio_producto",
+                  "edit_cambio_cuchillo", "edit_cambio_perforador", "edit_cambio_paquete", "edit_empaque",
+                  "edit_upm", "edit_peso", "edit_cycle_time", "edit_productive_time")
+
+def current_db():
+    """Fichero de BD de la planta elegida en la barra lateral."""
+    return st.session_state.get("plant_db", DATABASE_FILE)
+
+def on_plant_change():
+    """Al cambiar de planta se descarta el estado de la sesión ligado a la anterior."""
+    for key in PLANT_STATE_KEYS:
+        st.session_state.pop(key, None)
+    st.session_state.editing_machine = None
 
-def init_db():
-    """Inicializa la BD, crea la tabla 'machines' y añade la columna 'category' si no existe."""
+def create_plant_db():
+    """Callback del botón de alta: crea la BD de la planta y la deja seleccionada."""
     try:
-        with sqlite3.connect(DATABASE_FILE) as conn:
-            cursor = conn.cursor()
-
-            # 1. Comprobar si la columna 'category' existe
-            cursor.execute("PRAGMA table_info(machines)")
-            columns = [info[1] for info in cursor.fetchall()]
-            needs_category_column = 'category' not in columns
-
-            # 2. Crear tabla si no existe (incluyendo category desde el inicio si es posible)
-            #    Usamos TEXT DEFAULT 'General' para asignar un valor a filas existentes si se añade después
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS machines (
-                    name TEXT PRIMARY KEY,
-                    type TEXT NOT NULL,
-                    description TEXT,
-                    setup_params TEXT NOT NULL,
-                    production_params TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT,
-                    category TEXT DEFAULT '{DEFAULT_CATEGORY}'
-                )
-            ''')
-            conn.commit() # Commit creación inicial si ocurre
-
-            # 3. Añadir columna 'category' si era necesaria (ALTER TABLE)
-            if needs_category_column:
-                try:
-                    # Intentar añadir la columna. Puede fallar si la tabla no existía antes.
-                    cursor.execute(f"ALTER TABLE machines ADD COLUMN category TEXT DEFAULT '{DEFAULT_CATEGORY}'")
-                    conn.commit()
-                    st.toast("Base de datos actualizada: Añadida columna 'category'.", icon="ℹ️")
-                except sqlite3.OperationalError as alter_err:
-                    # Podría dar error si la tabla acaba de ser creada (ya tiene la columna)
-                    # O si hay otro problema. Ignoramos si es porque ya existe.
-                    if "duplicate column name" not in str(alter_err):
-                         st.warning(f"Nota: No se pudo ejecutar ALTER TABLE (puede ser normal si la tabla es nueva): {alter_err}")
-
+        plants.create_plant(st.session_state.get("new_plant_name", ""))
+    except ValueError as e:
+        st.session_state.plant_message = ("error", f"⛔ {e}")
+        return
+    except (OSError, sqlite3.Error) as e:
+        st.session_state.plant_message = ("error", f"Error al crear la planta: {e}")
+        return
+    name = st.session_state.new_plant_name.strip()
+    st.session_state.plant = name
+    st.session_state.new_plant_name = ""
+    st.session_state.plant_message = ("success", f"✅ Planta '{name}' creada.")
+    on_plant_change()
+
+def plant_selector():
+    """Selector de planta de la barra lateral; fija la BD que usan todos los helpers de esta sesión."""
+    available_plants = plants.plant_databases(DATABASE_FILE)
+    if st.session_state.get("plant") not in available_plants:
+        st.session_state.plant = plants.DEFAULT_PLANT
+    plant = st.selectbox("🏭 Planta", list(available_plants), key="plant", on_change=on_plant_change)
+    st.session_state.plant_db = available_plants[plant]
+    with st.expander("➕ Nueva planta", expanded=False):
+        st.text_input("Nombre de la planta", key="new_plant_name", max_chars=40)
+        st.button("Crear planta", key="create_plant", on_click=create_plant_db)
+    message = st.session_state.pop("plant_message", None)
+    if message:
+        getattr(st, message[0])(message[1])
+
+@instrument.timed
+def fleet_report_db():
+    """Capacidad por planta y categoría de todas las plantas, leídas en paralelo."""
+    available_plants = plants.plant_databases(DATABASE_FILE)
+    errors = {}
+    for plant, path in list(available_plants.items()):
+        try:
+            migrate_db(path) # Esquema al día (una vez por proceso y planta)
+        except sqlite3.Error as e:
+            errors[plant] = str(e)
+            del available_plants[plant]
+    rows, query_errors = plants.fleet_report(available_plants)
+    for plant, message in {**errors, **query_errors}.items():
+        st.error(f"Error al leer la planta '{plant}': {message}")
+    return rows
+
+@st.cache_resource(show_spinner=False)
+def migrate_db(db_path):
+    """Aplica las migraciones una sola vez por proceso (no en cada rerun); devuelve sus descripciones."""
+    return tuple(machines.init_db(db_path))
+
+@instrument.timed
+def init_db():
+    """Inicializa la BD y aplica en sitio las migraciones de esquema pendientes.
 
+    Las migraciones aplicadas se anuncian una vez por sesión.
+    """
+    try:
+        applied = migrate_db(current_db())
     except sqlite3.Error as e:
         st.error(f"Error crítico al inicializar/actualizar la base de datos: {e}")
+        return
+    if not st.session_state.get("db_migrations_shown"):
+        st.session_state.db_migrations_shown = True
+        for description in applied:
+            st.toast(f"Base de datos actualizada: {description}.", icon="ℹ️")
 
 
+@instrument.timed
 def get_all_machines_db():
-    """Obtiene todas las máquinas, ordenadas por categoría y nombre."""
-    machines = {}
-    try:
-        with sqlite3.connect(DATABASE_FILE) as conn:
-            conn.row_factory = sqlite3.Row # Devolver filas como diccionarios
-            cursor = conn.cursor()
-            # Ordenar primero por categoría, luego por nombre
-            cursor.execute("SELECT * FROM machines ORDER BY category, name")
-            rows = cursor.fetchall()
-            for row in rows:
-                machine_dict = dict(row)
-                try:
-                    # Deserializar JSON y asegurar categoría por defecto si es NULL/None
-                    machine_dict['setup_params'] = json.loads(machine_dict['setup_params'])
-                    machine_dict['production_params'] = json.loads(machine_dict['production_params'])
-                    if machine_dict.get('category') is None: # Si la categoría es NULL en la BD
-                        machine_dict['category'] = DEFAULT_CATEGORY
-                    machines[machine_dict['name']] = machine_dict
-                except json.JSONDecodeError as json_err:
-                     st.error(f"Error JSON máquina {machine_dict.get('name', 'DESCONOCIDA')}: {json_err}")
-                except Exception as e:
-                     st.error(f"Error procesando máquina {machine_dict.get('name', 'DESCONOCIDA')}: {e}")
+    """Obtiene todas las máquinas, ordenadas por categoría y nombre.
 
+    Usa la caché compartida del proceso: sólo relee la tabla si la BD cambió.
+    El resultado es una ``FleetTable`` columnar de sólo lectura; ``tabla[nombre]``
+    devuelve el dict de una máquina.
+    """
+    repo = get_repository(current_db())
+    try:
+        machines = repo.get_all()
     except sqlite3.Error as e:
         st.error(f"Error al leer máquinas de la base de datos: {e}")
+        return {}
+    for message in repo.errors:
+        st.error(message)
     return machines
 
+@instrument.timed
+def get_machines_by_category_db():
+    """Obtiene {categoría: (nombres...)} precalculado en la caché compartida."""
+    try:
+        return get_repository(current_db()).get_by_category()
+    except sqlite3.Error as e:
+        st.error(f"Error al leer máquinas de la base de datos: {e}")
+        return {}
+
+@instrument.timed
+def get_profiles_db():
+    """Obtiene los perfiles de parámetros ({id: perfil}) desde la caché compartida."""
+    try:
+        return get_repository(current_db()).get_profiles()
+    except sqlite3.Error as e:
+        st.error(f"Error al leer perfiles de la base de datos: {e}")
+        return {}
+
+@instrument.timed
+def search_machines_db(text, limit):
+    """Nombres de máquina que coinciden con ``text`` según el índice FTS5 (ver plas2/search.py)."""
+    try:
+        with get_pool(current_db()).read() as conn:
+            return search.search_machines(conn, text, limit)
+    except sqlite3.Error as e:
+        st.error(f"Error al buscar máquinas: {e}")
+        return []
+
+@instrument.timed
 def add_machine_db(config):
-    """Agrega una nueva máquina a la base de datos, incluyendo categoría."""
+    """Agrega una nueva máquina a la base de datos, incluyendo categoría y perfil."""
+    category = config.get('category', DEFAULT_CATEGORY) or DEFAULT_CATEGORY # Asegurar default
     try:
-        with sqlite3.connect(DATABASE_FILE) as conn:
-            cursor = conn.cursor()
-            category = config.get('category', DEFAULT_CATEGORY) or DEFAULT_CATEGORY # Asegurar default
-            cursor.execute('''
-                INSERT INTO machines (name, type, description, setup_params, production_params, created_at, category)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                config['name'],
-                config['type'],
-                config.get('description', None),
-                json.dumps(config['setup_params']),
-                json.dumps(config['production_params']),
-                config['created_at'],
-                category # Añadir categoría
-            ))
-            conn.commit()
+        machines.add_machine(current_db(), {**config, 'category': category})
         st.success(f"✅ Máquina '{config['name']}' guardada en categoría '{category}'.")
         return True
+    except machines.MissingProfileError as e:
+        st.error(f"⛔ No se guardó '{config['name']}': {e} Elija otro perfil.")
+        return False
     except sqlite3.IntegrityError:
         st.error(f"⛔ Error: Ya existe una máquina con el nombre '{config['name']}'.")
         return False
@@ -117,53 +177,264 @@ def add_machine_db(config):
         st.error(f"Error al guardar la máquina en la base de datos: {e}")
         return False
 
-def update_machine_db(original_name, config):
-    """Actualiza una máquina existente, incluyendo la categoría."""
+@instrument.timed
+def update_machine_db(original_name, config, expected_version=None):
+    """Actualiza una máquina existente, incluyendo la categoría y el perfil.
+
+    Con ``expected_version`` no sobrescribe los cambios que otra sesión guardó entre medias.
+    """
+    category = config.get('category', DEFAULT_CATEGORY) or DEFAULT_CATEGORY # Asegurar default
     try:
-        with sqlite3.connect(DATABASE_FILE) as conn:
-            cursor = conn.cursor()
-            category = config.get('category', DEFAULT_CATEGORY) or DEFAULT_CATEGORY # Asegurar default
-            cursor.execute('''
-                UPDATE machines
-                SET name = ?, type = ?, description = ?, setup_params = ?,
-                    production_params = ?, updated_at = ?, category = ?
-                WHERE name = ?
-            ''', (
-                config['name'],
-                config['type'],
-                config.get('description', None),
-                json.dumps(config['setup_params']),
-                json.dumps(config['production_params']),
-                config['updated_at'],
-                category, # Actualizar categoría
-                original_name # Usar el nombre original en el WHERE
-            ))
-            conn.commit()
+        machines.update_machine(current_db(), original_name, {**config, 'category': category}, expected_version) # WHERE por nombre original
         st.success(f"✅ Máquina '{config['name']}' actualizada (Categoría: '{category}').")
         return True
+    except machines.StaleMachineError as e:
+        st.error(f"⚠️ No se guardó: otra sesión modificó '{original_name}' mientras la editaba. {e}")
+        return False
+    except machines.MissingProfileError as e:
+        st.error(f"⛔ No se guardó '{original_name}': {e} Elija otro perfil.")
+        return False
     except sqlite3.Error as e:
         st.error(f"Error al actualizar la máquina en la base de datos: {e}")
         return False
 
+@instrument.timed
 def delete_machine_db(name):
     """Elimina una máquina de la base de datos."""
-    # No necesita cambios, elimina por nombre (PK)
     try:
-        with sqlite3.connect(DATABASE_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM machines WHERE name = ?", (name,))
-            conn.commit()
+        machines.delete_machine(current_db(), name)
         st.success(f"🗑️ Máquina '{name}' eliminada.")
         return True
     except sqlite3.Error as e:
         st.error(f"Error al eliminar la máquina: {e}")
         return False
 
-# --- Inicializar Base de Datos al inicio ---
-init_db()
+@instrument.timed
+def save_profile_db(profile_id, name, setup_params, production_params, description=None):
+    """Crea (profile_id None) o actualiza un perfil; todas sus máquinas cambian en una transacción."""
+    try:
+        def write(conn):
+            if profile_id is None:
+                profiles.create_profile(conn, name, setup_params, production_params, description)
+            else:
+                profiles.update_profile(conn, profile_id, name, setup_params, production_params, description)
+        get_pool(current_db()).run_write(write)
+        st.success(f"✅ Perfil '{name}' guardado.")
+        return True
+    except sqlite3.IntegrityError:
+        st.error(f"⛔ Error: Ya existe un perfil con el nombre '{name}'.")
+        return False
+    except sqlite3.Error as e:
+        st.error(f"Error al guardar el perfil: {e}")
+        return False
+
+@instrument.timed
+def delete_profile_db(profile_id, name):
+    """Elimina un perfil; sus máquinas conservan los valores que heredaban."""
+    try:
+        get_pool(current_db()).run_write(lambda conn: profiles.delete_profile(conn, profile_id))
+        st.success(f"🗑️ Perfil '{name}' eliminado.")
+        return True
+    except sqlite3.Error as e:
+        st.error(f"Error al eliminar el perfil: {e}")
+        return False
+
+@instrument.timed
+def group_identical_configurations_db():
+    """Crea perfiles para las configuraciones de parámetros repetidas."""
+    try:
+        created = get_pool(current_db()).run_write(profiles.group_identical_configurations)
+    except sqlite3.Error as e:
+        st.error(f"Error al agrupar configuraciones: {e}")
+        return False
+    if created:
+        st.success("✅ Perfiles creados: " + ", ".join(f"{name} ({n} máquinas)" for name, n in created))
+    else:
+        st.info("ℹ️ No hay configuraciones repetidas entre máquinas sin perfil.")
+    return bool(created)
+
+@instrument.timed
+def import_machines_db(uploaded_file):
+    """Importa máquinas en bloque (upsert por nombre) desde un fichero subido, en una sola transacción."""
+    try:
+        fmt = bulk_io.detect_format(uploaded_file.name)
+        with get_pool(current_db()).write() as conn:
+            report = bulk_io.import_machines(conn, uploaded_file, fmt)
+    except ImportError:
+        st.error("⛔ Error: Parquet requiere el paquete 'pyarrow'.")
+        return None
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        st.error(f"⛔ Error leyendo el fichero: {e}")
+        return None
+    except sqlite3.Error as e:
+        st.error(f"Error al importar máquinas (no se guardó ningún cambio): {e}")
+        return None
+    st.success(f"✅ Importación completada: {report.inserted} nuevas, {report.updated} actualizadas, {report.error_count} filas con error.")
+    return report
+
+@instrument.timed
+def record_history_db(session_key, record, *args):
+    """Registra un cálculo en el historial si sus entradas cambiaron desde el último registro de la sesión.
+
+    ``record`` es ``history.record_single`` o ``history.record_batch``; ``session_key``
+    identifica entradas + versión de la BD, para no duplicar filas en cada rerun.
+    """
+    session_key = (current_db(), session_key) # Las versiones de BD de distintas plantas pueden coincidir
+    if st.session_state.get(f"history_last_{record.__name__}") == session_key:
+        return
+    try:
+        get_pool(current_db()).run_write(lambda conn: record(conn, *args))
+        st.session_state[f"history_last_{record.__name__}"] = session_key
+    except sqlite3.Error as e:
+        st.warning(f"⚠️ No se pudo registrar el cálculo en el historial: {e}")
+
+@instrument.timed
+def history_trend_db(scope, key, period, start, end):
+    """Serie diaria/semanal de una máquina o categoría, leída de los agregados."""
+    try:
+        with get_pool(current_db()).read() as conn:
+            return history.trend(conn, scope, key, period, start, end)
+    except sqlite3.Error as e:
+        st.error(f"Error al leer el historial: {e}")
+        return []
+
+@instrument.timed
+def history_keys_db(scope):
+    try:
+        with get_pool(current_db()).read() as conn:
+            return history.history_keys(conn, scope)
+    except sqlite3.Error as e:
+        st.error(f"Error al leer el historial: {e}")
+        return []
+
+@instrument.timed
+def recent_history_db(limit, machine=None):
+    try:
+        with get_pool(current_db()).read() as conn:
+            return history.recent(conn, limit, machine)
+    except sqlite3.Error as e:
+        st.error(f"Error al leer el historial: {e}")
+        return []
+
+@instrument.timed
+def machine_actuals_db(name, shifts=telemetry.ACTUAL_SHIFTS):
+    """Agregados de telemetría real de los últimos turnos de una máquina (vacío si no hay)."""
+    try:
+        with get_pool(current_db()).read() as conn:
+            return telemetry.actuals(conn, name, shifts)
+    except sqlite3.Error as e:
+        st.error(f"Error al leer la telemetría: {e}")
+        return []
+
+@instrument.timed
+def machine_capacity_db(name):
+    """Constantes de capacidad materializadas de una máquina y su puesto en la categoría (None si faltan)."""
+    try:
+        with get_pool(current_db()).read() as conn:
+            return queries.machine_capacity(conn, name)
+    except sqlite3.Error as e:
+        st.error(f"Error al leer la capacidad de la máquina: {e}")
+        return None
+
+@instrument.timed
+def top_capacity_db(metric, categories, limit):
+    """Las ``limit`` máquinas de mayor capacidad según ``metric`` (en ``categories`` o en toda la flota)."""
+    try:
+        with get_pool(current_db()).read() as conn:
+            return queries.top_capacity(conn, metric, categories, limit)
+    except sqlite3.Error as e:
+        st.error(f"Error al consultar la capacidad: {e}")
+        return []
+
+@instrument.timed
+def repair_capacity_db():
+    """Verifica las constantes de capacidad materializadas y recalcula las filas desfasadas."""
+    def repair(conn):
+        stale = queries.stale_capacity(conn)
+        queries.rebuild_capacity(conn, stale)
+        return stale
+    try:
+        stale = get_pool(current_db()).run_write(repair)
+    except sqlite3.Error as e:
+        st.error(f"Error al verificar las constantes de capacidad: {e}")
+        return
+    if stale:
+        st.warning(f"🔧 {len(stale)} filas desfasadas recalculadas: {', '.join(stale[:10])}{'...' if len(stale) > 10 else ''}")
+    else:
+        st.success("✅ Las constantes de capacidad están al día.")
+
+@instrument.timed
+def export_machines_db(fmt):
+    """Exporta todas las máquinas en streaming a un fichero temporal y devuelve su contenido.
+
+    La exportación no materializa la tabla en Python; sólo el resultado final se
+    entrega en bytes porque ``st.download_button`` necesita el contenido completo.
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) # En disco si crece
+    try:
+        with get_pool(current_db()).read() as conn:
+            if fmt == "parquet":
+                bulk_io.export_machines(conn, out, fmt)
+            else:
+                text_out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+                bulk_io.export_machines(conn, text_out, fmt)
+                text_out.flush()
+                text_out.detach() # No cerrar el fichero subyacente
+    except ImportError:
+        st.error("⛔ Error: Parquet requiere el paquete 'pyarrow'.")
+        return None
+    except sqlite3.Error as e:
+        st.error(f"Error al exportar máquinas: {e}")
+        return None
+    out.seek(0)
+    with out:
+        return out.read()
+
+# --- Instrumentación opcional (ver plas2/instrument.py) ---
+# Desactivada, cada helper y página decorados con @instrument.timed sólo consultan si hay registro activo.
+
+@st.cache_resource
+def get_metrics_log():
+    """Registro circular del proceso con el resumen de las últimas ejecuciones instrumentadas."""
+    return instrument.MetricsLog()
+
+def diagnostics_recording(label):
+    """Registro de la ejecución si la sesión activó el diagnóstico (si no, un contexto vacío)."""
+    if st.session_state.get("diagnostics_enabled"):
+        return instrument.recording(label, get_metrics_log())
+    return nullcontext()
+
+def recorded(fn):
+    """Para fragmentos: cuando se reejecutan solos, registran su ejecución con su nombre."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with diagnostics_recording(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def render_diagnostics(summary):
+    """Panel lateral con la ejecución actual y el registro exportable."""
+    st.caption(f"Esta ejecución: {summary['wall_ms']:,.0f} ms · {summary['queries']} consultas · "
+               f"{summary['rows_read']:,} filas · HTML {summary['html_bytes'] / 1024:,.1f} KB")
+    hits, misses = render.cache_stats()
+    st.caption(f"Caché HTML (proceso): {hits:,} aciertos · {misses:,} construidas")
+    spans = summary["spans"]
+    if spans:
+        st.dataframe(pd.DataFrame([(label, span["calls"], span["ms"]) for label, span in spans.items()],
+                                  columns=["Función", "Llamadas", "ms"]), hide_index=True)
+    log = get_metrics_log()
+    entries = log.entries()
+    with st.expander(f"📜 Últimas ejecuciones ({len(entries)})", expanded=False):
+        if entries:
+            st.dataframe(pd.DataFrame([{key: entry[key] for key in ("started_at", "label", "wall_ms", "queries", "rows_read", "html_bytes")}
+                                       for entry in reversed(entries[-50:])]), hide_index=True)
+        st.download_button("⬇️ Exportar registro (JSONL)", log.to_jsonl(), file_name="plas2_metrics.jsonl",
+                           mime="application/x-ndjson", key="diagnostics_export")
+        if st.button("🧹 Vaciar registro", key="diagnostics_clear"):
+            log.clear()
 
 # --- CSS (sin cambios) ---
-st.markdown("""
+APP_CSS = """
 <style>
 /* ... (mismo CSS que antes) ... */
 body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: #f4f6f9; }
@@ -195,40 +466,175 @@ h1, h2, h3 { color: #333333; text-align: center; }
     font-weight: bold;
 }
 </style>
-""", unsafe_allow_html=True)
-
-# --- Constantes y estado inicial ---
-MACHINE_TYPES = ["Manual", "Semi-Automática", "Automática"]
-
+"""
+
+# --- Estado inicial ---
+PAGE_SIZES = [12, 24, 48, 96] # Tarjetas por página en la configuración
+SEARCH_LIMIT = 20 # Coincidencias mostradas por el selector con búsqueda
+SEARCH_FULL_LIST_MAX = 1000 # Hasta este tamaño de flota, sin búsqueda se listan todas
+PARAM_LABELS = {
+    "calibracion": "Tiempo Calibración (min)",
+    "otros": "Tiempo Otros (min)",
+    "cambio_rollo": "Tiempo Cambio Rollo (min)",
+    "cambio_producto": "Tiempo Cambio Producto (min)",
+    "cambio_cuchillo": "Tiempo Cambio Cuchillo (min)",
+    "cambio_perforador": "Tiempo Cambio Perforador (min)",
+    "cambio_paquete": "Tiempo Cambio Paquete (min)",
+    "empaque": "Tiempo Empaque (segundos)",
+    "unidades_por_minuto": "Unidades por Minuto",
+    "peso_por_unidad": "Peso por Unidad (gramos)",
+    "ciclo_total": "Duración Ciclo (s)",
+    "ciclo_productivo": "Tiempo Productivo Ciclo (s)",
+}
 if 'current_page' not in st.session_state:
     st.session_state.current_page = "calculator"
 if 'editing_machine' not in st.session_state:
     st.session_state.editing_machine = None
-
-# --- Funciones de Renderizado (sin cambios) ---
-# render_analysis_table, render_interruptions_table (iguales que antes)
-def render_analysis_table(turno_minutos, tiempo_productivo, tiempo_perdido, eficiencia):
-    eficiencia_percent = float(eficiencia) if eficiencia else 0.0
-    progress_bar_html = f'''<div class="progress"><div class="progress-bar" style="width: {eficiencia_percent:.2f}%; min-width: 50px;">{eficiencia_percent:.2f}%</div></div>'''
-    html = f'''<table class="custom-table"><thead><tr><th>Métrica</th><th>Valor</th></tr></thead><tbody><tr><td>Tiempo Total Turno</td><td>{turno_minutos:.2f} min</td></tr><tr><td>Tiempo Productivo</td><td>{tiempo_productivo:.2f} min</td></tr><tr><td>Tiempo Perdido</td><td>{tiempo_perdido:.2f} min</td></tr><tr><td>Eficiencia</td><td>{progress_bar_html}</td></tr></tbody></table>'''
-    return html
-
-def render_interruptions_table(interrupciones_dict, turno_minutos):
-    rows = ""
-    total_interrupcion_min = 0
-    for tipo, tiempo in interrupciones_dict.items():
-        tiempo_float = float(tiempo)
-        if tiempo_float > 0:
-            porcentaje = (tiempo_float / turno_minutos) * 100 if turno_minutos > 0 else 0
-            rows += f"<tr><td>{tipo}</td><td>{tiempo_float:.2f} min</td><td>{porcentaje:.2f}%</td></tr>"
-            total_interrupcion_min += tiempo_float
-    total_porcentaje = (total_interrupcion_min / turno_minutos) * 100 if turno_minutos > 0 else 0
-    rows += f"<tr style='font-weight: bold; background-color: #e9ecef;'><td>Total Interrupciones</td><td>{total_interrupcion_min:.2f} min</td><td>{total_porcentaje:.2f}%</td></tr>"
-    html = f'''<table class="custom-table"><thead><tr><th>Tipo</th><th>Tiempo (min)</th><th>% Turno</th></tr></thead><tbody>{rows}</tbody></table>'''
-    return html
+if 'editing_version' not in st.session_state:
+    st.session_state.editing_version = None
+
+def start_editing(config):
+    """Abre el formulario de edición con ``config`` y recuerda la versión de la fila leída."""
+    for key in EDIT_FORM_KEYS:
+        st.session_state.pop(key, None)
+    st.session_state.editing_machine = config["name"]
+    st.session_state.editing_version = config.get("row_version")
+
+# --- Funciones de Renderizado ---
+# Tarjetas y tablas HTML (memorizadas) en plas2/render.py: el script se reejecuta en cada rerun,
+# así que una caché definida aquí se perdería; la del módulo importado dura todo el proceso.
+def render_html(markup):
+    """Pinta HTML propio (tablas, tarjetas, CSS), contando su tamaño en la instrumentación."""
+    st.markdown(instrument.html(markup), unsafe_allow_html=True)
 
 # --- Páginas de la Aplicación ---
 
+def bulk_io_section():
+    """Carga masiva (CSV/JSONL/Parquet, upsert por nombre) y exportación de todas las máquinas."""
+    st.caption(
+        "Columnas: name, type, description, category, profile y los parámetros "
+        f"({', '.join(schema.PARAM_KEYS)}). Las máquinas existentes con el mismo nombre se actualizan."
+    )
+    import_col, export_col = st.columns(2)
+    with import_col:
+        uploaded_file = st.file_uploader("Fichero a importar", type=["csv", "jsonl", "ndjson", "parquet"], key="bulk_import_file")
+        if uploaded_file is not None and st.button("📥 Importar", key="bulk_import", type="primary"):
+            report = import_machines_db(uploaded_file)
+            if report is not None and report.errors:
+                with st.expander(f"⚠️ {report.error_count} filas omitidas", expanded=True):
+                    st.dataframe(pd.DataFrame(report.errors, columns=["Línea", "Error"]), hide_index=True)
+    with export_col:
+        export_format = st.selectbox("Formato de exportación", options=bulk_io.FORMATS, key="bulk_export_format")
+        if st.button("📤 Generar exportación", key="bulk_export"):
+            exported = export_machines_db(export_format)
+            if exported is not None:
+                st.download_button(
+                    "💾 Descargar",
+                    data=exported,
+                    file_name=f"maquinas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}",
+                    mime={"csv": "text/csv", "jsonl": "application/x-ndjson"}.get(export_format, "application/octet-stream"),
+                    key="bulk_export_download"
+                )
+
+def profiles_section():
+    """Gestión de perfiles: agrupar configuraciones idénticas, editar y eliminar perfiles."""
+    st.caption("Un perfil guarda una configuración una sola vez. Cambiarlo actualiza todas sus máquinas a la vez.")
+    if st.button("🔗 Agrupar configuraciones idénticas en perfiles", key="group_profiles"):
+        if group_identical_configurations_db():
+            st.rerun()
+
+    available_profiles = get_profiles_db()
+    if not available_profiles:
+        st.info("ℹ️ No hay perfiles. Agrupa configuraciones idénticas o crea uno abajo.")
+    profile_options = [None, *available_profiles.keys()]
+    selected_profile_id = st.selectbox(
+        "Perfil a editar",
+        options=profile_options,
+        format_func=lambda pid: "➕ Nuevo perfil" if pid is None else f"{available_profiles[pid]['name']} ({available_profiles[pid]['machines']} máquinas)",
+        key="profile_selected"
+    )
+    profile = available_profiles.get(selected_profile_id) or {"name": "", "description": "", "setup_params": {}, "production_params": {}}
+    key_prefix = f"profile_{selected_profile_id}"
+    profile_name = st.text_input("Nombre del Perfil", value=profile["name"], key=f"{key_prefix}_name")
+    profile_description = st.text_input("Descripción del Perfil", value=profile.get("description") or "", key=f"{key_prefix}_description")
+
+    edited_params = {}
+    param_cols = st.columns(3)
+    for i, key in enumerate(schema.PARAM_KEYS):
+        if key == "ratio_productivo":
+            continue # Se deriva de los tiempos de ciclo
+        current = profile["setup_params"].get(key, profile["production_params"].get(key))
+        with param_cols[i % 3]:
+            if key == "peso_por_unidad":
+                edited_params[key] = st.number_input(PARAM_LABELS[key], 0.0, value=float(current or 0.0), step=0.1, key=f"{key_prefix}_{key}")
+            else:
+                edited_params[key] = st.number_input(PARAM_LABELS[key], 0, value=int(current or 0), step=1, key=f"{key_prefix}_{key}")
+    if edited_params["ciclo_productivo"] > edited_params["ciclo_total"]:
+        edited_params["ciclo_productivo"] = edited_params["ciclo_total"]
+    edited_params["ratio_productivo"] = (
+        edited_params["ciclo_productivo"] / edited_params["ciclo_total"] if edited_params["ciclo_total"] > 0 else 1.0
+    )
+
+    action_cols = st.columns(2)
+    with action_cols[0]:
+        if st.button("💾 Guardar Perfil", key="save_profile", type="primary"):
+            if not profile_name.strip():
+                st.error("⛔ Error: El nombre del perfil es obligatorio.")
+            else:
+                setup_params = {k: edited_params[k] for k in schema.SETUP_PARAM_KEYS}
+                production_params = {k: edited_params[k] for k in schema.PRODUCTION_PARAM_KEYS}
+                if save_profile_db(selected_profile_id, profile_name.strip(), setup_params, production_params, profile_description.strip() or None):
+                    st.rerun()
+    with action_cols[1]:
+        if selected_profile_id is not None and st.button("🗑️ Eliminar Perfil", key="delete_profile"):
+            if delete_profile_db(selected_profile_id, profile["name"]):
+                st.rerun()
+
+@st.fragment
+@recorded
+def category_block(category, names, page_size):
+    """Bloque de una categoría en la configuración.
+
+    Es un fragmento: abrirlo, paginar o pulsar sus botones sólo reejecuta este
+    bloque. Eliminar o editar relanzan la app completa (cambian la lista y el
+    formulario de edición).
+    """
+    header_col, toggle_col = st.columns([4, 1])
+    with header_col:
+        render_html(f"<div class='category-header'>📁 {category} <small>({len(names)})</small></div>")
+    with toggle_col:
+        is_open = st.toggle("Mostrar", key=f"open_category_{category}")
+    if not is_open:
+        return
+
+    num_pages = max(1, math.ceil(len(names) / page_size))
+    page = 1
+    if num_pages > 1:
+        page = st.number_input(f"Página (de {num_pages})", 1, num_pages, 1, 1, key=f"page_category_{category}")
+    visible_names = names[(page - 1) * page_size:page * page_size]
+
+    all_machines = get_all_machines_db()
+    num_columns = 3
+    machine_cols = st.columns(num_columns)
+    for col_idx, name in enumerate(visible_names): # Sólo la página visible de esta categoría
+        if name not in all_machines: # Borrada desde otra sesión
+            continue
+        config = all_machines[name]
+        with machine_cols[col_idx % num_columns]:
+            render_html(render_machine_card(config))
+
+            action_cols = st.columns(2)
+            with action_cols[0]:
+                if st.button("🗑️ Eliminar", key=f"delete_{category}_{name}", help=f"Eliminar {name}"):
+                    if delete_machine_db(name):
+                        st.rerun()
+            with action_cols[1]:
+                if st.button("✏️ Editar", key=f"edit_{category}_{name}", help=f"Editar {name}"):
+                    start_editing(config)
+                    st.rerun()
+    st.markdown("---") # Separador entre categorías
+
+@instrument.timed
 def machine_configuration_page():
     st.title("⚙️ Configuración de Máquinas por Categoría")
 
@@ -249,6 +655,14 @@ def machine_configuration_page():
         with col2:
             new_machine_description = st.text_area("Descripción", key="new_machine_description",
                                                placeholder="Breve descripción de la máquina...")
+            available_profiles = get_profiles_db()
+            new_machine_profile = st.selectbox(
+                "Perfil de Parámetros",
+                options=[None, *available_profiles.keys()],
+                format_func=lambda pid: "Ninguno" if pid is None else available_profiles[pid]["name"],
+                key="new_machine_profile",
+                help="Los parámetros iguales a los del perfil se heredan; los distintos quedan como ajuste propio de la máquina."
+            )
 
         # --- Parámetros de Setup y Producción (igual que antes) ---
         st.subheader("Parámetros de Setup")
@@ -301,6 +715,7 @@ def machine_configuration_page():
                     "type": new_machine_type,
                     "description": new_machine_description.strip(),
                     "category": category_name, # *** Añadir categoría al dict ***
+                    "profile_id": new_machine_profile,
                     "setup_params": new_setup_params,
                     "production_params": new_production_params,
                     "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -308,7 +723,24 @@ def machine_configuration_page():
                 if add_machine_db(machine_config_to_add):
                     st.rerun() # Recargar para mostrar la nueva máquina en su categoría
 
+    # --- Importación / exportación masiva ---
+    with st.expander("📦 Importar / Exportar Máquinas", expanded=False):
+        bulk_io_section()
+
+    # --- Perfiles de parámetros compartidos ---
+    with st.expander("🧩 Perfiles de Parámetros", expanded=False):
+        profiles_section()
+
+    # --- Constantes de capacidad materializadas (se mantienen solas; esto sólo verifica) ---
+    with st.expander("⚡ Constantes de Capacidad", expanded=False):
+        st.caption("Interrupciones fijas, ratio productivo, uds/min y kg/min de cada máquina se recalculan al guardarla "
+                   "(o al cambiar su perfil). La verificación compara lo guardado con los parámetros actuales.")
+        if st.button("🔍 Verificar y reparar", key="capacity_check"):
+            repair_capacity_db()
+
     # --- Lista de máquinas configuradas (Agrupadas por Categoría) ---
+    # Sólo se crean widgets para las categorías abiertas y la página visible de cada una,
+    # así el coste por rerun no crece con el tamaño de la flota.
     st.divider()
     st.header("📋 Máquinas Configuradas por Categoría")
     all_machines = get_all_machines_db()
@@ -316,58 +748,22 @@ def machine_configuration_page():
     if not all_machines:
         st.info("ℹ️ No hay máquinas configuradas. Agrega una nueva máquina usando el formulario de arriba.")
     else:
-        # Agrupar máquinas por categoría
-        machines_by_category = defaultdict(list)
-        for name, config in all_machines.items():
-            category = config.get('category', DEFAULT_CATEGORY) # Usar default si falta
-            machines_by_category[category].append(config)
-
-        # Ordenar categorías alfabéticamente para mostrar
-        sorted_categories = sorted(machines_by_category.keys())
-
-        for category in sorted_categories:
-            st.markdown(f"<div class='category-header'>📁 {category}</div>", unsafe_allow_html=True)
-            # st.subheader(f"📁 Categoría: {category}") # Alternativa sin CSS
-
-            machines_in_category = machines_by_category[category]
-            num_columns = 3
-            machine_cols = st.columns(num_columns)
-            col_idx = 0
-
-            for config in machines_in_category: # Iterar sobre las máquinas de esta categoría
-                name = config['name'] # Obtener el nombre de la config actual
-                machine_class = "machine-card"
-                if config["type"] == "Manual": machine_class += " machine-manual"
-                elif config["type"] == "Semi-Automática": machine_class += " machine-semi"
-                else: machine_class += " machine-auto"
-
-                with machine_cols[col_idx % num_columns]:
-                    updated_info = f"<p><small><i>Actualizada: {config['updated_at']}</i></small></p>" if config.get('updated_at') else ""
-                    # Mostrar categoría dentro de la tarjeta (opcional)
-                    category_info = f"<p><small>Categoría: {config.get('category', DEFAULT_CATEGORY)}</small></p>"
-
-                    st.markdown(f"""
-                    <div class="{machine_class}">
-                        <h3>{name}</h3>
-                        <p><strong>Tipo:</strong> {config["type"]}</p>
-                        {category_info}
-                        <p><strong>Descripción:</strong> {config.get("description") or "N/A"}</p>
-                        <p><small>Creada: {config["created_at"]}</small></p>
-                        {updated_info}
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                    action_cols = st.columns(2)
-                    with action_cols[0]:
-                        if st.button("🗑️ Eliminar", key=f"delete_{category}_{name}", help=f"Eliminar {name}"):
-                            if delete_machine_db(name):
-                                st.rerun()
-                    with action_cols[1]:
-                        if st.button("✏️ Editar", key=f"edit_{category}_{name}", help=f"Editar {name}"):
-                            st.session_state.editing_machine = name
-                            st.rerun()
-                col_idx += 1
-            st.markdown("---") # Separador entre categorías
+        filter_col, page_size_col = st.columns([3, 1])
+        with filter_col:
+            machine_filter = st.text_input("🔎 Filtrar máquinas", key="machine_filter",
+                                           placeholder="Nombre, categoría, descripción o perfil...").strip().lower()
+        with page_size_col:
+            page_size = st.selectbox("Máquinas por página", options=PAGE_SIZES, index=0, key="machine_page_size")
+
+        machines_by_category = get_machines_by_category_db()
+        if machine_filter:
+            machines_by_category = all_machines.by_category(all_machines.matching(machine_filter))
+            if not machines_by_category:
+                st.info(f"ℹ️ Ninguna máquina coincide con '{machine_filter}'.")
+        st.caption(f"{sum(len(names) for names in machines_by_category.values())} máquinas en {len(machines_by_category)} categorías.")
+
+        for category, names in machines_by_category.items():
+            category_block(category, names, page_size)
 
     # --- Formulario de edición de máquina (con campo Categoría) ---
     if st.session_state.editing_machine:
@@ -383,6 +779,14 @@ def machine_configuration_page():
 
             st.divider()
             st.header(f"✏️ Editando Máquina: {machine_to_edit_name}")
+            if machine_config.get("row_version") != st.session_state.editing_version:
+                # Otra sesión guardó cambios desde que se abrió el formulario: guardar ahora los pisaría
+                st.warning(f"⚠️ Otra sesión modificó '{machine_to_edit_name}' desde que abrió la edición "
+                           f"(versión {st.session_state.editing_version} → {machine_config.get('row_version')}). "
+                           "Cargue la versión actual antes de guardar.")
+                if st.button("🔄 Cargar versión actual", key="reload_edit_machine"):
+                    start_editing(machine_config)
+                    st.rerun()
 
             col1, col2 = st.columns(2)
             with col1:
@@ -400,6 +804,16 @@ def machine_configuration_page():
 
             with col2:
                 edit_description = st.text_area("Descripción", value=machine_config.get("description", ""), key="edit_machine_description")
+                available_profiles = get_profiles_db()
+                profile_options = [None, *available_profiles.keys()]
+                edit_profile = st.selectbox(
+                    "Perfil de Parámetros",
+                    options=profile_options,
+                    index=profile_options.index(machine_config.get("profile_id")) if machine_config.get("profile_id") in profile_options else 0,
+                    format_func=lambda pid: "Ninguno" if pid is None else available_profiles[pid]["name"],
+                    key="edit_machine_profile",
+                    help="Los parámetros iguales a los del perfil se heredan; los distintos quedan como ajuste propio de la máquina."
+                )
 
             # --- Formularios de Parámetros (igual que antes) ---
             st.subheader("Parámetros de Setup")
@@ -470,13 +884,14 @@ def machine_configuration_page():
                             "type": edit_type,
                             "description": edit_description.strip(),
                             "category": category_name, # *** Guardar categoría actualizada ***
+                            "profile_id": edit_profile,
                             "setup_params": edit_setup_params,
                             "production_params": edit_production_params,
                             "created_at": machine_config.get("created_at", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
                             "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                         }
                         # Actualizar usando el nombre ORIGINAL como clave
-                        if update_machine_db(machine_to_edit_name, updated_config):
+                        if update_machine_db(machine_to_edit_name, updated_config, st.session_state.editing_version):
                             st.session_state.editing_machine = None
                             st.rerun()
 
@@ -486,6 +901,76 @@ def machine_configuration_page():
                     st.rerun()
 
 # --- Página Calculadora (Sin cambios funcionales mayores requeridos por ahora) ---
+def machine_picker(available_machines, key, search_key):
+    """Selector de máquina con búsqueda: con muchas máquinas sólo ofrece las mejores coincidencias del índice."""
+    search_text = st.text_input("🔎 Buscar máquina", key=search_key,
+                                placeholder="Nombre, categoría o descripción")
+    if search_text.strip():
+        options = [name for name in search_machines_db(search_text, SEARCH_LIMIT) if name in available_machines]
+        if not options:
+            st.caption("Sin coincidencias.")
+    elif len(available_machines) <= SEARCH_FULL_LIST_MAX:
+        options = list(available_machines.sorted_names()) # Ordenar alfabéticamente
+    else:
+        options = available_machines.sorted_names()[:SEARCH_LIMIT]
+        st.caption(f"{len(available_machines)} máquinas: escriba para buscar.")
+    current = st.session_state.get(key)
+    if current in available_machines and current not in options:
+        options.insert(0, current) # No perder la selección mientras se escribe
+    if not options:
+        options = [current if current in available_machines else available_machines.sorted_names()[0]]
+    return st.selectbox(
+        "Seleccione Máquina", options=options, key=key,
+        format_func=lambda name: f"{name} · {available_machines.category_of(name)}",
+    )
+
+def variability_inputs(key_prefix):
+    """Entradas de la simulación Monte Carlo; devuelve ``(Variability, nº de ensayos)``."""
+    defaults = montecarlo.Variability()
+    col1, col2 = st.columns(2)
+    with col1:
+        ensayos = st.number_input("Nº de turnos simulados", 100, 100_000, 10_000, 1000, key=f"{key_prefix}_mc_trials")
+        duracion_cv = st.slider("Variabilidad duración de cambios (CV)", 0.0, 1.0, defaults.duracion_cv, 0.05, key=f"{key_prefix}_mc_duracion_cv")
+        fijas_cv = st.slider("Variabilidad calibración/otros (CV)", 0.0, 1.0, defaults.fijas_cv, 0.05, key=f"{key_prefix}_mc_fijas_cv")
+    with col2:
+        conteos = st.checkbox("Nº de eventos aleatorio (Poisson sobre lo planificado)", defaults.conteos_aleatorios, key=f"{key_prefix}_mc_conteos")
+        ratio_sd = st.slider("Desviación ratio productivo", 0.0, 0.2, defaults.ratio_sd, 0.01, key=f"{key_prefix}_mc_ratio_sd")
+    return montecarlo.Variability(duracion_cv, fijas_cv, conteos, ratio_sd), int(ensayos)
+
+def render_simulation_bands(simulacion):
+    """Tabla P10/P50/P90 e histograma de unidades de una simulación de una máquina."""
+    bands = pd.DataFrame(
+        [simulacion.percentiles(metric)[0] for metric in ("unidades", "peso_kg", "eficiencia")],
+        index=["Unidades", "Peso (kg)", "Eficiencia (%)"], columns=[f"P{q}" for q in montecarlo.PERCENTILES],
+    )
+    with st.expander(f"🎲 Bandas de confianza ({simulacion.unidades.shape[1]:,} turnos simulados)", expanded=True):
+        st.dataframe(bands.style.format("{:,.1f}"))
+        hist = alt.Chart(pd.DataFrame({"Unidades": simulacion.unidades[0]})).mark_bar().encode(
+            x=alt.X("Unidades:Q", bin=alt.Bin(maxbins=40)), y=alt.Y("count()", title="Turnos"))
+        st.altair_chart(hist)
+
+def render_actuals(resultado, machine_config):
+    """Real (media por turno de la telemetría) frente a estimado para la máquina calculada."""
+    turnos = machine_actuals_db(machine_config["name"])
+    real = telemetry.compare(resultado, turnos, machine_config["production_params"].get("peso_por_unidad", 0))
+    if real is None:
+        st.caption("📡 Sin telemetría real para esta máquina (ver `python -m plas2 ingest`).")
+        return
+    st.subheader("📡 Real vs. Estimado")
+    st.caption(f"Media por turno de los últimos {real['turnos']} turnos registrados · último evento: {real['ultimo_evento']}")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Unidades Reales", f"{real['unidades']:,.0f}", delta=f"{real['unidades'] - resultado['unidades']:+,.0f} uds vs. estimado")
+    col2.metric("Peso Real", f"{real['peso_kg']:,.1f} kg", delta=f"{real['peso_kg'] - resultado['peso_kg']:+,.1f} kg vs. estimado")
+    col3.metric("Eficiencia Real", f"{real['eficiencia']:.1f}%", delta=f"{real['eficiencia'] - resultado['eficiencia']:+.1f} pp vs. estimado")
+    with st.expander("Detalle por turno", expanded=False):
+        st.caption(f"Paradas registradas: {real['parada_min']:,.1f} min por turno de media (estimado: {resultado['tiempo_perdido']:,.1f} min de tiempo perdido).")
+        st.dataframe(pd.DataFrame(turnos).rename(columns={
+            "shift": "Turno", "first_at": "Primer Evento", "last_at": "Último Evento", "events": "Eventos",
+            "unidades": "Unidades", "peso_kg": "Peso Registrado (kg)", "unidades_sin_peso": "Unidades sin Peso",
+            "paradas": "Paradas", "parada_min": "Paradas (min)",
+        }), hide_index=True)
+
+@instrument.timed
 def production_calculator_page():
     st.title("🏭 Calculadora de Producción")
 
@@ -498,20 +983,29 @@ def production_calculator_page():
             st.rerun()
         return
 
-    machine_names = list(available_machines.keys()) # Lista simple de nombres
-    # Podríamos formatear los nombres aquí si quisiéramos:
-    # formatted_options = {f"{cfg.get('category', DEFAULT_CATEGORY)} - {name}": name for name, cfg in available_machines.items()}
-    # selected_formatted = st.selectbox("Seleccione Máquina", options=list(formatted_options.keys()))
-    # selected_machine_name = formatted_options[selected_formatted]
-    # Pero lo dejamos simple por ahora:
-    selected_machine_name = st.selectbox("Seleccione Máquina", options=sorted(machine_names)) # Ordenar alfabéticamente
+    selected_machine_name = machine_picker(available_machines, key="calc_machine", search_key="machine_search")
     machine_config = available_machines[selected_machine_name]
 
     st.header(f"📊 Calculando para: {selected_machine_name} ({machine_config['type']})")
     st.caption(f"Categoría: {machine_config.get('category', DEFAULT_CATEGORY)}") # Mostrar categoría
+    capacity = machine_capacity_db(selected_machine_name)
+    if capacity:
+        st.caption(f"⚡ Capacidad por hora neta: {capacity['unidades_por_minuto_neto'] * 60:,.0f} uds · "
+                   f"{capacity['kg_por_minuto'] * 60:,.1f} kg (puesto {capacity['rank']} de "
+                   f"{capacity['category_machines']} en kg/h de su categoría)")
     if machine_config.get("description"):
         st.info(f"Descripción: {machine_config['description']}")
 
+    calculator_section(selected_machine_name, machine_config)
+
+@st.fragment
+@recorded
+def calculator_section(selected_machine_name, machine_config):
+    """Entradas y resultados de la calculadora.
+
+    Es un fragmento: cambiar un parámetro del turno sólo reejecuta esta sección
+    (no la configuración de página, la BD, el CSS ni la barra lateral).
+    """
     # --- Resto de la calculadora (igual que antes) ---
     with st.expander("🔧 Configuración Operativa", expanded=True):
          # ... (inputs de turno, comidas, interrupciones igual que antes) ...
@@ -532,74 +1026,72 @@ def production_calculator_page():
              if machine_config["type"] == "Manual":
                  interrupciones["cambios_empaque"] = st.number_input("Nº Cambios empaque", 0, 100, 0, 1, key="n_cambios_empaque")
 
-    # --- Cálculos (igual que antes) ---
+    with st.expander("🎲 Simulación Monte Carlo", expanded=False):
+        simular = st.toggle("Estimar bandas P10/P50/P90 con interrupciones aleatorias", key="calc_simulate")
+        variabilidad, ensayos = variability_inputs("calc") if simular else (None, 0)
+
+    # --- Cálculos (motor vectorizado compartido, ver plas2/engine.py) ---
     try:
         setup_params = machine_config["setup_params"]
-        production_params = machine_config["production_params"]
-        turno_minutos = turno_horas * 60
-        interrupciones_fijas = setup_params.get("calibracion", 0) + setup_params.get("otros", 0)
-        tiempo_comidas = (15 if desayuno else 0) + (60 if almuerzo else 0)
-        interrupciones_variables = 0
-        detalle_interrupciones_variables = {}
-
-        for key, n_eventos in interrupciones.items():
-            # ... (lógica cálculo interrupciones variables igual que antes) ...
-            tiempo_por_evento = 0; nombre_evento = ""
-            if n_eventos > 0:
-                if key == "cambios_rollo": tiempo_por_evento = setup_params.get("cambio_rollo", 0); nombre_evento = "Cambios Rollo"
-                elif key == "cambios_producto": tiempo_por_evento = setup_params.get("cambio_producto", 0); nombre_evento = "Cambios Producto"
-                elif key == "cambios_cuchillo": tiempo_por_evento = setup_params.get("cambio_cuchillo", 0); nombre_evento = "Cambios Cuchillo"
-                elif key == "cambios_perforador": tiempo_por_evento = setup_params.get("cambio_perforador", 0); nombre_evento = "Cambios Perforador"
-                elif key == "cambios_paquete": tiempo_por_evento = setup_params.get("cambio_paquete", 0); nombre_evento = "Cambios Paquete"
-                elif key == "cambios_empaque": tiempo_empaque_seg = setup_params.get("empaque", 0); tiempo_por_evento = tiempo_empaque_seg / 60.0; nombre_evento = "Cambios Empaque"
-                tiempo_total_evento = n_eventos * tiempo_por_evento
-                if tiempo_total_evento > 0 and nombre_evento:
-                    interrupciones_variables += tiempo_total_evento
-                    detalle_interrupciones_variables[f"{nombre_evento} ({n_eventos}x)"] = tiempo_total_evento
-
-        tiempo_neto_disponible = turno_minutos - (interrupciones_fijas + tiempo_comidas + interrupciones_variables)
-
-        if tiempo_neto_disponible <= 0:
-            st.error(f"⛔ Error: Tiempo de interrupciones ({interrupciones_fijas + tiempo_comidas + interrupciones_variables:.1f} min) excede turno ({turno_minutos:.1f} min).")
-            # ... (mostrar análisis de tiempos en caso de error, igual que antes) ...
-            tiempo_perdido_total = interrupciones_fijas + tiempo_comidas + interrupciones_variables
+        escenario = {"turno_horas": turno_horas, "desayuno": desayuno, "almuerzo": almuerzo, **interrupciones}
+        resultado = engine.compute_single(machine_config, escenario)
+        version = get_repository(current_db()).version
+        record_history_db((selected_machine_name, version, tuple(sorted(escenario.items()))),
+                          history.record_single, machine_config, escenario, resultado, version)
+        turno_minutos = resultado["turno_minutos"]
+        tiempo_comidas = resultado["tiempo_comidas"]
+        detalle_interrupciones_variables = resultado["detalle_interrupciones"]
+
+        if not resultado["valido"]:
+            tiempo_perdido_total = resultado["tiempo_perdido"]
+            st.error(f"⛔ Error: Tiempo de interrupciones ({tiempo_perdido_total:.1f} min) excede turno ({turno_minutos:.1f} min).")
             eficiencia = 0
             analysis_html = render_analysis_table(turno_minutos, 0, tiempo_perdido_total, eficiencia)
-            with st.expander("Análisis Tiempos", expanded=True): st.markdown(analysis_html, unsafe_allow_html=True)
+            with st.expander("Análisis Tiempos", expanded=True): render_html(analysis_html)
             interrupciones_dict_error = {"Calibración Fija": setup_params.get("calibracion", 0), "Otros Fijos": setup_params.get("otros", 0), "Comidas": tiempo_comidas, **detalle_interrupciones_variables}
-            with st.expander("Detalle Interrupciones", expanded=False): interruptions_html = render_interruptions_table(interrupciones_dict_error, turno_minutos); st.markdown(interruptions_html, unsafe_allow_html=True)
+            with st.expander("Detalle Interrupciones", expanded=False): interruptions_html = render_interruptions_table(interrupciones_dict_error, turno_minutos); render_html(interruptions_html)
             return
 
-        ratio_productivo = production_params.get("ratio_productivo", 1.0)
-        tiempo_efectivo_produccion = tiempo_neto_disponible * ratio_productivo
-        tiempo_detenido_ciclos = tiempo_neto_disponible * (1 - ratio_productivo)
-        unidades_por_minuto = production_params.get("unidades_por_minuto", 0)
-        peso_por_unidad_g = production_params.get("peso_por_unidad", 0)
-        unidades_estimadas = unidades_por_minuto * tiempo_efectivo_produccion
-        peso_total_kg = unidades_estimadas * peso_por_unidad_g / 1000 if peso_por_unidad_g > 0 else 0
-        eficiencia_oee = (tiempo_efectivo_produccion / turno_minutos) * 100 if turno_minutos > 0 else 0
+        tiempo_efectivo_produccion = resultado["tiempo_efectivo"]
+        tiempo_detenido_ciclos = resultado["tiempo_detenido_ciclos"]
+        unidades_estimadas = resultado["unidades"]
+        peso_total_kg = resultado["peso_kg"]
+        eficiencia_oee = resultado["eficiencia"]
 
         st.success("📈 Resultados de Producción Estimados")
+        simulacion = montecarlo.simulate([machine_config], escenario, ensayos, variabilidad) if simular else None
         res_col1, res_col2 = st.columns(2)
         with res_col1:
-            delta_unidades = unidades_estimadas * 0.05
-            st.metric("Unidades Estimadas", f"{unidades_estimadas:,.0f}", delta=f"± {delta_unidades:,.0f} uds", delta_color="off")
+            if simulacion is not None:
+                p10, _, p90 = simulacion.percentiles("unidades")[0]
+                delta_unidades = f"P10–P90: {p10:,.0f} – {p90:,.0f} uds"
+            else:
+                delta_unidades = f"± {unidades_estimadas * 0.05:,.0f} uds"
+            st.metric("Unidades Estimadas", f"{unidades_estimadas:,.0f}", delta=delta_unidades, delta_color="off")
         with res_col2:
-            delta_peso = peso_total_kg * 0.05
-            st.metric("Peso Total Estimado", f"{peso_total_kg:,.1f} kg", delta=f"± {delta_peso:,.1f} kg", delta_color="off")
+            if simulacion is not None:
+                p10, _, p90 = simulacion.percentiles("peso_kg")[0]
+                delta_peso = f"P10–P90: {p10:,.1f} – {p90:,.1f} kg"
+            else:
+                delta_peso = f"± {peso_total_kg * 0.05:,.1f} kg"
+            st.metric("Peso Total Estimado", f"{peso_total_kg:,.1f} kg", delta=delta_peso, delta_color="off")
+        if simulacion is not None:
+            render_simulation_bands(simulacion)
+
+        render_actuals(resultado, machine_config)
 
         st.subheader("⏳ Análisis de Tiempos y Eficiencia")
-        tiempo_perdido_total = turno_minutos - tiempo_efectivo_produccion
+        tiempo_perdido_total = resultado["tiempo_perdido"]
         analysis_html = render_analysis_table(turno_minutos, tiempo_efectivo_produccion, tiempo_perdido_total, eficiencia_oee)
         with st.expander("Ver Análisis de Tiempos", expanded=True):
-            st.markdown(analysis_html, unsafe_allow_html=True)
+            render_html(analysis_html)
 
         interrupciones_dict = {"Calibración Fija": setup_params.get("calibracion", 0), "Otros Fijos": setup_params.get("otros", 0), "Comidas": tiempo_comidas, **detalle_interrupciones_variables}
-        if machine_config["type"] in ["Manual", "Semi-Automática"] and tiempo_detenido_ciclos > 0:
+        if machine_config["type"] in CYCLE_MACHINE_TYPES and tiempo_detenido_ciclos > 0:
             interrupciones_dict["Paradas por Ciclo"] = tiempo_detenido_ciclos
         with st.expander("🔍 Detalle de Interrupciones", expanded=False):
             interruptions_html = render_interruptions_table(interrupciones_dict, turno_minutos)
-            st.markdown(interruptions_html, unsafe_allow_html=True)
+            render_html(interruptions_html)
 
     except KeyError as e:
         st.error(f"⛔ Error Configuración: Falta parámetro '{e}' en '{selected_machine_name}'. Edite la máquina.")
@@ -608,26 +1100,629 @@ def production_calculator_page():
         st.exception(e)
 
 
+BATCH_LABELS = {
+    "name": "Máquina", "category": "Categoría", "type": "Tipo", "unidades": "Unidades",
+    "peso_kg": "Peso (kg)", "eficiencia": "Eficiencia (%)", "tiempo_efectivo": "Tiempo Efectivo (min)",
+    "tiempo_perdido": "Tiempo Perdido (min)", "interrupciones_variables": "Interrupciones Variables (min)",
+    "valido": "Válido", "machines": "Máquinas", "eficiencia_media": "Eficiencia Media (%)",
+    "invalidas": "Sin Tiempo Neto",
+}
+CAPACITY_LABELS = {
+    "unidades_hora": "Unidades/h", "kg_hora": "kg/h", "interrupciones_fijas": "Interrupciones Fijas (min)",
+    "ratio_productivo": "Ratio Productivo",
+}
+
+@instrument.timed
+def batch_calculator_page():
+    """Una configuración de turno aplicada a varias máquinas, con totales por categoría."""
+    st.title("📦 Cálculo por Lote")
+
+    available_machines = get_all_machines_db()
+    if not available_machines:
+        st.warning("⚠️ No hay máquinas configuradas.")
+        return
+    machines_by_category = get_machines_by_category_db()
+
+    sel_col1, sel_col2 = st.columns(2)
+    with sel_col1:
+        selected_categories = st.multiselect("Categorías", options=list(machines_by_category), key="batch_categories")
+    with sel_col2:
+        search_text = st.text_input("🔎 Añadir máquinas sueltas", key="batch_machine_search",
+                                    placeholder="Nombre, categoría o descripción")
+        extra_options = [name for name in search_machines_db(search_text, SEARCH_LIMIT) if name in available_machines] if search_text.strip() else []
+        extra_options += [name for name in st.session_state.get("batch_machines", []) if name in available_machines and name not in extra_options]
+        selected_extra = st.multiselect("Máquinas", options=extra_options, key="batch_machines")
+
+    with st.expander("🏆 Máquinas de mayor capacidad", expanded=False):
+        metric_col, limit_col = st.columns([3, 1])
+        metric = metric_col.radio("Ordenar por", options=schema.CAPACITY_METRICS, horizontal=True, key="batch_top_metric",
+                                  format_func={"kg_por_minuto": "kg/h", "unidades_por_minuto_neto": "Unidades/h"}.get)
+        limit = limit_col.number_input("Máquinas", 1, 100, 10, 1, key="batch_top_limit")
+        top = top_capacity_db(metric, selected_categories, int(limit))
+        st.caption("Por hora neta disponible, en las categorías seleccionadas (o en toda la flota).")
+        if top:
+            top_df = pd.DataFrame(top)
+            top_df["unidades_hora"] = top_df["unidades_por_minuto_neto"] * 60
+            top_df["kg_hora"] = top_df["kg_por_minuto"] * 60
+            st.dataframe(top_df[["name", "category", "type", "unidades_hora", "kg_hora", "interrupciones_fijas", "ratio_productivo"]]
+                         .rename(columns={**BATCH_LABELS, **CAPACITY_LABELS}).style.format(precision=2), hide_index=True)
+
+    names = [name for category in selected_categories for name in machines_by_category[category]]
+    in_categories = set(names)
+    names += [name for name in selected_extra if name not in in_categories]
+    if not names:
+        st.info("Seleccione una o más categorías o máquinas.")
+        return
+
+    with st.expander("🔧 Configuración Operativa (común a todo el lote)", expanded=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            turno_horas = st.number_input("Duración Turno (h)", 1.0, 24.0, 8.0, 0.5, key="batch_turno_horas")
+            desayuno = st.checkbox("Incluir desayuno (15 min)", key="batch_desayuno", value=True)
+            almuerzo = st.checkbox("Incluir almuerzo (60 min)", key="batch_almuerzo", value=True)
+        with col2:
+            st.subheader("Interrupciones Variables (Eventos)")
+            st.caption("Cada evento sólo se aplica a los tipos de máquina que lo admiten.")
+            defaults = {"cambios_rollo": 2, "cambios_producto": 1}
+            interrupciones = {
+                key: st.number_input(f"Nº {etiqueta}", 0, 100, defaults.get(key, 0), 1, key=f"batch_n_{key}")
+                for key, _, etiqueta, _, _ in engine.EVENTOS_VARIABLES
+            }
+
+    escenario = {"turno_horas": turno_horas, "desayuno": desayuno, "almuerzo": almuerzo, **interrupciones}
+    selection = available_machines.take(available_machines.rows(names))
+    try:
+        results = batch.compute_batch(selection, escenario)
+        rollup = batch.category_rollup(results)
+        version = get_repository(current_db()).version
+        record_history_db((tuple(names), version, tuple(sorted(escenario.items()))), history.record_batch,
+                          {key: results[key].to_numpy() for key in results.columns}, escenario, version)
+    except Exception as e:
+        st.error(f"⛔ Error inesperado en cálculo: {e}")
+        st.exception(e)
+        return
+
+    n_invalid = int((~results["valido"]).sum())
+    if n_invalid:
+        st.warning(f"⚠️ {n_invalid} máquinas no tienen tiempo neto disponible con esta configuración (producción 0).")
+
+    st.success(f"📈 {len(results)} máquinas calculadas")
+    total_col1, total_col2, total_col3 = st.columns(3)
+    total_col1.metric("Unidades Totales", f"{results['unidades'].sum():,.0f}")
+    total_col2.metric("Peso Total", f"{results['peso_kg'].sum():,.1f} kg")
+    total_col3.metric("Eficiencia Media", f"{results['eficiencia'].mean():.1f}%")
+
+    st.subheader("🗂️ Totales por Categoría")
+    st.dataframe(rollup.rename(columns=BATCH_LABELS), hide_index=True,
+                 column_config={"Unidades": st.column_config.NumberColumn(format="%.0f"),
+                                "Peso (kg)": st.column_config.NumberColumn(format="%.1f"),
+                                "Eficiencia Media (%)": st.column_config.NumberColumn(format="%.1f")})
+
+    st.subheader("🏭 Resultados por Máquina")
+    st.dataframe(results.rename(columns=BATCH_LABELS), hide_index=True,
+                 column_config={"Unidades": st.column_config.NumberColumn(format="%.0f"),
+                                "Peso (kg)": st.column_config.NumberColumn(format="%.1f"),
+                                "Eficiencia (%)": st.column_config.NumberColumn(format="%.1f")})
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    dl_col1, dl_col2 = st.columns(2)
+    with dl_col1:
+        st.download_button("💾 Descargar resultados (CSV)", data=results.to_csv(index=False).encode("utf-8"),
+                           file_name=f"lote_{timestamp}.csv", mime="text/csv", key="batch_download")
+    with dl_col2:
+        st.download_button("💾 Descargar totales por categoría (CSV)", data=rollup.to_csv(index=False).encode("utf-8"),
+                           file_name=f"lote_categorias_{timestamp}.csv", mime="text/csv", key="batch_rollup_download")
+
+    with st.expander("🎲 Simulación Monte Carlo del lote", expanded=False):
+        variabilidad, ensayos = variability_inputs("batch")
+        if st.button("▶️ Simular lote", key="batch_simulate"):
+            with st.spinner(f"Simulando {ensayos:,} turnos × {len(names)} máquinas..."):
+                simulacion = montecarlo.simulate(selection, escenario, ensayos, variabilidad)
+            categories = results["category"].to_numpy()
+            category_bands = []
+            for category in rollup["category"]:
+                rows = categories == category
+                category_bands.append([category, *simulacion.total_percentiles("unidades", rows),
+                                       *simulacion.total_percentiles("peso_kg", rows)])
+            st.subheader("🗂️ Totales por Categoría (P10 / P50 / P90)")
+            band_columns = [f"{label} P{q}" for label in ("Unidades", "Peso (kg)") for q in montecarlo.PERCENTILES]
+            st.dataframe(pd.DataFrame(category_bands, columns=["Categoría", *band_columns]).style.format("{:,.1f}", subset=band_columns),
+                         hide_index=True)
+            st.subheader("🏭 Por Máquina (P10 / P50 / P90)")
+            machine_bands = pd.DataFrame(
+                np.hstack([simulacion.percentiles("unidades"), simulacion.percentiles("peso_kg")]), columns=band_columns)
+            machine_bands.insert(0, "Máquina", simulacion.names)
+            st.dataframe(machine_bands.style.format("{:,.1f}", subset=band_columns), hide_index=True)
+
+
 # --- Función Principal y Navegación (igual que antes) ---
-def main():
-    with st.sidebar:
-        st.title("📊 Menú Principal")
-        st.markdown("---")
-        page_selection = st.radio(
-            "Seleccione una página:",
-            ("🧮 Calculadora", "⚙️ Configurar Máquinas"),
-            key="page_selector",
-            index=0 if st.session_state.get('current_page', 'calculator') == 'calculator' else 1
+SWEEP_METRICS = {"unidades": "Unidades", "peso_kg": "Peso (kg)", "eficiencia": "Eficiencia (%)"}
+SWEEP_AXIS_LABELS = {
+    "turno_horas": "Duración Turno (h)", "desayuno": "Desayuno", "almuerzo": "Almuerzo",
+    **{key: f"Nº {etiqueta}" for key, _, etiqueta, _, _ in engine.EVENTOS_VARIABLES},
+}
+SWEEP_BASE = {"turno_horas": 8.0, "desayuno": True, "almuerzo": True, "cambios_rollo": 2, "cambios_producto": 1}
+
+@st.cache_resource
+def get_background_executor():
+    """Pool de hilos del proceso para cálculos largos fuera del hilo del script de Streamlit."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="plas2-bg")
+
+def format_axis_value(axis, value):
+    if axis in ("desayuno", "almuerzo"):
+        return "Sí" if value else "No"
+    return f"{value:g}"
+
+@st.fragment(run_every=0.5)
+def sweep_progress_fragment():
+    """Muestra el progreso del barrido en curso; al terminar relanza la página para pintar los gráficos."""
+    job = st.session_state.get("sweep_job")
+    if job is None:
+        return
+    if job["future"].done():
+        st.rerun()
+    done, total = job["progress"]
+    st.progress(done / total if total else 0.0, text=f"Calculando {done:,} / {total:,} escenarios...")
+
+def render_sweep_results(result, base_index):
+    metric = st.radio("Métrica", options=list(SWEEP_METRICS), format_func=SWEEP_METRICS.get, horizontal=True, key="sweep_metric")
+    label = SWEEP_METRICS[metric]
+    base_value = float(getattr(result, metric)[base_index])
+    base_text = ", ".join(f"{SWEEP_AXIS_LABELS[axis]} = {format_axis_value(axis, result.grid.values[axis][i].item())}"
+                          for axis, i in zip(sweep.AXES, base_index) if axis in result.grid.varying_axes)
+    st.caption(f"Escenario base: {base_text or 'único punto'} → {label}: {base_value:,.1f}")
+
+    st.subheader("🌪️ Sensibilidad (tornado)")
+    rows = []
+    for row in sweep.tornado(result, metric, base_index):
+        axis_label = SWEEP_AXIS_LABELS[row["axis"]]
+        rows.append({"Eje": axis_label, "Extremo": f"Mínimo ({format_axis_value(row['axis'], row['low_value'])})",
+                     "Desde": row["base"], "Hasta": row["low"]})
+        rows.append({"Eje": axis_label, "Extremo": f"Máximo ({format_axis_value(row['axis'], row['high_value'])})",
+                     "Desde": row["base"], "Hasta": row["high"]})
+    if rows:
+        tornado_df = pd.DataFrame(rows)
+        order = list(dict.fromkeys(tornado_df["Eje"]))
+        bars = alt.Chart(tornado_df).mark_bar().encode(
+            y=alt.Y("Eje:N", sort=order, title=None),
+            x=alt.X("Desde:Q", title=label),
+            x2="Hasta:Q",
+            color=alt.Color("Extremo:N", legend=None),
+            tooltip=["Eje", "Extremo", alt.Tooltip("Hasta:Q", format=",.1f", title=label)],
+        )
+        rule = alt.Chart(pd.DataFrame({"base": [base_value]})).mark_rule(strokeDash=[4, 4]).encode(x="base:Q")
+        st.altair_chart(bars + rule)
+    else:
+        st.info("Sólo hay un valor por eje: amplíe algún rango para ver la sensibilidad.")
+
+    varying = list(result.grid.varying_axes)
+    if len(varying) >= 2:
+        st.subheader("🔥 Mapa de calor")
+        hm_col1, hm_col2 = st.columns(2)
+        x_axis = hm_col1.selectbox("Eje X", options=varying, index=0, format_func=SWEEP_AXIS_LABELS.get, key="sweep_heatmap_x")
+        y_axis = hm_col2.selectbox("Eje Y", options=[axis for axis in varying if axis != x_axis], index=0,
+                                   format_func=SWEEP_AXIS_LABELS.get, key="sweep_heatmap_y")
+        matrix = sweep.heatmap(result, metric, x_axis, y_axis, base_index)
+        x_values = [format_axis_value(x_axis, v.item()) for v in result.grid.values[x_axis]]
+        y_values = [format_axis_value(y_axis, v.item()) for v in result.grid.values[y_axis]]
+        heatmap_df = pd.DataFrame({
+            "x": [x for _ in y_values for x in x_values],
+            "y": [y for y in y_values for _ in x_values],
+            "valor": matrix.ravel(),
+        })
+        chart = alt.Chart(heatmap_df).mark_rect().encode(
+            x=alt.X("x:O", sort=x_values, title=SWEEP_AXIS_LABELS[x_axis]),
+            y=alt.Y("y:O", sort=y_values, title=SWEEP_AXIS_LABELS[y_axis]),
+            color=alt.Color("valor:Q", title=label),
+            tooltip=[alt.Tooltip("x:O", title=SWEEP_AXIS_LABELS[x_axis]), alt.Tooltip("y:O", title=SWEEP_AXIS_LABELS[y_axis]),
+                     alt.Tooltip("valor:Q", format=",.1f", title=label)],
+        )
+        st.altair_chart(chart)
+
+@instrument.timed
+def sweep_page():
+    """Barrido de escenarios: producto cartesiano de rangos de turno, comidas e interrupciones."""
+    st.title("🔬 Análisis de Sensibilidad")
+
+    available_machines = get_all_machines_db()
+    if not available_machines:
+        st.warning("⚠️ No hay máquinas configuradas.")
+        return
+
+    target = st.radio("Barrer sobre", options=["Máquina", "Categoría"], horizontal=True, key="sweep_target")
+    if target == "Máquina":
+        name = machine_picker(available_machines, key="sweep_machine", search_key="sweep_machine_search")
+        configs, target_label = available_machines.take(available_machines.rows([name])), name
+    else:
+        machines_by_category = get_machines_by_category_db()
+        category = st.selectbox("Categoría", options=list(machines_by_category), key="sweep_category")
+        configs = available_machines.take(available_machines.category_rows(category))
+        target_label = f"{category} ({len(configs)} máquinas)"
+
+    with st.expander("📐 Rangos del barrido", expanded=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            turno_min, turno_max = st.slider("Duración Turno (h)", 1.0, 24.0, (6.0, 12.0), 0.5, key="sweep_turno")
+            comidas = {
+                meal: st.multiselect(label, options=[True, False], default=[True], format_func=lambda v: "Sí" if v else "No",
+                                     key=f"sweep_{meal}")
+                for meal, label in (("desayuno", "Desayuno (15 min)"), ("almuerzo", "Almuerzo (60 min)"))
+            }
+        with col2:
+            eventos = {}
+            for key, _, etiqueta, _, _ in engine.EVENTOS_VARIABLES:
+                low, high = st.slider(f"Nº {etiqueta}", 0, 30, (0, 5 if key in SWEEP_BASE else 0), 1, key=f"sweep_{key}")
+                eventos[key] = range(low, high + 1)
+    try:
+        grid = sweep.SweepGrid.from_ranges(
+            turno_horas=[turno_min + 0.5 * i for i in range(int(round((turno_max - turno_min) / 0.5)) + 1)],
+            **comidas, **eventos,
         )
-        if page_selection == "🧮 Calculadora": st.session_state.current_page = "calculator"
-        else: st.session_state.current_page = "configuration"
-        st.markdown("---")
-        st.info(f"BD: `{DATABASE_FILE}`")
-        st.caption(f"Fecha: {datetime.now().strftime('%Y-%m-%d')}")
-
-    if st.session_state.current_page == "calculator": production_calculator_page()
-    elif st.session_state.current_page == "configuration": machine_configuration_page()
-    else: st.session_state.current_page = "calculator"; production_calculator_page()
+    except ValueError as e:
+        st.error(f"⛔ {e}")
+        return
+    st.caption(f"{grid.size:,} escenarios × {len(configs)} máquinas = {grid.size * len(configs):,} cálculos")
+
+    job = st.session_state.get("sweep_job")
+    running = job is not None and not job["future"].done()
+    if st.button("▶️ Ejecutar barrido", key="run_sweep", type="primary", disabled=running or not configs):
+        progress = [0, grid.size]
+        def report(done, total):
+            progress[0] = done
+        future = get_background_executor().submit(sweep.run_sweep, configs, grid, report)
+        st.session_state.sweep_job = {"future": future, "progress": progress, "target": target_label}
+        running = True
+    if running:
+        sweep_progress_fragment() # El cálculo corre en otro hilo: la página sigue respondiendo
+        return
+
+    job = st.session_state.get("sweep_job")
+    if job is None:
+        return
+    try:
+        result = job["future"].result()
+    except ValueError as e:
+        st.error(f"⛔ {e}")
+        return
+    except Exception as e:
+        st.error(f"⛔ Error inesperado en el barrido: {e}")
+        st.exception(e)
+        return
+    st.success(f"📈 Barrido de {result.grid.size:,} escenarios para {job['target']}")
+    render_sweep_results(result, result.grid.nearest_index(SWEEP_BASE))
+
+
+WEEKDAYS = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+PLAN_EVENTS = {key: etiqueta for key, _, etiqueta, _, _ in engine.EVENTOS_VARIABLES}
+PLAN_PERIODS = {"day": "Diario", "week": "Semanal", "month": "Mensual"}
+PLAN_GROUPS = {"fleet": "Flota", "category": "Categoría", "machine": "Máquina"}
+
+def default_shift_pattern():
+    rows = []
+    for weekday, name in enumerate(WEEKDAYS):
+        rows.append({"Día": name, "Turnos": 2 if weekday < 5 else (1 if weekday == 5 else 0), "Horas por Turno": 8.0,
+                     "Desayuno": True, "Almuerzo": True, **{label: 2 if key == "cambios_rollo" else (1 if key == "cambios_producto" else 0)
+                                                            for key, label in PLAN_EVENTS.items()}})
+    return pd.DataFrame(rows)
+
+def shift_from_row(row, counts=None):
+    """Escenario de un turno a partir de una fila del patrón semanal (con cambios opcionales del día)."""
+    shift = {"turno_horas": float(row["Horas por Turno"]), "desayuno": bool(row["Desayuno"]), "almuerzo": bool(row["Almuerzo"])}
+    shift.update((key, int(row[label] or 0)) for key, label in PLAN_EVENTS.items())
+    shift.update(counts or {})
+    return shift
+
+@instrument.timed
+def planning_page():
+    """Capacidad por máquina y día sobre un calendario de turnos, festivos, mantenimientos y planes de cambios."""
+    st.title("🗓️ Planificación de Capacidad")
+
+    available_machines = get_all_machines_db()
+    if not available_machines:
+        st.warning("⚠️ No hay máquinas configuradas.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    today = datetime.now().date()
+    start = col1.date_input("Inicio", value=today - timedelta(days=today.weekday()) + timedelta(days=7), key="plan_start")
+    weeks = col2.number_input("Horizonte (semanas)", 1, 52, 4, 1, key="plan_weeks")
+    selected = col3.multiselect("Categorías (vacío = toda la flota)", options=available_machines.category_values, key="plan_categories")
+    configs = available_machines # La misma tabla entre reruns: el plan no tiene que comparar máquinas
+    if selected:
+        configs = available_machines.take(np.sort(np.concatenate([available_machines.category_rows(c) for c in selected])))
+    names = configs.names.tolist()
+
+    with st.expander("🕒 Patrón semanal de turnos", expanded=True):
+        pattern_df = st.data_editor(default_shift_pattern(), key="plan_pattern", hide_index=True, disabled=["Día"],
+                                    column_config={"Turnos": st.column_config.NumberColumn(min_value=0, max_value=3, step=1),
+                                                   "Horas por Turno": st.column_config.NumberColumn(min_value=0.5, max_value=24.0, step=0.5)})
+    col1, col2 = st.columns(2)
+    with col1:
+        with st.expander("🎉 Festivos", expanded=False):
+            holidays_df = st.data_editor(pd.DataFrame({"Fecha": pd.Series(dtype="object")}), key="plan_holidays",
+                                         num_rows="dynamic", hide_index=True, column_config={"Fecha": st.column_config.DateColumn(required=True)})
+        with st.expander("🔁 Plan de cambios por día", expanded=False):
+            st.caption("Sustituye los nº de cambios de todos los turnos de ese día.")
+            overrides_df = st.data_editor(pd.DataFrame({"Fecha": pd.Series(dtype="object"), **{label: pd.Series(dtype="int") for label in PLAN_EVENTS.values()}}),
+                                          key="plan_overrides", num_rows="dynamic", hide_index=True,
+                                          column_config={"Fecha": st.column_config.DateColumn(required=True)})
+    with col2:
+        with st.expander("🛠️ Mantenimientos planificados", expanded=False):
+            maintenance_df = st.data_editor(pd.DataFrame({"Máquina": pd.Series(dtype="object"), "Fecha": pd.Series(dtype="object"), "Minutos": pd.Series(dtype="float")}),
+                                            key="plan_maintenance", num_rows="dynamic", hide_index=True,
+                                            column_config={"Máquina": st.column_config.SelectboxColumn(options=names, required=True),
+                                                           "Fecha": st.column_config.DateColumn(required=True),
+                                                           "Minutos": st.column_config.NumberColumn(min_value=0, required=True)})
+
+    pattern = {weekday: [shift_from_row(row)] * int(row["Turnos"] or 0) for weekday, row in pattern_df.iterrows()}
+    overrides = {}
+    for _, row in overrides_df.dropna(subset=["Fecha"]).iterrows():
+        day = pd.Timestamp(row["Fecha"]).date()
+        counts = {key: int(row[label]) for key, label in PLAN_EVENTS.items() if pd.notna(row[label])}
+        overrides[day] = planning.with_changeovers(pattern[day.weekday()], counts)
+    holidays = {pd.Timestamp(day).date() for day in holidays_df["Fecha"].dropna()}
+    maintenance = defaultdict(float)
+    for _, row in maintenance_df.dropna().iterrows():
+        maintenance[(row["Máquina"], pd.Timestamp(row["Fecha"]).date())] += float(row["Minutos"])
+    calendar = planning.ShiftCalendar(start, int(weeks) * 7, pattern, holidays, overrides)
+
+    # El plan se conserva en la sesión: al editar sólo se recalculan los días,
+    # máquinas o mantenimientos que cambiaron (el horizonte sólo al cambiar fechas)
+    plan = st.session_state.get("capacity_plan")
+    if plan is None or plan.dates != calendar.dates:
+        plan = st.session_state.capacity_plan = planning.CapacityPlan(configs, calendar, maintenance)
+        st.caption(f"Plan calculado: {len(plan.machines):,} máquinas × {len(plan.dates)} días.")
+    else:
+        changes = (plan.apply_machines(configs), plan.apply_calendar(calendar), plan.apply_maintenance(maintenance))
+        if any(changes):
+            st.caption("Recalculado: {} máquinas, {} días, {} mantenimientos.".format(*changes))
+
+    fleet = plan.table("day", "fleet")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Unidades en el Horizonte", f"{fleet['unidades'].sum():,.0f}")
+    col2.metric("Peso en el Horizonte", f"{fleet['peso_kg'].sum():,.1f} kg")
+    turno_total = fleet["turno_minutos"].sum()
+    col3.metric("Eficiencia Media", f"{fleet['tiempo_efectivo'].sum() / turno_total * 100:.1f}%" if turno_total else "—")
+    st.subheader("📈 Capacidad diaria de la flota")
+    st.bar_chart(pd.DataFrame({"Fecha": fleet["period_start"], "Unidades": fleet["unidades"]}).set_index("Fecha"))
+
+    col1, col2 = st.columns(2)
+    period = col1.radio("Periodo", options=list(PLAN_PERIODS), index=1, format_func=PLAN_PERIODS.get, horizontal=True, key="plan_period")
+    group = col2.radio("Agrupar por", options=list(PLAN_GROUPS), index=1, format_func=PLAN_GROUPS.get, horizontal=True, key="plan_group")
+    table = pd.DataFrame(plan.table(period, group)).rename(columns={
+        "period_start": "Inicio Periodo", "key": PLAN_GROUPS[group], "unidades": "Unidades", "peso_kg": "Peso (kg)",
+        "tiempo_efectivo": "Tiempo Efectivo (min)", "turno_minutos": "Tiempo de Turno (min)",
+        "mantenimiento_min": "Mantenimiento (min)", "eficiencia": "Eficiencia (%)",
+    })
+    st.dataframe(table, hide_index=True)
+    st.download_button("📥 Descargar CSV", table.to_csv(index=False).encode("utf-8"), file_name=f"capacidad_{period}_{group}.csv",
+                       mime="text/csv", key="plan_download")
+
+
+ORDER_EDITOR_COLUMNS = {"pedido": "Pedido", "producto": "Producto", "cantidad": "Cantidad", "unidad": "Unidad", "entrega": "Entrega"}
+SCHEDULE_LABELS = {
+    "machine": "Máquina", "kind": "Tipo", "order": "Pedido", "product": "Producto", "start": "Inicio", "end": "Fin",
+    "due": "Entrega", "late_min": "Retraso (min)", "pedidos": "Pedidos", "produccion_min": "Producción (min)",
+    "cambio_min": "Cambios (min)", "libre_min": "Libre (min)", "utilizacion": "Utilización (%)",
+}
+
+def orders_from_editor(df):
+    """Convierte las filas del editor de pedidos en ``scheduler.Order`` (la entrega vence al final del día)."""
+    orders, errors = [], []
+    for i, row in df.iterrows():
+        if pd.isna(row["Producto"]) or pd.isna(row["Cantidad"]) or pd.isna(row["Entrega"]):
+            errors.append(f"Fila {i + 1}: faltan producto, cantidad o entrega.")
+            continue
+        order_id = str(row["Pedido"]) if pd.notna(row["Pedido"]) and str(row["Pedido"]).strip() else f"#{i + 1}"
+        due = datetime.combine(pd.Timestamp(row["Entrega"]).date(), time(23, 59))
+        orders.append(scheduler.Order(order_id, str(row["Producto"]), float(row["Cantidad"]), row["Unidad"] or "uds", due))
+    return orders, errors
+
+@instrument.timed
+def scheduler_page():
+    """Asignación y secuencia de pedidos entre las máquinas de una categoría, minimizando cambios y retrasos."""
+    st.title("🏗️ Programación de Pedidos")
+
+    machines_by_category = get_machines_by_category_db()
+    available_machines = get_all_machines_db()
+    if not available_machines:
+        st.warning("⚠️ No hay máquinas configuradas.")
+        return
+    category = st.selectbox("Categoría", options=list(machines_by_category), key="sched_category")
+    configs = available_machines.take(available_machines.category_rows(category))
+    st.caption(f"{len(configs)} máquinas. El cambio de producto cuesta el 'cambio_producto' de cada máquina.")
+
+    with st.expander("📋 Pedidos", expanded=True):
+        uploaded = st.file_uploader("Importar CSV (pedido, producto, cantidad, unidad, entrega)", type=["csv"], key="sched_upload")
+        if uploaded is not None:
+            try:
+                initial = pd.read_csv(uploaded).rename(columns=ORDER_EDITOR_COLUMNS)[list(ORDER_EDITOR_COLUMNS.values())]
+                initial["Entrega"] = pd.to_datetime(initial["Entrega"]).dt.date
+            except (ValueError, KeyError) as e:
+                st.error(f"⛔ CSV de pedidos no válido: {e}")
+                return
+        else:
+            initial = pd.DataFrame({"Pedido": pd.Series(dtype="object"), "Producto": pd.Series(dtype="object"),
+                                    "Cantidad": pd.Series(dtype="float"), "Unidad": pd.Series(dtype="object"),
+                                    "Entrega": pd.Series(dtype="object")})
+        orders_df = st.data_editor(initial, key=f"sched_orders_{uploaded.name if uploaded else ''}", num_rows="dynamic", hide_index=True,
+                                   column_config={"Cantidad": st.column_config.NumberColumn(min_value=0),
+                                                  "Unidad": st.column_config.SelectboxColumn(options=list(scheduler.ORDER_UNITS), default="uds"),
+                                                  "Entrega": st.column_config.DateColumn()})
+
+    with st.expander("🔧 Turnos y optimización", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        start_date = col1.date_input("Inicio", value=datetime.now().date(), key="sched_start")
+        turnos = col1.number_input("Turnos por día", 1, 3, 2, 1, key="sched_turnos")
+        turno_horas = col2.number_input("Duración Turno (h)", 1.0, 24.0, 8.0, 0.5, key="sched_turno_horas")
+        desayuno = col2.checkbox("Incluir desayuno (15 min)", value=True, key="sched_desayuno")
+        almuerzo = col2.checkbox("Incluir almuerzo (60 min)", value=True, key="sched_almuerzo")
+        budget = col3.slider("Tiempo de optimización (s)", 1, 30, 3, key="sched_budget")
+        changeover_weight = col3.number_input("Peso de 1 min de cambio", 0.0, 100.0, 1.0, 0.5, key="sched_w_changeover")
+        lateness_weight = col3.number_input("Peso de 1 min de retraso", 0.0, 100.0, 1.0, 0.5, key="sched_w_lateness")
+
+    orders, errors = orders_from_editor(orders_df)
+    for message in errors:
+        st.warning(f"⚠️ {message}")
+    if st.button("▶️ Programar", key="run_scheduler", type="primary", disabled=not orders or not configs):
+        day_shifts = [{"turno_horas": turno_horas, "desayuno": desayuno, "almuerzo": almuerzo}] * int(turnos)
+        try:
+            with st.spinner(f"Optimizando {len(orders)} pedidos en {len(configs)} máquinas ({budget} s)..."):
+                st.session_state.schedule_result = scheduler.schedule(
+                    configs, orders, datetime.combine(start_date, time(0, 0)), day_shifts, budget, changeover_weight, lateness_weight)
+        except ValueError as e:
+            st.error(f"⛔ {e}")
+            return
+
+    result = st.session_state.get("schedule_result")
+    if result is None:
+        return
+    if result.unassigned:
+        st.warning(f"⚠️ {len(result.unassigned)} pedidos sin máquina capaz (sin unidades/min o sin peso por unidad para kg).")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Tiempo de Cambios", f"{result.changeover_min:,.0f} min")
+    col2.metric("Retraso Total", f"{result.lateness_min / 60:,.1f} h")
+    col3.metric("Pedidos con Retraso", f"{result.late_orders:,} / {len(result.problem.orders) - len(result.unassigned):,}")
+    col4.metric("Iteraciones", f"{result.iterations:,}")
+
+    rows = pd.DataFrame(result.rows())
+    st.subheader("📅 Diagrama de Gantt")
+    gantt = alt.Chart(rows.rename(columns=SCHEDULE_LABELS)).mark_bar().encode(
+        x=alt.X("Inicio:T"), x2="Fin:T", y=alt.Y("Máquina:N", title=None),
+        color=alt.condition(alt.datum.Tipo == "cambio", alt.value("#9e9e9e"), alt.Color("Producto:N", legend=None)),
+        tooltip=["Máquina", "Tipo", "Pedido", "Producto", alt.Tooltip("Inicio:T", format="%Y-%m-%d %H:%M"),
+                 alt.Tooltip("Fin:T", format="%Y-%m-%d %H:%M"), alt.Tooltip("Retraso (min):Q", format=",.0f")],
+    ).properties(height=min(40 + 22 * len(result.problem.names), 1200))
+    st.altair_chart(gantt)
+
+    st.subheader("⚙️ Utilización por máquina")
+    utilization = pd.DataFrame(result.utilization()).rename(columns=SCHEDULE_LABELS)
+    st.bar_chart(utilization.set_index("Máquina")[["Producción (min)", "Cambios (min)", "Libre (min)"]])
+    st.dataframe(utilization, hide_index=True)
+
+    with st.expander("Programa detallado", expanded=False):
+        table = rows.rename(columns=SCHEDULE_LABELS)
+        st.dataframe(table, hide_index=True)
+        st.download_button("📥 Descargar CSV", table.to_csv(index=False).encode("utf-8"), file_name="programa.csv",
+                           mime="text/csv", key="sched_download")
+
+
+HISTORY_PERIODS = {"day": "Diario", "week": "Semanal"}
+HISTORY_SCOPES = {"machine": "Máquina", "category": "Categoría"}
+
+@instrument.timed
+def history_page():
+    """Tendencias de los cálculos registrados, desde los agregados diarios/semanales."""
+    st.title("📜 Historial de Cálculos")
+    col1, col2, col3 = st.columns(3)
+    scope = col1.radio("Ámbito", options=list(HISTORY_SCOPES), format_func=HISTORY_SCOPES.get, horizontal=True, key="history_scope")
+    period = col2.radio("Periodo", options=list(HISTORY_PERIODS), format_func=HISTORY_PERIODS.get, horizontal=True, key="history_period")
+    keys = history_keys_db(scope)
+    if not keys:
+        st.info("ℹ️ Todavía no hay cálculos registrados.")
+        return
+    key = col3.selectbox(HISTORY_SCOPES[scope], options=keys, key=f"history_key_{scope}")
+    today = datetime.now().date()
+    date_range = st.date_input("Rango de fechas", value=(today - timedelta(days=365), today), key="history_range")
+    if len(date_range) != 2:
+        st.info("Seleccione fecha de inicio y de fin.")
+        return
+    start, end = (d.isoformat() for d in date_range)
+
+    rows = history_trend_db(scope, key, period, start, end)
+    if not rows:
+        st.info("Sin cálculos en el rango seleccionado.")
+    else:
+        trend = pd.DataFrame(rows).set_index("period_start")
+        st.subheader(f"📈 Unidades por cálculo ({HISTORY_PERIODS[period].lower()})")
+        st.line_chart(trend[["unidades_media", "unidades_min", "unidades_max"]].rename(
+            columns={"unidades_media": "Media", "unidades_min": "Mínimo", "unidades_max": "Máximo"}))
+        st.subheader("⚙️ Eficiencia media (%)")
+        st.line_chart(trend[["eficiencia_media"]].rename(columns={"eficiencia_media": "Eficiencia Media (%)"}))
+        with st.expander("Tabla", expanded=False):
+            st.dataframe(trend)
+
+    st.subheader("🕒 Últimos cálculos")
+    recent = recent_history_db(50, key if scope == "machine" else None)
+    if recent:
+        st.dataframe(pd.DataFrame(recent), hide_index=True)
+
+PLANT_LABELS = {
+    "plant": "Planta", "category": "Categoría", "machines": "Máquinas", "unidades_hora": "Unidades/h netas",
+    "kg_hora": "kg/h", "max_kg_hora": "Mejor Máquina (kg/h)",
+}
+
+@instrument.timed
+def plants_page():
+    """Capacidad de toda la flota: cada planta en su BD, consultadas en paralelo y combinadas."""
+    st.title("🌐 Flota por Planta")
+    st.caption("Suma de las capacidades por hora netas (constantes materializadas) de cada planta.")
+    rows = fleet_report_db()
+    if not rows:
+        st.info("ℹ️ No hay máquinas en ninguna planta.")
+        return
+    by_plant = plants.rollup_report(rows, by="plant")
+    total_col1, total_col2, total_col3 = st.columns(3)
+    total_col1.metric("Máquinas", f"{sum(row[2] for row in by_plant):,}")
+    total_col2.metric("Unidades/h netas", f"{sum(row[3] for row in by_plant):,.0f}")
+    total_col3.metric("kg/h", f"{sum(row[4] for row in by_plant):,.1f}")
+
+    st.subheader("🏭 Por planta")
+    st.dataframe(pd.DataFrame(by_plant, columns=plants.REPORT_COLUMNS).drop(columns="category").rename(columns=PLANT_LABELS),
+                 hide_index=True)
+    st.subheader("📁 Por categoría (todas las plantas)")
+    st.dataframe(pd.DataFrame(plants.rollup_report(rows, by="category"), columns=plants.REPORT_COLUMNS)
+                 .drop(columns="plant").rename(columns=PLANT_LABELS), hide_index=True)
+    detail = pd.DataFrame(rows, columns=plants.REPORT_COLUMNS)
+    with st.expander("Detalle por planta y categoría", expanded=False):
+        st.dataframe(detail.rename(columns=PLANT_LABELS), hide_index=True)
+    st.download_button("⬇️ Descargar detalle (CSV)", detail.to_csv(index=False).encode("utf-8"),
+                       file_name="flota_por_planta.csv", mime="text/csv", key="plants_export")
+
+
+PAGES = {"🧮 Calculadora": "calculator", "📦 Cálculo por Lote": "batch", "🔬 Sensibilidad": "sweep", "🗓️ Planificación": "planning", "🏗️ Programación": "scheduler", "📜 Historial": "history", "🌐 Flota por Planta": "plants", "⚙️ Configurar Máquinas": "configuration"}
+
+def main():
+    # Configuración de la página, BD y CSS sólo al ejecutar la app: importar este
+    # módulo no tiene efectos (el núcleo sin Streamlit está en el paquete plas2)
+    st.set_page_config(page_title="Calculadora de Producción v3 (Categorías)", layout="wide")
+    with diagnostics_recording("app") as recorder:
+        with st.sidebar: # La planta decide la BD, así que se elige antes de inicializarla
+            st.title("📊 Menú Principal")
+            plant_selector()
+        init_db()
+        render_html(APP_CSS)
+
+        with st.sidebar:
+            st.markdown("---")
+            current_page = st.session_state.get('current_page', 'calculator')
+            page_values = list(PAGES.values())
+            page_selection = st.radio(
+                "Seleccione una página:",
+                list(PAGES),
+                key="page_selector",
+                index=page_values.index(current_page) if current_page in page_values else 0
+            )
+            st.session_state.current_page = PAGES[page_selection]
+            st.markdown("---")
+            st.info(f"BD: `{current_db()}`")
+            st.caption(f"Fecha: {datetime.now().strftime('%Y-%m-%d')}")
+            st.toggle("🩺 Diagnóstico de rendimiento", key="diagnostics_enabled",
+                      help="Mide cada ejecución: tiempo por página y por función de BD, consultas SQL, filas leídas y HTML enviado.")
+            diagnostics_panel = st.container()
+
+        if st.session_state.current_page == "calculator": production_calculator_page()
+        elif st.session_state.current_page == "batch": batch_calculator_page()
+        elif st.session_state.current_page == "sweep": sweep_page()
+        elif st.session_state.current_page == "planning": planning_page()
+        elif st.session_state.current_page == "scheduler": scheduler_page()
+        elif st.session_state.current_page == "history": history_page()
+        elif st.session_state.current_page == "plants": plants_page()
+        elif st.session_state.current_page == "configuration": machine_configuration_page()
+        else: st.session_state.current_page = "calculator"; production_calculator_page()
+    if recorder is not None:
+        with diagnostics_panel:
+            render_diagnostics(recorder.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Núcleo de la Calculadora de Producción (sin dependencia de Streamlit)."""
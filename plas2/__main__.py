@@ -0,0 +1,7 @@
+"""Permite ``python -m plas2``; ver ``plas2.cli``."""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
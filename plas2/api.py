@@ -0,0 +1,324 @@
+"""API HTTP/JSON local (ASGI) sobre la misma BD que la aplicación Streamlit.
+
+Rutas::
+
+    GET  /health
+    GET  /machines[?category=X]
+    GET  /machines/{nombre}
+    GET  /calc?machine=X&turno_horas=8&desayuno=1&almuerzo=1&cambios_rollo=2...
+    POST /calc        {"machine": "X", "scenario": {...}}
+    POST /calc/batch  {"machines": [...], "categories": [...], "scenario": {...}, "rollup": false}
+
+Los handlers son ``async``; la lectura de la BD (a través del repositorio
+compartido) y el cálculo se ejecutan en un pool de hilos para no bloquear el
+bucle de eventos. Las respuestas ya serializadas se guardan en una caché LRU
+cuya clave incluye el contador de cambios de la BD (``machines_version``):
+cualquier alta, edición o baja, desde la app o desde otro proceso, invalida
+las entradas anteriores sin tener que recorrerlas.
+
+Se sirve con cualquier servidor ASGI, p. ej. ``python -m plas2 serve`` o
+``uvicorn plas2.api:app``. ``uvicorn`` es una dependencia opcional (no está en
+el Pipfile.lock): ``pip install uvicorn``.
+"""
+
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from .constants import DEFAULT_CATEGORY
+from .machines import init_db
+from .repository import get_repository
+
+DEFAULT_DB = "production_data_v3.db"
+CACHE_SIZE = 4096
+MAX_BODY_BYTES = 1024 * 1024
+EVENT_KEYS = ("cambios_rollo", "cambios_producto", "cambios_cuchillo", "cambios_perforador",
+              "cambios_paquete", "cambios_empaque")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ResponseCache:
+    """LRU de respuestas serializadas. Sólo se usa desde el hilo del bucle de eventos."""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+def _name(data, key):
+    """``data[key]`` como nombre (texto no vacío); 400 si falta o no es texto."""
+    value = data.get(key)
+    if not isinstance(value, str) or not value:
+        raise HTTPError(400, f"'{key}' debe ser un nombre (texto)")
+    return value
+
+
+def _names(data, key):
+    """``data[key]`` como lista de nombres (vacía si falta); 400 si no es una lista de textos."""
+    values = data.get(key)
+    if values is None:
+        return []
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise HTTPError(400, f"'{key}' debe ser una lista de nombres (texto)")
+    return values
+
+
+def _flag(data, key, default):
+    """``data[key]`` como booleano; en texto (p. ej. de la query string) "0", "false" y "no" son falsos."""
+    value = data.get(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() not in ("0", "false", "no", "")
+    return bool(value)
+
+
+def _scenario(data):
+    """Valida y normaliza el escenario (mismas claves que la calculadora)."""
+    def number(key, default, kind=float):
+        value = data.get(key, default)
+        expected = "un número entero" if kind is int else "numérico"
+        try:
+            if isinstance(value, bool):
+                raise TypeError
+            converted = kind(value)
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"'{key}' debe ser {expected}") from None
+        if converted != float(value): # int() truncaría 1.7 a 1
+            raise HTTPError(400, f"'{key}' debe ser {expected}")
+        if converted < 0:
+            raise HTTPError(400, f"'{key}' no puede ser negativo")
+        return converted
+
+    turno_horas = number("turno_horas", 8.0)
+    if not 0 < turno_horas <= 24:
+        raise HTTPError(400, "'turno_horas' debe estar entre 0 y 24")
+    scenario = {"turno_horas": turno_horas, "desayuno": _flag(data, "desayuno", True),
+                "almuerzo": _flag(data, "almuerzo", True)}
+    scenario.update((key, number(key, 0, int)) for key in EVENT_KEYS)
+    return scenario
+
+
+def _machine_json(machine):
+    return {
+        "name": machine["name"],
+        "type": machine["type"],
+        "category": machine.get("category") or DEFAULT_CATEGORY,
+        "description": machine.get("description"),
+        "profile": machine.get("profile"),
+        "updated_at": machine.get("updated_at") or machine.get("created_at"),
+        "setup_params": machine["setup_params"],
+        "production_params": machine["production_params"],
+    }
+
+
+def _calc_single(machine, scenario):
+    from . import engine # NumPy sólo cuando se calcula
+
+    result = engine.compute_single(machine, scenario)
+    return {"machine": machine["name"], "category": machine.get("category") or DEFAULT_CATEGORY,
+            "scenario": scenario, "result": result}
+
+
+def _calc_batch(machines, scenario, rollup):
+    from . import batch
+
+    columns = batch.compute_columns(machines, scenario)
+    body = {"scenario": scenario, "machines": len(machines)}
+    rollup_columns = batch.rollup_columns(columns)
+    body["rollup"] = [dict(zip(batch.ROLLUP_COLUMNS, row))
+                      for row in zip(*(rollup_columns[key].tolist() for key in batch.ROLLUP_COLUMNS))]
+    if not rollup:
+        body["results"] = [dict(zip(batch.RESULT_COLUMNS, row))
+                           for row in zip(*(columns[key].tolist() for key in batch.RESULT_COLUMNS))]
+    return body
+
+
+def _encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class CalculationAPI:
+    """Aplicación ASGI (HTTP). ``db_path`` se abre en la primera petición."""
+
+    def __init__(self, db_path, max_workers=None, cache_size=CACHE_SIZE):
+        self.db_path = db_path
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 1) + 2),
+                                           thread_name_prefix="plas2-api")
+        self.cache = ResponseCache(cache_size)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _snapshot(self):
+        return await self._run(get_repository(self.db_path).get_snapshot)
+
+    async def _cached(self, key, version, compute, *args):
+        """Respuesta de caché para ``(versión, key)``; si falta, la calcula en el pool y la guarda."""
+        cache_key = (version, key)
+        body = self.cache.get(cache_key)
+        if body is None:
+            body = await self._run(lambda: _encode(compute(*args)))
+            self.cache.put(cache_key, body)
+        return body
+
+    # --- Handlers ---
+
+    async def health(self, request):
+        version, machines = await self._snapshot()
+        return _encode({"status": "ok", "version": version, "machines": len(machines), "cache": self.cache.stats()})
+
+    async def list_machines(self, request):
+        version, machines = await self._snapshot()
+        category = request["query"].get("category")
+        if category is not None and category not in machines.category_values:
+            raise HTTPError(404, f"Categoría no encontrada: {category}")
+        return await self._cached(("machines", category), version, lambda: [
+            _machine_json(machines.config(row))
+            for row in (range(len(machines)) if category is None else machines.category_rows(category))
+        ])
+
+    async def get_machine(self, request, name):
+        version, machines = await self._snapshot()
+        if name not in machines:
+            raise HTTPError(404, f"Máquina no encontrada: {name}")
+        return await self._cached(("machine", name), version, _machine_json, machines[name])
+
+    async def calc(self, request):
+        data = request["query"] if request["method"] == "GET" else await request["json"]()
+        name = _name(data, "machine")
+        scenario = _scenario(data.get("scenario", data) if request["method"] == "POST" else data)
+        version, machines = await self._snapshot()
+        if name not in machines:
+            raise HTTPError(404, f"Máquina no encontrada: {name}")
+        key = ("calc", name, tuple(sorted(scenario.items())))
+        return await self._cached(key, version, _calc_single, machines[name], scenario)
+
+    async def calc_batch(self, request):
+        data = await request["json"]()
+        scenario = _scenario(data.get("scenario") or {})
+        names = sorted(set(_names(data, "machines"))) # Sin repetidos, como la CLI, y en el orden de la clave de caché
+        categories = sorted(set(_names(data, "categories")))
+        rollup = _flag(data, "rollup", False)
+        version, machines = await self._snapshot()
+        missing = [name for name in names if name not in machines]
+        if missing:
+            raise HTTPError(404, f"Máquinas no encontradas: {', '.join(missing)}")
+        missing = [category for category in categories if category not in machines.category_values]
+        if missing:
+            raise HTTPError(404, f"Categorías no encontradas: {', '.join(missing)}")
+        if not names and not categories:
+            selected = machines
+        else:
+            in_categories = machines.category_mask(categories)
+            rows = in_categories.nonzero()[0].tolist()
+            rows += [row for row in machines.rows(names).tolist() if not in_categories[row]]
+            selected = machines.take(rows)
+        key = ("batch", tuple(names), tuple(categories), rollup, tuple(sorted(scenario.items())))
+        return await self._cached(key, version, _calc_batch, selected, scenario, rollup)
+
+    # --- ASGI ---
+
+    def _route(self, method, path):
+        if path == "/health" and method == "GET":
+            return self.health, ()
+        if path == "/machines" and method == "GET":
+            return self.list_machines, ()
+        if path.startswith("/machines/") and method == "GET":
+            return self.get_machine, (path[len("/machines/"):],) # El servidor ASGI ya decodificó los %XX
+        if path == "/calc" and method in ("GET", "POST"):
+            return self.calc, ()
+        if path == "/calc/batch" and method == "POST":
+            return self.calc_batch, ()
+        if path in ("/health", "/machines", "/calc", "/calc/batch") or path.startswith("/machines/"):
+            raise HTTPError(405, f"Método no permitido: {method}")
+        raise HTTPError(404, f"Ruta no encontrada: {path}")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    try:
+                        await self._run(init_db, self.db_path) # Esquema al día, igual que la app
+                    except Exception as e: # El servidor no debe arrancar con la BD inutilizable
+                        await send({"type": "lifespan.startup.failed", "message": f"No se pudo abrir la BD: {e}"})
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    self.executor.shutdown(wait=False)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        async def read_json():
+            chunks, size = [], 0
+            while True:
+                message = await receive()
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > MAX_BODY_BYTES:
+                    raise HTTPError(413, "Cuerpo de la petición demasiado grande")
+                chunks.append(chunk)
+                if not message.get("more_body"):
+                    break
+            try:
+                data = json.loads(b"".join(chunks) or b"{}")
+            except ValueError:
+                raise HTTPError(400, "JSON inválido") from None
+            if not isinstance(data, dict):
+                raise HTTPError(400, "Se esperaba un objeto JSON")
+            return data
+
+        query = {key: values[-1] for key, values in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        request = {"method": scope["method"], "query": query, "json": read_json}
+        try:
+            handler, args = self._route(scope["method"], scope["path"])
+            status, body = 200, await handler(request, *args)
+        except HTTPError as e:
+            status, body = e.status, _encode({"error": e.message})
+        except Exception as e: # Nunca dejar la conexión sin respuesta
+            status, body = 500, _encode({"error": f"Error interno: {e}"})
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def create_app(db_path=None):
+    """Crea la aplicación ASGI; por defecto usa ``$PLAS2_DB`` o ``production_data_v3.db``."""
+    return CalculationAPI(db_path or os.environ.get("PLAS2_DB", DEFAULT_DB))
+
+
+app = create_app() # Para ``uvicorn plas2.api:app``; no abre la BD hasta la primera petición
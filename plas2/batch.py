@@ -0,0 +1,95 @@
+"""Cálculo por lote: una configuración de turno aplicada a muchas máquinas.
+
+Las máquinas se calculan en una pasada vectorizada de ``engine.compute_shift``
+(un único escenario). Con selecciones muy grandes el lote se parte en trozos
+de ``CHUNK_SIZE`` máquinas que se calculan en un pool de hilos: NumPy libera el
+GIL en las operaciones sobre arrays y cada trozo acota la memoria intermedia.
+
+Los totales por categoría (unidades, kg, eficiencia media) se agregan con
+``np.bincount`` sobre el índice de categoría de cada máquina.
+
+``compute_columns``/``rollup_columns`` devuelven dicts de arrays NumPy (los usa
+la CLI, que no carga pandas); ``compute_batch``/``category_rollup`` los mismos
+datos como DataFrame.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import engine
+from .fleet import FleetTable
+
+CHUNK_SIZE = 50_000 # Máquinas por trozo cuando se usa el pool de hilos
+
+RESULT_COLUMNS = ("name", "category", "type", "unidades", "peso_kg", "eficiencia",
+                  "tiempo_efectivo", "tiempo_perdido", "interrupciones_variables", "valido")
+ROLLUP_COLUMNS = ("category", "machines", "unidades", "peso_kg", "eficiencia_media", "invalidas")
+
+
+def _compute_chunk(fleet, scenarios):
+    machines = fleet.machine_batch()
+    res = engine.compute_shift(machines, scenarios)
+    return {
+        "name": machines.names,
+        "category": fleet.categories,
+        "type": machines.types,
+        "unidades": res.unidades[:, 0],
+        "peso_kg": res.peso_kg[:, 0],
+        "eficiencia": res.eficiencia[:, 0],
+        "tiempo_efectivo": res.tiempo_efectivo[:, 0],
+        "tiempo_perdido": res.tiempo_perdido[:, 0],
+        "interrupciones_variables": res.interrupciones_variables[:, 0],
+        "valido": res.valido[:, 0],
+    }
+
+
+def compute_columns(configs, scenario, chunk_size=CHUNK_SIZE, max_workers=None):
+    """Calcula ``scenario`` (dict como en la calculadora) para todas las ``configs``.
+
+    ``configs`` es una ``FleetTable`` (la flota o una selección con ``take()``)
+    o una secuencia de dicts de máquina. Devuelve ``{columna: array}`` con las
+    columnas de ``RESULT_COLUMNS``, una fila por máquina en el orden de entrada.
+    """
+    fleet = configs if isinstance(configs, FleetTable) else FleetTable.from_configs(configs)
+    scenarios = engine.ScenarioBatch.from_records([scenario])
+    if len(fleet) <= chunk_size:
+        return _compute_chunk(fleet, scenarios)
+    chunks = [fleet.take(np.arange(i, min(i + chunk_size, len(fleet)))) for i in range(0, len(fleet), chunk_size)]
+    workers = min(len(chunks), max_workers or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(_compute_chunk, chunks, [scenarios] * len(chunks)))
+    return {key: np.concatenate([part[key] for part in parts]) for key in RESULT_COLUMNS}
+
+
+def rollup_columns(columns):
+    """Totales por categoría (``ROLLUP_COLUMNS``) de un resultado de ``compute_columns``."""
+    categories, index = np.unique(np.asarray(columns["category"], dtype=str), return_inverse=True)
+    counts = np.bincount(index, minlength=len(categories))
+    totals = {key: np.bincount(index, weights=np.asarray(columns[key], dtype=float), minlength=len(categories))
+              for key in ("unidades", "peso_kg", "eficiencia")}
+    invalid = np.bincount(index, weights=~np.asarray(columns["valido"], dtype=bool), minlength=len(categories))
+    return {
+        "category": categories,
+        "machines": counts,
+        "unidades": totals["unidades"],
+        "peso_kg": totals["peso_kg"],
+        "eficiencia_media": totals["eficiencia"] / np.maximum(counts, 1),
+        "invalidas": invalid.astype(int),
+    }
+
+
+def compute_batch(configs, scenario, chunk_size=CHUNK_SIZE, max_workers=None):
+    """Como ``compute_columns``, pero devuelve un DataFrame."""
+    import pandas as pd # Import diferido: la CLI y el núcleo no necesitan pandas
+
+    return pd.DataFrame(compute_columns(configs, scenario, chunk_size, max_workers), columns=list(RESULT_COLUMNS))
+
+
+def category_rollup(results):
+    """Totales por categoría de un DataFrame de ``compute_batch``, ordenados por categoría."""
+    import pandas as pd
+
+    return pd.DataFrame(rollup_columns({key: results[key].to_numpy() for key in results.columns}),
+                        columns=list(ROLLUP_COLUMNS))
@@ -0,0 +1,296 @@
+"""Importación y exportación masiva de máquinas (CSV, JSONL y Parquet).
+
+Formato plano, una máquina por fila/línea::
+
+    name, type, description, category, profile, calibracion, ..., ratio_productivo
+
+``profile`` es el nombre de un perfil existente (opcional); con perfil, una
+celda de parámetro vacía o igual al valor del perfil se hereda (como al
+guardar desde el formulario), de modo que exportar e importar conserva la
+herencia. En JSONL también se aceptan los
+parámetros anidados en ``setup_params``/``production_params``, como en la
+aplicación.
+
+La importación es en streaming: se valida fila a fila y se inserta por lotes
+con ``executemany`` dentro de una única transacción, con semántica de upsert
+por ``name``. La exportación recorre el cursor y escribe por lotes, sin cargar
+la tabla entera en memoria. Parquet requiere ``pyarrow``.
+"""
+
+import csv
+import io
+import json
+import math
+import re
+from datetime import datetime
+from itertools import islice
+
+from . import instrument
+from .constants import DEFAULT_CATEGORY, MACHINE_TYPES
+from .profiles import load_profiles
+from .schema import PARAM_KEYS, PRODUCTION_PARAM_KEYS, SETUP_PARAM_KEYS, split_overrides
+
+FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_COLUMNS = ("name", "type", "description", "category", "profile", "created_at", "updated_at") + PARAM_KEYS
+BATCH_SIZE = 1000
+
+_UPSERT_COLUMNS = ("name", "type", "description", "category", "created_at") + PARAM_KEYS + ("profile_id",)
+UPSERT_MACHINE_SQL = f"""
+    INSERT INTO machines ({', '.join(_UPSERT_COLUMNS)})
+    VALUES ({', '.join('?' for _ in _UPSERT_COLUMNS)})
+    ON CONFLICT (name) DO UPDATE SET
+        {', '.join(f'{col} = excluded.{col}' for col in _UPSERT_COLUMNS if col not in ('name', 'created_at'))},
+        updated_at = excluded.created_at,
+        row_version = row_version + 1
+"""
+
+
+class ImportReport:
+    """Resumen de una importación: filas válidas, altas, actualizaciones y errores por línea."""
+
+    MAX_ERRORS = 200 # Conservar sólo los primeros errores
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def detect_format(filename):
+    """Deduce el formato por la extensión del fichero."""
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension in ("parquet", "pq"):
+        return "parquet"
+    if extension == "csv":
+        return "csv"
+    raise ValueError(f"Formato no soportado: .{extension} (use {', '.join(FORMATS)})")
+
+
+# --- Lectura en streaming ---
+
+def _text_stream(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+
+
+def iter_csv(fileobj):
+    """Genera ``(nº_línea, dict)`` por cada fila de un CSV con cabecera."""
+    reader = csv.DictReader(_text_stream(fileobj))
+    for record in reader:
+        yield reader.line_num, record
+
+
+def iter_jsonl(fileobj):
+    """Genera ``(nº_línea, dict)`` por cada línea JSON no vacía; las líneas inválidas dan ``(nº, error)``."""
+    for line_num, line in enumerate(_text_stream(fileobj), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = instrument.call("json_decode", json.loads, line)
+        except json.JSONDecodeError as e:
+            yield line_num, ValueError(f"JSON inválido: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield line_num, ValueError("Cada línea debe ser un objeto JSON")
+            continue
+        for section in ("setup_params", "production_params"): # Formato anidado de la aplicación
+            nested = record.pop(section, None)
+            if isinstance(nested, dict):
+                record.update(nested)
+        yield line_num, record
+
+
+def iter_parquet(fileobj):
+    """Genera ``(nº_fila, dict)`` leyendo el Parquet por lotes de filas."""
+    import pyarrow.parquet as pq # Dependencia opcional: sólo al usar Parquet
+
+    row_num = 0
+    for batch in pq.ParquetFile(fileobj).iter_batches(batch_size=BATCH_SIZE):
+        for record in batch.to_pylist():
+            row_num += 1
+            yield row_num, record
+
+
+READERS = {"csv": iter_csv, "jsonl": iter_jsonl, "parquet": iter_parquet}
+
+
+# --- Validación ---
+
+# "1,000": ¿mil con separador de miles o 1,0 con coma decimal? No se adivina
+_AMBIGUOUS_COMMA_RE = re.compile(r"[+-]?[1-9]\d{0,2},\d{3}")
+
+
+def _number(value, key):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"'{key}' debe ser numérico")
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        text = str(value).strip()
+        if "," in text and "." not in text: # Coma decimal (CSV exportados con configuración regional es)
+            if text.count(",") > 1 or _AMBIGUOUS_COMMA_RE.fullmatch(text):
+                raise ValueError(f"'{key}' es ambiguo: {value!r} (¿separador de miles o coma decimal?)")
+            text = text.replace(",", ".")
+        try:
+            number = int(text)
+        except ValueError:
+            try:
+                number = float(text)
+            except ValueError:
+                raise ValueError(f"'{key}' no es un número: {value!r}") from None
+    if isinstance(number, float) and not math.isfinite(number):
+        raise ValueError(f"'{key}' no es un número finito")
+    if number < 0:
+        raise ValueError(f"'{key}' no puede ser negativo")
+    return number
+
+
+def validate_record(record, profiles, now):
+    """Valida una fila y devuelve la tupla para ``UPSERT_MACHINE_SQL`` (o lanza ValueError).
+
+    ``profiles`` es ``{nombre: perfil}``; con perfil sólo se guardan los parámetros que lo sobrescriben.
+    """
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("'name' es obligatorio")
+    machine_type = str(record.get("type") or "").strip()
+    if machine_type not in MACHINE_TYPES:
+        raise ValueError(f"'type' inválido: {machine_type!r} (válidos: {', '.join(MACHINE_TYPES)})")
+    category = str(record.get("category") or "").strip() or DEFAULT_CATEGORY
+    description = str(record.get("description") or "").strip()
+
+    profile_name = str(record.get("profile") or "").strip()
+    profile = None
+    if profile_name:
+        if profile_name not in profiles:
+            raise ValueError(f"Perfil desconocido: {profile_name!r}")
+        profile = profiles[profile_name]
+    profile_id = profile["id"] if profile is not None else None
+
+    params = {key: _number(record.get(key), key) for key in PARAM_KEYS}
+    if params["unidades_por_minuto"] is None and profile_id is None:
+        raise ValueError("'unidades_por_minuto' es obligatorio")
+    if params["peso_por_unidad"] is None and profile_id is None:
+        raise ValueError("'peso_por_unidad' es obligatorio")
+    total, productive = params["ciclo_total"], params["ciclo_productivo"]
+    if total is not None and productive is not None and productive > total:
+        raise ValueError("'ciclo_productivo' no puede superar 'ciclo_total'")
+    if params["ratio_productivo"] is None and profile_id is None:
+        # Igual que el formulario: Manual/Semi derivan el ratio del ciclo, Automática = 1.0
+        cyclic = machine_type != "Automática" and total and productive is not None
+        params["ratio_productivo"] = productive / total if cyclic else 1.0
+    if params["ratio_productivo"] is not None and params["ratio_productivo"] > 1:
+        raise ValueError("'ratio_productivo' debe estar entre 0 y 1")
+    if profile is not None:
+        params = {**split_overrides(params, profile["setup_params"], SETUP_PARAM_KEYS),
+                  **split_overrides(params, profile["production_params"], PRODUCTION_PARAM_KEYS)}
+
+    return (name, machine_type, description, category, now, *(params[key] for key in PARAM_KEYS), profile_id)
+
+
+def import_machines(conn, fileobj, fmt, report=None):
+    """Importa máquinas desde ``fileobj`` con upsert por nombre.
+
+    ``conn`` debe estar dentro de una transacción de escritura (``with
+    pool.write() as conn``): la importación entera se confirma o se descarta de
+    una vez. No usar ``run_write``, que reintentaría con el fichero ya leído. Las filas
+    inválidas se omiten y se reportan en el ``ImportReport`` devuelto.
+    """
+    report = report or ImportReport()
+    profiles = {profile["name"]: profile for profile in load_profiles(conn).values()}
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    before = conn.execute("SELECT COUNT(*) FROM machines").fetchone()[0]
+
+    seen = set()
+
+    def valid_rows():
+        for line, record in READERS[fmt](fileobj):
+            if isinstance(record, Exception):
+                report.add_error(line, str(record))
+                continue
+            try:
+                row = validate_record(record, profiles, now)
+            except ValueError as e:
+                report.add_error(line, str(e))
+                continue
+            if row[0] in seen:
+                report.add_error(line, f"Nombre repetido en el fichero: {row[0]!r} (se aplica la última fila)")
+            seen.add(row[0])
+            report.rows += 1
+            yield row
+
+    rows = valid_rows()
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        conn.executemany(UPSERT_MACHINE_SQL, batch)
+
+    after = conn.execute("SELECT COUNT(*) FROM machines").fetchone()[0]
+    report.inserted = after - before
+    report.updated = len(seen) - report.inserted # Un nombre repetido en el fichero cuenta una vez
+    return report
+
+
+# --- Exportación en streaming ---
+
+EXPORT_SQL = f"""
+    SELECT {', '.join(EXPORT_COLUMNS)}
+    FROM machines_effective
+    ORDER BY category, name
+"""
+
+
+def _iter_export_batches(conn):
+    cursor = conn.execute(EXPORT_SQL)
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        yield rows
+
+
+def export_machines(conn, out, fmt):
+    """Escribe todas las máquinas (parámetros efectivos) en ``out``; devuelve el nº de filas.
+
+    ``out`` es un fichero de texto para CSV/JSONL y binario para Parquet.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in _iter_export_batches(conn):
+            writer.writerows(rows)
+            count += len(rows)
+    elif fmt == "jsonl":
+        for rows in _iter_export_batches(conn):
+            out.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+            count += len(rows)
+    elif fmt == "parquet":
+        import pyarrow as pa # Dependencia opcional: sólo al usar Parquet
+        import pyarrow.parquet as pq
+
+        n_text = len(EXPORT_COLUMNS) - len(PARAM_KEYS)
+        schema = pa.schema([(col, pa.string()) for col in EXPORT_COLUMNS[:n_text]]
+                           + [(key, pa.float64()) for key in PARAM_KEYS])
+        with pq.ParquetWriter(out, schema) as writer:
+            for rows in _iter_export_batches(conn):
+                columns = list(zip(*rows))
+                arrays = [pa.array(columns[i], type=field.type) for i, field in enumerate(schema)]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                count += len(rows)
+    else:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    return count
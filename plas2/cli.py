@@ -0,0 +1,272 @@
+"""Línea de comandos: cálculos por lote sobre la BD sin Streamlit.
+
+Ejemplos::
+
+    python -m plas2 list --category "216(a)"
+    python -m plas2 calc --turno-horas 8 --cambios-rollo 2 --category "216(a)" --format json
+    python -m plas2 calc --turno-horas 12 --sin-desayuno --rollup -o totales.csv
+    python -m plas2 capacity --category "216(a)" --by unidades_por_minuto_neto --limit 5
+    python -m plas2 plants --by category --format json
+    python -m plas2 serve --port 8000
+    python -m plas2 ingest --dir telemetria/ --listen 8790
+
+Los módulos con dependencias pesadas (NumPy para el cálculo) se importan
+dentro de cada subcomando: ``list``, ``capacity``, ``plants`` y ``migrate`` no los cargan nunca.
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import sqlite3
+import sys
+
+DEFAULT_DB = "production_data_v3.db"
+CAPACITY_METRICS = ("kg_por_minuto", "unidades_por_minuto_neto") # Igual que schema.CAPACITY_METRICS
+EVENT_OPTIONS = ("cambios_rollo", "cambios_producto", "cambios_cuchillo", "cambios_perforador",
+                 "cambios_paquete", "cambios_empaque") # Igual que engine.EVENT_KEYS, sin importar NumPy
+
+
+def _write_rows(out, fmt, columns, rows):
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    else:
+        json.dump([dict(zip(columns, row)) for row in rows], out, ensure_ascii=False, indent=2)
+        out.write("\n")
+
+
+def _open_output(path):
+    if path and path != "-":
+        return open(path, "w", encoding="utf-8", newline="")
+    return contextlib.nullcontext(sys.stdout) # El ``with`` no debe cerrar stdout
+
+
+def _select_machines(db_path, categories, names):
+    from .db import get_pool
+    from .repository import load_machines
+
+    with get_pool(db_path).read() as conn:
+        machines, errors = load_machines(conn)
+    for message in errors:
+        print(message, file=sys.stderr)
+    if not categories and not names:
+        return machines
+    missing = [name for name in names if name not in machines]
+    if missing:
+        raise SystemExit(f"Máquinas no encontradas: {', '.join(missing)}")
+    in_categories = machines.category_mask(categories)
+    rows = in_categories.nonzero()[0].tolist()
+    rows += [row for row in dict.fromkeys(machines.rows(names).tolist()) if not in_categories[row]]
+    return machines.take(rows)
+
+
+def cmd_migrate(args):
+    from .machines import init_db
+
+    applied = init_db(args.db, check_index=True) # Verificación completa del índice de búsqueda
+    for description in applied:
+        print(f"Aplicada: {description}")
+    if not applied:
+        print("La base de datos ya está al día.")
+
+
+def cmd_list(args):
+    from .db import get_pool
+    from .queries import find_machines
+    from .schema import PARAM_KEYS, SELECT_MACHINES_SQL, machine_from_row
+
+    with get_pool(args.db).read() as conn: # Por filas, sin la tabla columnar: ``list`` no carga NumPy
+        if args.category:
+            machines = {m["name"]: m for category in args.category for m in find_machines(conn, category=category)}.values()
+        else:
+            machines = [machine_from_row(row) for row in conn.execute(SELECT_MACHINES_SQL)]
+    columns = ("name", "type", "category", "description", "profile") + PARAM_KEYS
+    rows = [
+        (m["name"], m["type"], m["category"], m.get("description"), m.get("profile"),
+         *({**m["setup_params"], **m["production_params"]}.get(key) for key in PARAM_KEYS))
+        for m in machines
+    ]
+    with _open_output(args.output) as out:
+        _write_rows(out, args.format, columns, rows)
+
+
+def cmd_calc(args):
+    from . import batch
+
+    machines = _select_machines(args.db, args.category, args.machine)
+    if not machines:
+        raise SystemExit("No hay máquinas que calcular.")
+    scenario = {"turno_horas": args.turno_horas, "desayuno": not args.sin_desayuno, "almuerzo": not args.sin_almuerzo,
+                **{key: getattr(args, key) for key in EVENT_OPTIONS}}
+    columns = batch.compute_columns(machines, scenario)
+    if args.rollup:
+        columns = batch.rollup_columns(columns)
+        names = batch.ROLLUP_COLUMNS
+    else:
+        names = batch.RESULT_COLUMNS
+    rows = zip(*(columns[name].tolist() for name in names))
+    with _open_output(args.output) as out:
+        _write_rows(out, args.format, names, rows)
+
+
+def cmd_capacity(args):
+    from .db import get_pool
+    from .queries import rebuild_capacity, stale_capacity, top_capacity
+
+    if args.check:
+        def repair(conn):
+            stale = stale_capacity(conn)
+            rebuild_capacity(conn, stale)
+            return stale
+        stale = get_pool(args.db).run_write(repair)
+        print(f"Constantes de capacidad: {len(stale)} filas desfasadas recalculadas.", file=sys.stderr)
+    with get_pool(args.db).read() as conn:
+        top = top_capacity(conn, args.by, args.category, args.limit)
+    columns = tuple(top[0]) if top else ("name",)
+    with _open_output(args.output) as out:
+        _write_rows(out, args.format, columns, [tuple(row.values()) for row in top])
+
+
+def cmd_plants(args):
+    from .machines import init_db
+    from .plants import REPORT_COLUMNS, create_plant, fleet_report, plant_databases, rollup_report
+
+    if args.create:
+        try:
+            print(f"Creada: {create_plant(args.create, args.plants_dir)}", file=sys.stderr)
+        except ValueError as e:
+            raise SystemExit(str(e)) from None
+    plants = plant_databases(args.db, args.plants_dir)
+    for path in plants.values(): # ``--db`` ya se migró en main()
+        init_db(path)
+    rows, errors = fleet_report(plants)
+    for plant, message in errors.items():
+        print(f"Error en la planta '{plant}': {message}", file=sys.stderr)
+    if args.category:
+        rows = [row for row in rows if row[1] in args.category]
+    if args.by != "detail":
+        rows = rollup_report(rows, args.by)
+    with _open_output(args.output) as out:
+        _write_rows(out, args.format, REPORT_COLUMNS, rows)
+
+
+def cmd_serve(args):
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("El servidor requiere 'uvicorn' (pip install uvicorn).") from None
+    from .api import create_app
+
+    uvicorn.run(create_app(args.db), host=args.host, port=args.port, log_level="warning")
+
+
+def cmd_ingest(args):
+    import threading
+
+    from . import telemetry
+
+    if not args.dir and args.listen is None:
+        raise SystemExit("Indique --dir y/o --listen.")
+    if args.once and args.listen is not None:
+        raise SystemExit("--once sólo se admite con --dir.")
+    ingestor = telemetry.Ingestor(args.db, batch_size=args.batch_size).start()
+    stop = threading.Event()
+    workers = []
+    server = None
+    if args.dir:
+        tailer = telemetry.DirectoryTailer(ingestor, args.dir)
+        workers.append(threading.Thread(target=tailer.run, args=(stop, args.once), daemon=True))
+    if args.listen is not None:
+        server = telemetry.SocketSource(ingestor, args.host, args.listen)
+        workers.append(threading.Thread(target=server.serve_forever, daemon=True))
+        print(f"Escuchando eventos JSONL en {args.host}:{args.listen}", file=sys.stderr)
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers) and ingestor.failure is None:
+            workers[0].join(args.report_every)
+            telemetry.report(ingestor)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if server is not None:
+            server.shutdown()
+        ingestor.stop()
+        telemetry.report(ingestor)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m plas2", description="Calculadora de Producción sin interfaz.")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Fichero de base de datos (por defecto {DEFAULT_DB})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Crear/actualizar el esquema de la BD y verificar el índice de búsqueda")
+    migrate.set_defaults(func=cmd_migrate)
+
+    def add_output_options(sub):
+        sub.add_argument("--format", choices=("csv", "json"), default="csv")
+        sub.add_argument("-o", "--output", help="Fichero de salida (por defecto, salida estándar)")
+        sub.add_argument("--category", action="append", default=[], help="Filtrar por categoría (repetible)")
+
+    list_cmd = commands.add_parser("list", help="Listar máquinas con sus parámetros efectivos")
+    add_output_options(list_cmd)
+    list_cmd.set_defaults(func=cmd_list)
+
+    calc = commands.add_parser("calc", help="Calcular un turno para varias máquinas")
+    add_output_options(calc)
+    calc.add_argument("--machine", action="append", default=[], help="Máquina concreta (repetible)")
+    calc.add_argument("--turno-horas", type=float, default=8.0)
+    calc.add_argument("--sin-desayuno", action="store_true")
+    calc.add_argument("--sin-almuerzo", action="store_true")
+    for key in EVENT_OPTIONS:
+        calc.add_argument(f"--{key.replace('_', '-')}", dest=key, type=int, default=0, metavar="N")
+    calc.add_argument("--rollup", action="store_true", help="Sólo los totales por categoría")
+    calc.set_defaults(func=cmd_calc)
+
+    capacity = commands.add_parser("capacity", help="Máquinas de mayor capacidad (constantes materializadas)")
+    add_output_options(capacity)
+    capacity.add_argument("--by", choices=CAPACITY_METRICS, default=CAPACITY_METRICS[0], help="Métrica de orden")
+    capacity.add_argument("--limit", type=int, default=10)
+    capacity.add_argument("--check", action="store_true", help="Verificar las constantes y recalcular las desfasadas")
+    capacity.set_defaults(func=cmd_capacity)
+
+    plants = commands.add_parser("plants", help="Capacidad de la flota de todas las plantas (una BD por planta)")
+    add_output_options(plants)
+    plants.add_argument("--plants-dir", default="plantas", help="Directorio con las BD <planta>.db (--db es la planta por defecto)")
+    plants.add_argument("--by", choices=("plant", "category", "detail"), default="plant", help="Agregación del informe")
+    plants.add_argument("--create", metavar="NOMBRE", help="Crear antes una planta nueva")
+    plants.set_defaults(func=cmd_plants)
+
+    serve = commands.add_parser("serve", help="Servir la API HTTP/JSON (requiere uvicorn)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.set_defaults(func=cmd_serve)
+
+    ingest = commands.add_parser("ingest", help="Ingerir telemetría real (CSV/JSONL de un directorio o socket)")
+    ingest.add_argument("--dir", help="Directorio con ficheros *.csv/*.jsonl que se siguen al crecer")
+    ingest.add_argument("--listen", type=int, metavar="PUERTO", help="Aceptar eventos JSONL por TCP")
+    ingest.add_argument("--host", default="127.0.0.1")
+    ingest.add_argument("--once", action="store_true", help="Terminar al ponerse al día con --dir")
+    ingest.add_argument("--batch-size", type=int, default=5000, help="Eventos por transacción")
+    ingest.add_argument("--report-every", type=float, default=5.0, metavar="S", help="Segundos entre informes")
+    ingest.set_defaults(func=cmd_ingest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command != "migrate":
+            from .machines import init_db
+            for description in init_db(args.db): # Igual que la app: esquema al día antes de leer
+                print(f"Base de datos actualizada: {description}", file=sys.stderr)
+        args.func(args)
+    except sqlite3.Error as e:
+        print(f"Error de base de datos: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError: # p. ej. | head
+        return 0
+    return 0
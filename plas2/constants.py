@@ -0,0 +1,25 @@
+"""Constantes compartidas entre la interfaz y el núcleo de cálculo."""
+
+DEFAULT_CATEGORY = "General" # Categoría por defecto
+MACHINE_TYPES = ["Manual", "Semi-Automática", "Automática"]
+
+# Tipos con ciclo productivo (paradas por ciclo, cambios de cuchillo/perforador/paquete)
+CYCLE_MACHINE_TYPES = ("Manual", "Semi-Automática")
+
+# Parámetros que sólo tienen algunos tipos de máquina; los demás tipos no los heredan de su perfil
+TYPE_SPECIFIC_PARAMS = {
+    "cambio_cuchillo": CYCLE_MACHINE_TYPES,
+    "cambio_perforador": CYCLE_MACHINE_TYPES,
+    "cambio_paquete": CYCLE_MACHINE_TYPES,
+    "empaque": ("Manual",),
+}
+
+# Duración de las comidas (min)
+DESAYUNO_MIN = 15
+ALMUERZO_MIN = 60
+
+# Parámetros de máquina (columnas tipadas de 'machines', ver plas2/schema.py)
+SETUP_PARAM_KEYS = ("calibracion", "otros", "cambio_rollo", "cambio_producto",
+                    "cambio_cuchillo", "cambio_perforador", "cambio_paquete", "empaque")
+PRODUCTION_PARAM_KEYS = ("unidades_por_minuto", "peso_por_unidad", "ciclo_total",
+                         "ciclo_productivo", "ratio_productivo")
@@ -0,0 +1,164 @@
+"""Capa de conexiones SQLite compartida por todas las sesiones del proceso.
+
+En lugar de abrir y cerrar una conexión en cada helper, ``ConnectionPool``
+mantiene conexiones persistentes configuradas para concurrencia:
+
+* ``journal_mode=WAL``: los lectores no bloquean al escritor ni viceversa.
+* ``synchronous=NORMAL``, ``cache_size`` y ``mmap_size`` ajustados.
+* ``busy_timeout`` más una política de reintentos con backoff ante
+  "database is locked".
+* Caché de sentencias preparadas (``cached_statements``): las consultas se
+  definen como constantes para que el texto SQL, y por tanto la sentencia
+  compilada, se reutilice.
+
+Las escrituras abren la transacción con ``BEGIN IMMEDIATE`` para tomar el
+bloqueo de escritura al principio y no fallar a mitad de transacción.
+"""
+
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from . import instrument
+
+BUSY_TIMEOUT_MS = 5000
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.05 # s, se duplica en cada intento (más jitter)
+
+PRAGMAS = (
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",   # ~16 MB por conexión
+    "PRAGMA mmap_size = 268435456", # 256 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+
+
+def is_busy_error(error):
+    """Indica si un error de SQLite se debe a un bloqueo transitorio."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def with_retry(fn, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY):
+    """Ejecuta ``fn()`` reintentando con backoff exponencial si la BD está bloqueada."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == attempts - 1:
+                raise
+            time.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+
+
+def connect(db_path):
+    """Abre una conexión configurada con los PRAGMAs del pool (modo autocommit)."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None, # Transacciones explícitas (BEGIN/COMMIT)
+        check_same_thread=False, # Las conexiones pasan entre hilos de script de Streamlit
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=instrument.Connection, # Cuenta consultas y filas si la instrumentación está activa
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones persistentes a un fichero SQLite.
+
+    Cada conexión la usa un solo hilo a la vez; al terminar vuelve al pool.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue() # LIFO: reutilizar conexiones con caché caliente
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return connect(self.db_path)
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get() # Pool lleno: esperar a que se libere una
+
+    def _release(self, conn):
+        if conn.in_transaction: # Nunca devolver una conexión con transacción abierta
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión del pool (modo autocommit) durante el bloque ``with``."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    read = connection
+
+    @contextmanager
+    def write(self):
+        """Presta una conexión dentro de una transacción ``BEGIN IMMEDIATE``.
+
+        Hace COMMIT al salir del bloque o ROLLBACK si se produce una excepción.
+        """
+        with self.connection() as conn:
+            with_retry(lambda: conn.execute("BEGIN IMMEDIATE"))
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            with_retry(lambda: conn.execute("COMMIT"))
+
+    def run_write(self, fn):
+        """Ejecuta ``fn(conn)`` en una transacción de escritura, reintentándola entera si hay bloqueo."""
+        def attempt():
+            with self.write() as conn:
+                return fn(conn)
+        return with_retry(attempt)
+
+    def close(self):
+        """Cierra las conexiones ociosas del pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """Devuelve el pool único del proceso para ``db_path``."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
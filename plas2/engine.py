@@ -0,0 +1,236 @@
+"""Motor de cálculo de turnos vectorizado.
+
+Calcula de una sola pasada NumPy los resultados de producción para un lote de
+máquinas (columnar) frente a un lote de escenarios de turno. El resultado de
+cada métrica es una matriz ``(n_maquinas, n_escenarios)``.
+
+Las fórmulas replican exactamente las de la calculadora individual:
+interrupciones fijas (calibración + otros), comidas, interrupciones variables
+por evento, tiempo neto, ``ratio_productivo``, unidades, kg y eficiencia.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .constants import ALMUERZO_MIN, CYCLE_MACHINE_TYPES, DESAYUNO_MIN, PRODUCTION_PARAM_KEYS, SETUP_PARAM_KEYS
+
+# Interrupciones variables: (clave de entrada, parámetro de setup, etiqueta,
+# tipos de máquina que la admiten, divisor para pasar a minutos).
+EVENTOS_VARIABLES = (
+    ("cambios_rollo", "cambio_rollo", "Cambios Rollo", None, 1.0),
+    ("cambios_producto", "cambio_producto", "Cambios Producto", None, 1.0),
+    ("cambios_cuchillo", "cambio_cuchillo", "Cambios Cuchillo", CYCLE_MACHINE_TYPES, 1.0),
+    ("cambios_perforador", "cambio_perforador", "Cambios Perforador", CYCLE_MACHINE_TYPES, 1.0),
+    ("cambios_paquete", "cambio_paquete", "Cambios Paquete", CYCLE_MACHINE_TYPES, 1.0),
+    ("cambios_empaque", "empaque", "Cambios Empaque", ("Manual",), 60.0), # empaque se guarda en segundos
+)
+EVENT_KEYS = tuple(evento[0] for evento in EVENTOS_VARIABLES)
+# Orden de las columnas de parámetros en ``MachineBatch.from_params`` (el de ``schema.PARAM_KEYS``).
+PARAM_KEYS = SETUP_PARAM_KEYS + PRODUCTION_PARAM_KEYS
+PARAM_INDEX = {key: j for j, key in enumerate(PARAM_KEYS)}
+
+
+def event_applies(event_key, machine_type):
+    """Indica si un tipo de evento se pregunta/aplica para un tipo de máquina."""
+    for key, _, _, tipos, _ in EVENTOS_VARIABLES:
+        if key == event_key:
+            return tipos is None or machine_type in tipos
+    return False
+
+
+@dataclass
+class MachineBatch:
+    """Lote columnar de máquinas. Todas las columnas tienen longitud ``n``."""
+    names: np.ndarray              # (n,) object
+    types: np.ndarray              # (n,) object
+    calibracion: np.ndarray        # (n,) float, min
+    otros: np.ndarray              # (n,) float, min
+    minutos_evento: np.ndarray     # (n, E) float, min por evento (ya convertidos)
+    evento_aplica: np.ndarray      # (n, E) bool, el tipo de máquina admite el evento
+    ratio_productivo: np.ndarray   # (n,) float
+    unidades_por_minuto: np.ndarray  # (n,) float
+    peso_por_unidad: np.ndarray    # (n,) float, gramos
+    con_ciclo: np.ndarray          # (n,) bool, Manual/Semi (paradas por ciclo)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_configs(cls, configs):
+        """Construye el lote a partir de dicts de máquina (formato de ``get_all_machines_db``).
+
+        Si ``configs`` es una ``fleet.FleetTable`` (o una selección suya) el lote
+        se toma directamente de sus columnas, sin pasar por dicts.
+        """
+        machine_batch = getattr(configs, "machine_batch", None)
+        if machine_batch is not None:
+            return machine_batch()
+        configs = list(configs)
+        params = np.full((len(configs), len(PARAM_KEYS)), np.nan)
+        for i, config in enumerate(configs):
+            values = {**config["setup_params"], **config["production_params"]}
+            params[i] = [values.get(key, np.nan) for key in PARAM_KEYS]
+        names = np.array([config["name"] for config in configs], dtype=object)
+        types = np.array([config["type"] for config in configs], dtype=object)
+        return cls.from_params(names, types, params)
+
+    @classmethod
+    def from_params(cls, names, types, params):
+        """Construye el lote desde columnas: ``params`` es ``(n, len(PARAM_KEYS))`` con NaN si falta el valor."""
+        n = len(names)
+        names = np.array(names, dtype=object) # Copias: el lote es mutable y las columnas de origen no
+        types = np.array(types, dtype=object)
+        param = lambda key, default=0.0: np.nan_to_num(params[:, PARAM_INDEX[key]], nan=default)
+        minutos_evento = np.zeros((n, len(EVENTOS_VARIABLES)))
+        evento_aplica = np.ones((n, len(EVENTOS_VARIABLES)), dtype=bool)
+        for j, (_, key, _, tipos, divisor) in enumerate(EVENTOS_VARIABLES):
+            minutos_evento[:, j] = param(key) / divisor
+            if tipos is not None:
+                evento_aplica[:, j] = np.isin(types, tipos)
+        con_ciclo = np.isin(types, CYCLE_MACHINE_TYPES) if n else np.zeros(0, dtype=bool)
+        return cls(names, types, param("calibracion"), param("otros"), minutos_evento, evento_aplica,
+                   param("ratio_productivo", 1.0), param("unidades_por_minuto"), param("peso_por_unidad"), con_ciclo)
+
+
+@dataclass
+class ScenarioBatch:
+    """Lote columnar de escenarios de turno. Todas las columnas tienen longitud ``s``."""
+    turno_horas: np.ndarray        # (s,) float
+    desayuno: np.ndarray           # (s,) bool
+    almuerzo: np.ndarray           # (s,) bool
+    n_eventos: np.ndarray          # (s, E) float, nº de eventos por tipo
+
+    def __len__(self):
+        return len(self.turno_horas)
+
+    @classmethod
+    def from_records(cls, records):
+        """Construye el lote a partir de dicts ``{turno_horas, desayuno, almuerzo, cambios_*}``."""
+        records = list(records)
+        s = len(records)
+        turno = np.empty(s)
+        desayuno = np.zeros(s, dtype=bool)
+        almuerzo = np.zeros(s, dtype=bool)
+        n_eventos = np.zeros((s, len(EVENT_KEYS)))
+        for i, rec in enumerate(records):
+            turno[i] = rec["turno_horas"]
+            desayuno[i] = bool(rec.get("desayuno", False))
+            almuerzo[i] = bool(rec.get("almuerzo", False))
+            for j, key in enumerate(EVENT_KEYS):
+                n_eventos[i, j] = rec.get(key, 0)
+        return cls(turno, desayuno, almuerzo, n_eventos)
+
+    @classmethod
+    def from_arrays(cls, turno_horas, desayuno=True, almuerzo=True, **eventos):
+        """Construye el lote desde arrays (o escalares) ya alineados, uno por columna."""
+        turno = np.atleast_1d(np.asarray(turno_horas, dtype=float))
+        s = len(turno)
+        n_eventos = np.zeros((s, len(EVENT_KEYS)))
+        for j, key in enumerate(EVENT_KEYS):
+            if key in eventos:
+                n_eventos[:, j] = eventos[key]
+        desayuno = np.broadcast_to(np.asarray(desayuno, dtype=bool), (s,)).copy()
+        almuerzo = np.broadcast_to(np.asarray(almuerzo, dtype=bool), (s,)).copy()
+        return cls(turno, desayuno, almuerzo, n_eventos)
+
+
+@dataclass
+class ShiftResults:
+    """Resultados por par (máquina, escenario); cada campo es ``(n_maquinas, n_escenarios)``."""
+    turno_minutos: np.ndarray
+    interrupciones_fijas: np.ndarray
+    tiempo_comidas: np.ndarray
+    interrupciones_variables: np.ndarray
+    tiempo_neto_disponible: np.ndarray
+    valido: np.ndarray             # tiempo neto > 0
+    tiempo_efectivo: np.ndarray
+    tiempo_detenido_ciclos: np.ndarray
+    tiempo_perdido: np.ndarray
+    unidades: np.ndarray
+    peso_kg: np.ndarray
+    eficiencia: np.ndarray         # %
+    detalle_eventos: np.ndarray = None  # (n_maquinas, n_escenarios, E) min, sólo si se pide
+
+
+def compute_shift(machines, scenarios, detalle=False):
+    """Calcula todas las combinaciones máquina × escenario en una pasada vectorizada.
+
+    Si ``detalle`` es True se devuelve además el tiempo (min) de cada tipo de
+    interrupción variable, necesario para la tabla de detalle de la calculadora.
+    """
+    m_col = lambda a: a[:, None]   # (n,)  -> (n, 1)
+    s_row = lambda a: a[None, :]   # (s,)  -> (1, s)
+
+    turno_minutos = s_row(scenarios.turno_horas * 60)
+    interrupciones_fijas = m_col(machines.calibracion + machines.otros)
+    tiempo_comidas = s_row(np.where(scenarios.desayuno, DESAYUNO_MIN, 0)
+                           + np.where(scenarios.almuerzo, ALMUERZO_MIN, 0)).astype(float)
+
+    shape = (len(machines), len(scenarios))
+    interrupciones_variables = np.zeros(shape)
+    eventos = np.zeros(shape + (len(EVENT_KEYS),)) if detalle else None
+    for j in range(len(EVENT_KEYS)):
+        n = s_row(scenarios.n_eventos[:, j])
+        por_evento = m_col(np.where(machines.evento_aplica[:, j], machines.minutos_evento[:, j], 0.0))
+        total_evento = n * por_evento
+        interrupciones_variables += total_evento
+        if detalle:
+            eventos[:, :, j] = total_evento
+
+    tiempo_interrupciones = interrupciones_fijas + tiempo_comidas + interrupciones_variables
+    tiempo_neto = turno_minutos - tiempo_interrupciones
+    valido = tiempo_neto > 0
+
+    ratio = m_col(machines.ratio_productivo)
+    tiempo_efectivo = np.where(valido, tiempo_neto * ratio, 0.0)
+    tiempo_detenido = np.where(valido, tiempo_neto * (1 - ratio), 0.0)
+    unidades = m_col(machines.unidades_por_minuto) * tiempo_efectivo
+    peso = m_col(machines.peso_por_unidad)
+    peso_kg = np.where(peso > 0, unidades * peso / 1000, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eficiencia = np.where(turno_minutos > 0, (tiempo_efectivo / turno_minutos) * 100, 0.0)
+    tiempo_perdido = np.where(valido, turno_minutos - tiempo_efectivo, tiempo_interrupciones)
+
+    full = lambda a: np.broadcast_to(a, shape)
+    return ShiftResults(
+        turno_minutos=full(turno_minutos),
+        interrupciones_fijas=full(interrupciones_fijas),
+        tiempo_comidas=full(tiempo_comidas),
+        interrupciones_variables=interrupciones_variables,
+        tiempo_neto_disponible=tiempo_neto,
+        valido=valido,
+        tiempo_efectivo=tiempo_efectivo,
+        tiempo_detenido_ciclos=tiempo_detenido,
+        tiempo_perdido=tiempo_perdido,
+        unidades=unidades,
+        peso_kg=peso_kg,
+        eficiencia=eficiencia,
+        detalle_eventos=eventos,
+    )
+
+
+def compute_single(config, scenario):
+    """Calcula un único par máquina/escenario y devuelve los resultados como dict de floats.
+
+    Incluye ``detalle_interrupciones`` con las interrupciones variables > 0,
+    etiquetadas como en la calculadora (p. ej. ``"Cambios Rollo (2x)"``).
+    """
+    machines = MachineBatch.from_configs([config])
+    scenarios = ScenarioBatch.from_records([scenario])
+    res = compute_shift(machines, scenarios, detalle=True)
+    out = {
+        field: (bool(res.valido[0, 0]) if field == "valido" else float(getattr(res, field)[0, 0]))
+        for field in ("turno_minutos", "interrupciones_fijas", "tiempo_comidas",
+                      "interrupciones_variables", "tiempo_neto_disponible", "valido",
+                      "tiempo_efectivo", "tiempo_detenido_ciclos", "tiempo_perdido",
+                      "unidades", "peso_kg", "eficiencia")
+    }
+    detalle = {}
+    for j, (key, _, etiqueta, _, _) in enumerate(EVENTOS_VARIABLES):
+        n_eventos = scenario.get(key, 0)
+        minutos = float(res.detalle_eventos[0, 0, j])
+        if n_eventos > 0 and minutos > 0:
+            detalle[f"{etiqueta} ({n_eventos}x)"] = minutos
+    out["detalle_interrupciones"] = detalle
+    return out
@@ -0,0 +1,303 @@
+"""Flota cargada en memoria como tabla columnar.
+
+``FleetTable`` guarda una columna NumPy por campo de la vista
+``machines_effective``: los 13 parámetros en una única matriz ``float64`` (NaN
+donde el parámetro es NULL), tipo y categoría como códigos enteros sobre sus
+listas de valores, y el resto como arrays de objetos. Además precalcula el
+índice de grupos por categoría (filas ordenadas por categoría y límites de cada
+grupo), de modo que listar, agrupar, seleccionar y construir el
+``engine.MachineBatch`` de una selección son operaciones sobre arrays.
+
+La tabla también se comporta como un ``Mapping`` de sólo lectura
+``{nombre: dict de máquina}`` (el formato histórico de
+``get_all_machines_db``): el dict de una máquina se construye al pedirlo, para
+el formulario de edición o la calculadora individual, y nunca para toda la flota.
+"""
+
+import copy
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from .constants import DEFAULT_CATEGORY, PRODUCTION_PARAM_KEYS
+from .schema import BASE_COLUMNS, PARAM_COLUMN_TYPES, PARAM_KEYS, SELECT_MACHINES_SQL
+
+TEXT_COLUMNS = ("description", "created_at", "updated_at", "profile")
+SEARCH_FIELDS = ("name", "category", "description", "profile") # Campos que recorre ``matching()``
+_INTEGER_PARAMS = np.array([PARAM_COLUMN_TYPES[key] == "INTEGER" for key in PARAM_KEYS])
+_N_SETUP = len(PARAM_KEYS) - len(PRODUCTION_PARAM_KEYS)
+
+
+def _codes(values):
+    """Codifica ``values`` como ``(valores únicos ordenados, código por fila)``."""
+    first = {}
+    codes = np.fromiter((first.setdefault(value, len(first)) for value in values), dtype=np.int32, count=len(values))
+    uniques = sorted(first)
+    remap = np.empty(len(uniques), dtype=np.int32)
+    remap[[first[value] for value in uniques]] = np.arange(len(uniques), dtype=np.int32)
+    return tuple(uniques), remap[codes]
+
+
+def _param_matrix(names, columns, errors):
+    """Matriz ``(n, P)`` de parámetros; un valor no numérico queda NaN y se informa en ``errors``."""
+    try:
+        return np.array(columns, dtype=float).T.copy() if columns[0] else np.zeros((0, len(PARAM_KEYS)))
+    except (TypeError, ValueError):
+        pass
+    params = np.full((len(names), len(PARAM_KEYS)), np.nan)
+    for j, (key, column) in enumerate(zip(PARAM_KEYS, columns)):
+        for i, value in enumerate(column):
+            try:
+                params[i, j] = np.nan if value is None else float(value)
+            except (TypeError, ValueError):
+                errors.append(f"Error procesando máquina {names[i]}: {key} no numérico ({value!r})")
+    return params
+
+
+class FleetTable(Mapping):
+    """Tabla columnar de máquinas (toda la flota o una selección de ella).
+
+    Es inmutable y se comparte entre sesiones y hilos; ``take()`` devuelve
+    otra tabla con las filas elegidas. Las filas de la flota completa vienen
+    ordenadas por categoría y nombre, como ``SELECT_MACHINES_SQL``.
+    """
+
+    def __init__(self, names, type_values, type_codes, category_values, category_codes, params,
+                 profile_ids, versions, text):
+        self.names = names                      # (n,) object
+        self.type_values = type_values          # tuple de tipos distintos
+        self.type_codes = type_codes            # (n,) int32 -> type_values
+        self.category_values = category_values  # tuple de categorías, ordenadas
+        self.category_codes = category_codes    # (n,) int32 -> category_values
+        self.params = params                    # (n, len(PARAM_KEYS)) float64, NaN = NULL
+        self.profile_ids = profile_ids          # (n,) object (int o None)
+        self.versions = versions                # (n,) object: row_version de cada fila (None si no viene de la BD)
+        self.text = text                        # {columna de TEXT_COLUMNS: (n,) object}
+        self.index = {name: i for i, name in enumerate(names.tolist())}
+        # Índice de grupos: filas ordenadas por categoría y límites [inicio, fin) de cada una
+        self.group_order = np.argsort(category_codes, kind="stable")
+        self.group_bounds = np.searchsorted(category_codes[self.group_order],
+                                            np.arange(len(category_values) + 1))
+        self._by_category = None
+        self._sorted_names = None
+        self._haystack = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Construye la tabla desde filas en el orden de ``EFFECTIVE_COLUMNS``.
+
+        Devuelve ``(tabla, errores)``; ``errores`` lista los parámetros que no se
+        pudieron leer como número (quedan como NULL).
+        """
+        n_base = len(BASE_COLUMNS)
+        n_params = len(PARAM_KEYS)
+        columns = list(zip(*rows)) or [()] * (n_base + n_params + 3)
+        base = dict(zip(BASE_COLUMNS, columns[:n_base]))
+        names = np.array(base["name"], dtype=object)
+        errors = []
+        params = _param_matrix(names, columns[n_base:n_base + n_params], errors)
+        type_values, type_codes = _codes(base["type"])
+        categories = [category if category is not None else DEFAULT_CATEGORY for category in base["category"]]
+        category_values, category_codes = _codes(categories)
+        profile_ids, profiles, versions = columns[n_base + n_params:n_base + n_params + 3]
+        text = {key: np.array(base[key] if key in base else profiles, dtype=object) for key in TEXT_COLUMNS}
+        return cls(names, type_values, type_codes, category_values, category_codes, params,
+                   np.array(profile_ids, dtype=object), np.array(versions, dtype=object), text), errors
+
+    @classmethod
+    def from_configs(cls, configs):
+        """Construye la tabla desde dicts de máquina (p. ej. una máquina recién editada)."""
+        rows = []
+        for config in configs:
+            values = {**(config.get("setup_params") or {}), **(config.get("production_params") or {})}
+            rows.append(tuple(config.get(key) for key in BASE_COLUMNS)
+                        + tuple(values.get(key) for key in PARAM_KEYS)
+                        + (config.get("profile_id"), config.get("profile"), config.get("row_version")))
+        return cls.from_rows(rows)[0]
+
+    # --- Mapping {nombre: dict de máquina} ---
+
+    def __getitem__(self, name):
+        return self.config(self.index[name])
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.names)
+
+    # --- Columnas derivadas ---
+
+    @property
+    def types(self):
+        """Tipo de máquina por fila, ``(n,)`` object."""
+        return np.array(self.type_values, dtype=object)[self.type_codes] if len(self) else np.empty(0, dtype=object)
+
+    @property
+    def categories(self):
+        """Categoría por fila, ``(n,)`` object."""
+        return np.array(self.category_values, dtype=object)[self.category_codes] if len(self) else np.empty(0, dtype=object)
+
+    def category_of(self, name):
+        return self.category_values[self.category_codes[self.index[name]]]
+
+    def param(self, key):
+        """Columna ``(n,)`` de un parámetro (NaN donde es NULL)."""
+        return self.params[:, PARAM_KEYS.index(key)]
+
+    def sorted_names(self):
+        """Nombres en orden alfabético (calculado una vez por tabla)."""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.index)
+        return self._sorted_names
+
+    # --- Selección ---
+
+    def rows(self, names):
+        """Índices de fila de ``names`` (KeyError si falta alguno)."""
+        return np.fromiter((self.index[name] for name in names), dtype=np.intp)
+
+    def category_rows(self, category):
+        """Filas de una categoría, en el orden de la tabla (array vacío si no existe)."""
+        try:
+            code = self.category_values.index(category)
+        except ValueError:
+            return np.zeros(0, dtype=np.intp)
+        return self.group_order[self.group_bounds[code]:self.group_bounds[code + 1]]
+
+    def category_mask(self, categories):
+        """Máscara de las filas cuya categoría está en ``categories``."""
+        wanted = set(categories)
+        codes = [code for code, category in enumerate(self.category_values) if category in wanted]
+        return np.isin(self.category_codes, codes)
+
+    def take(self, rows):
+        """Nueva tabla con las filas ``rows`` (índices o máscara booleana), en ese orden."""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = rows.astype(np.intp, copy=False)
+        used = np.unique(self.category_codes[rows])
+        remap = np.zeros(len(self.category_values), dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        return FleetTable(self.names[rows], self.type_values, self.type_codes[rows],
+                          tuple(self.category_values[code] for code in used), remap[self.category_codes[rows]],
+                          self.params[rows], self.profile_ids[rows], self.versions[rows],
+                          {key: column[rows] for key, column in self.text.items()})
+
+    def patched(self, rows):
+        """Copia de la tabla con ``rows`` (orden de ``EFFECTIVE_COLUMNS``) en lugar de las filas de esos nombres.
+
+        Sólo admite ediciones que no cambian la estructura: nombres existentes
+        que conservan su categoría y un tipo ya presente. Comparte con esta
+        tabla los nombres, el índice, los grupos por categoría y las columnas
+        que no cambian; las demás se copian (memoria, sin recorrer filas en Python).
+        Devuelve ``(tabla, errores)``, con tabla None si la edición es estructural.
+        """
+        changes, errors = FleetTable.from_rows(rows)
+        try:
+            target = self.rows(changes.names)
+            type_codes = [self.type_values.index(value) for value in changes.type_values]
+        except (KeyError, ValueError): # Máquina nueva o renombrada, o tipo nuevo
+            return None, errors
+        same_category = np.array(self.category_values, dtype=object)[self.category_codes[target]] == changes.categories
+        if not same_category.all():
+            return None, errors
+
+        def replaced(column, values, equal_nan=False):
+            if np.array_equal(column[target], values, equal_nan=equal_nan):
+                return column # Columna sin cambios: se comparte
+            column = column.copy()
+            column[target] = values
+            return column
+
+        table = copy.copy(self)
+        table.type_codes = replaced(self.type_codes, np.array(type_codes, dtype=np.int32)[changes.type_codes])
+        table.params = replaced(self.params, changes.params, equal_nan=True)
+        table.profile_ids = replaced(self.profile_ids, changes.profile_ids)
+        table.versions = replaced(self.versions, changes.versions)
+        table.text = {key: replaced(column, changes.text[key]) for key, column in self.text.items()}
+        if self._haystack is not None:
+            table._haystack = list(self._haystack)
+            for row in target.tolist():
+                table._haystack[row] = table._haystack_row(row)
+        return table, errors
+
+    def _haystack_row(self, row):
+        values = (self.names[row], self.category_values[self.category_codes[row]],
+                  self.text["description"][row], self.text["profile"][row])
+        return "\n".join(value or "" for value in values).lower()
+
+    def matching(self, text):
+        """Máscara de las máquinas que contienen ``text`` (sin mayúsculas) en ``SEARCH_FIELDS``."""
+        text = text.lower()
+        if self._haystack is None:
+            columns = [self.names, self.categories, self.text["description"], self.text["profile"]]
+            self._haystack = ["\n".join(value or "" for value in values).lower() for values in zip(*columns)]
+        return np.fromiter((text in row for row in self._haystack), dtype=bool, count=len(self))
+
+    def by_category(self, mask=None):
+        """``{categoría: nombres}`` en orden de categoría; con ``mask``, sólo las filas marcadas.
+
+        Sin máscara el resultado se calcula una vez por tabla y se comparte.
+        """
+        if mask is None and self._by_category is not None:
+            return self._by_category
+        groups = {}
+        for code, category in enumerate(self.category_values):
+            rows = self.group_order[self.group_bounds[code]:self.group_bounds[code + 1]]
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows):
+                groups[category] = tuple(self.names[rows].tolist())
+        if mask is not None:
+            return groups
+        self._by_category = MappingProxyType(groups)
+        return self._by_category
+
+    # --- Cálculo ---
+
+    def machine_batch(self):
+        """``engine.MachineBatch`` de todas las filas, directamente desde las columnas."""
+        from . import engine
+
+        return engine.MachineBatch.from_params(self.names, self.types, self.params)
+
+    def config(self, row):
+        """Dict de máquina (``setup_params``/``production_params``) de una fila.
+
+        Los parámetros NULL se omiten y los de columna INTEGER con valor entero
+        vuelven como ``int``, igual que al leerlos de SQLite.
+        """
+        values = self.params[row]
+        present = ~np.isnan(values)
+        cast = [int(v) if integer and v.is_integer() else v
+                for v, integer in zip(values.tolist(), _INTEGER_PARAMS.tolist())]
+        params = [{key: cast[j] for j, key in enumerate(PARAM_KEYS[start:stop], start) if present[j]}
+                  for start, stop in ((0, _N_SETUP), (_N_SETUP, len(PARAM_KEYS)))]
+        return {
+            "name": self.names[row],
+            "type": self.type_values[self.type_codes[row]],
+            "description": self.text["description"][row],
+            "category": self.category_values[self.category_codes[row]],
+            "created_at": self.text["created_at"][row],
+            "updated_at": self.text["updated_at"][row],
+            "setup_params": params[0],
+            "production_params": params[1],
+            "profile_id": self.profile_ids[row],
+            "profile": self.text["profile"][row],
+            "row_version": self.versions[row],
+        }
+
+    def configs(self, rows=None):
+        """Dicts de máquina de ``rows`` (todas si es None), para el código que aún trabaja por máquina."""
+        return [self.config(row) for row in (range(len(self)) if rows is None else rows)]
+
+
+def load_fleet(conn):
+    """Lee la vista ``machines_effective`` completa. Devuelve ``(FleetTable, errores)``."""
+    return FleetTable.from_rows(conn.execute(SELECT_MACHINES_SQL).fetchall())
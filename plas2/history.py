@@ -0,0 +1,106 @@
+"""Historial de cálculos y agregados diarios/semanales.
+
+Cada cálculo (una máquina en la calculadora o todas las de un lote) se añade a
+``calc_history`` con las entradas del turno, la versión de la BD con la que se
+calculó (``snapshot_version``: identifica la configuración exacta de máquinas
+y perfiles) y los resultados. El trigger ``calc_history_rollup`` acumula cada
+fila en ``calc_rollups`` en la misma transacción, así que las consultas de
+tendencia leen un punto por día/semana en vez de recorrer el historial.
+"""
+
+import uuid
+from datetime import datetime
+
+from .constants import DEFAULT_CATEGORY
+from .schema import HISTORY_RESULT_COLUMNS, HISTORY_SCENARIO_COLUMNS, ROLLUP_PERIODS, ROLLUP_SCOPES
+
+_INSERT_COLUMNS = ("calculated_at", "source", "run_id", "machine", "category", "snapshot_version") \
+    + HISTORY_SCENARIO_COLUMNS + HISTORY_RESULT_COLUMNS
+INSERT_HISTORY_SQL = (
+    f"INSERT INTO calc_history ({', '.join(_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _INSERT_COLUMNS)})"
+)
+TREND_COLUMNS = ("period_start", "calculations", "unidades_total", "unidades_media", "peso_kg_total",
+                 "eficiencia_media", "unidades_min", "unidades_max", "invalidas")
+TREND_SQL = """
+    SELECT period_start, calculations, unidades_sum, unidades_sum / calculations, peso_kg_sum,
+           eficiencia_sum / calculations, unidades_min, unidades_max, invalidas
+    FROM calc_rollups
+    WHERE period = ? AND scope = ? AND key = ? AND period_start BETWEEN ? AND ?
+    ORDER BY period_start
+"""
+RECENT_COLUMNS = ("calculated_at", "source", "machine", "category", "snapshot_version") \
+    + HISTORY_SCENARIO_COLUMNS + HISTORY_RESULT_COLUMNS
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _scenario_values(scenario):
+    return (float(scenario["turno_horas"]), int(bool(scenario.get("desayuno"))), int(bool(scenario.get("almuerzo"))),
+            *(int(scenario.get(key, 0)) for key in HISTORY_SCENARIO_COLUMNS[3:]))
+
+
+def record_single(conn, machine, scenario, result, snapshot_version, source="calculadora", calculated_at=None):
+    """Añade un cálculo de ``engine.compute_single`` al historial."""
+    conn.execute(INSERT_HISTORY_SQL, (
+        calculated_at or _now(), source, None, machine["name"], machine.get("category") or DEFAULT_CATEGORY,
+        snapshot_version, *_scenario_values(scenario),
+        *(float(result[key]) if key != "valido" else int(result[key]) for key in HISTORY_RESULT_COLUMNS),
+    ))
+
+
+def record_batch(conn, columns, scenario, snapshot_version, source="lote", calculated_at=None):
+    """Añade un lote de ``batch.compute_columns`` (una fila por máquina, mismo ``run_id``); devuelve el ``run_id``."""
+    run_id = uuid.uuid4().hex
+    head = (calculated_at or _now(), source, run_id)
+    scenario_values = _scenario_values(scenario)
+    results = zip(*(columns[key].tolist() for key in ("name", "category") + HISTORY_RESULT_COLUMNS))
+    conn.executemany(INSERT_HISTORY_SQL, (
+        (*head, name, category or DEFAULT_CATEGORY, snapshot_version, *scenario_values, *values[:-1], int(values[-1]))
+        for name, category, *values in results
+    ))
+    return run_id
+
+
+def trend(conn, scope, key, period="day", start="0000-00-00", end="9999-99-99"):
+    """Serie temporal de ``key`` (nombre de máquina o categoría) desde los agregados.
+
+    Devuelve una fila por día/semana (``period_start`` es la fecha del día o del
+    lunes de la semana) con las columnas de ``TREND_COLUMNS``.
+    """
+    if period not in ROLLUP_PERIODS or scope not in ROLLUP_SCOPES:
+        raise ValueError(f"Periodo/ámbito no válido: {period}/{scope}")
+    return [dict(zip(TREND_COLUMNS, row)) for row in conn.execute(TREND_SQL, (period, scope, key, start, end))]
+
+
+def recent(conn, limit=50, machine=None):
+    """Últimos cálculos registrados (opcionalmente de una máquina)."""
+    where = "WHERE machine = ?" if machine is not None else ""
+    params = (machine, limit) if machine is not None else (limit,)
+    sql = f"SELECT {', '.join(RECENT_COLUMNS)} FROM calc_history {where} ORDER BY calculated_at DESC, id DESC LIMIT ?"
+    return [dict(zip(RECENT_COLUMNS, row)) for row in conn.execute(sql, params)]
+
+
+def history_keys(conn, scope):
+    """Máquinas o categorías con historial (para los selectores)."""
+    if scope not in ROLLUP_SCOPES:
+        raise ValueError(f"Ámbito no válido: {scope}")
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT key FROM calc_rollups WHERE period = 'week' AND scope = ? ORDER BY key", (scope,))]
+
+
+def rebuild_rollups(conn):
+    """Recalcula ``calc_rollups`` desde ``calc_history`` (tras borrar historial o para verificar)."""
+    conn.execute("DELETE FROM calc_rollups")
+    for period, start_sql in ROLLUP_PERIODS.items():
+        for scope in ROLLUP_SCOPES:
+            conn.execute(f"""
+                INSERT INTO calc_rollups (period, scope, key, period_start, calculations, unidades_sum,
+                                          peso_kg_sum, eficiencia_sum, unidades_min, unidades_max, invalidas)
+                SELECT '{period}', '{scope}', {scope}, {start_sql.format(col='calculated_at')}, COUNT(*),
+                       SUM(unidades), SUM(peso_kg), SUM(eficiencia), MIN(unidades), MAX(unidades), SUM(NOT valido)
+                FROM calc_history
+                GROUP BY 3, 4
+            """)
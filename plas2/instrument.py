@@ -0,0 +1,222 @@
+"""Instrumentación opcional de cada rerun: tiempos, consultas SQL, JSON y HTML.
+
+Un ``Recorder`` acumula lo ocurrido durante una ejecución del script (o de un
+fragmento): tiempo total, tiempo y llamadas por función (``timed``/``span``),
+sentencias SQL ejecutadas y filas leídas por las conexiones del pool, tiempo
+de decodificación JSON y bytes de HTML enviados al navegador.
+
+El registro activo vive en una ``ContextVar``: cada sesión de Streamlit
+ejecuta su script en su propio hilo, así que las mediciones no se mezclan.
+Sin registro activo, cada punto instrumentado sólo lee esa variable.
+Los resúmenes terminados se guardan en un ``MetricsLog`` circular.
+
+Este módulo no importa Streamlit ni NumPy (lo usan también ``db`` y la CLI).
+"""
+
+import contextvars
+import functools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LOG_SIZE = 500 # Resúmenes que guarda el registro circular
+
+_current = contextvars.ContextVar("plas2_recorder", default=None)
+
+
+class Recorder:
+    """Mediciones de una ejecución."""
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.spans = {} # {etiqueta: [llamadas, segundos]}
+        self.queries = 0
+        self.rows_read = 0
+        self.html_bytes = 0
+        self.html_blocks = 0
+        self.wall = None
+        self._start = time.perf_counter()
+
+    def add(self, label, seconds):
+        entry = self.spans.setdefault(label, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._start
+
+    def summary(self):
+        """Resumen serializable en JSON; los tiempos en ms."""
+        wall = self.wall if self.wall is not None else time.perf_counter() - self._start
+        return {
+            "label": self.label,
+            "started_at": self.started_at,
+            "wall_ms": round(wall * 1000, 2),
+            "spans": {label: {"calls": calls, "ms": round(seconds * 1000, 2)}
+                      for label, (calls, seconds) in sorted(self.spans.items(), key=lambda item: -item[1][1])},
+            "queries": self.queries,
+            "rows_read": self.rows_read,
+            "html_bytes": self.html_bytes,
+            "html_blocks": self.html_blocks,
+        }
+
+
+def active():
+    """Registro activo en este contexto (None si la instrumentación está desactivada)."""
+    return _current.get()
+
+
+@contextmanager
+def recording(label, log=None):
+    """Registra el bloque ``with`` y, al terminar, guarda su resumen en ``log``.
+
+    Si ya hay un registro activo (un fragmento ejecutado dentro del script
+    completo), el bloque cuenta como un ``span`` de ése.
+    """
+    if _current.get() is not None:
+        with span(label):
+            yield _current.get()
+        return
+    recorder = Recorder(label)
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+        recorder.finish()
+        if log is not None:
+            log.append(recorder.summary())
+
+
+@contextmanager
+def span(label):
+    """Cronometra el bloque ``with`` bajo ``label`` si hay un registro activo."""
+    recorder = _current.get()
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(label, time.perf_counter() - start)
+
+
+def timed(fn):
+    """Decorador: cronometra cada llamada a ``fn`` bajo su nombre."""
+    label = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        recorder = _current.get()
+        if recorder is None:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            recorder.add(label, time.perf_counter() - start)
+    return wrapper
+
+
+def call(label, fn, *args):
+    """``fn(*args)`` cronometrado bajo ``label`` (para llamadas cortas en bucles, sin ``with``)."""
+    recorder = _current.get()
+    if recorder is None:
+        return fn(*args)
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        recorder.add(label, time.perf_counter() - start)
+
+
+def html(markup):
+    """Cuenta ``markup`` como HTML enviado al navegador y lo devuelve."""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.html_bytes += len(markup.encode("utf-8"))
+        recorder.html_blocks += 1
+    return markup
+
+
+# --- SQLite ---
+
+class CountingCursor(sqlite3.Cursor):
+    """Cursor que suma las filas que devuelve al registro activo."""
+
+    def _count(self, rows):
+        recorder = _current.get()
+        if recorder is not None:
+            recorder.rows_read += rows
+
+    def __next__(self):
+        row = super().__next__()
+        self._count(1)
+        return row
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count(len(rows))
+        return rows
+
+
+class Connection(sqlite3.Connection):
+    """Conexión del pool: con un registro activo cuenta sentencias y filas leídas.
+
+    Sin registro activo el coste es una llamada a método por sentencia.
+    """
+
+    def execute(self, sql, parameters=()):
+        recorder = _current.get()
+        if recorder is None:
+            return super().execute(sql, parameters)
+        recorder.queries += 1
+        return self.cursor(CountingCursor).execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        recorder = _current.get()
+        if recorder is not None:
+            recorder.queries += 1
+        return super().executemany(sql, parameters)
+
+
+# --- Registro circular ---
+
+class MetricsLog:
+    """Últimos ``size`` resúmenes de ejecución, compartido por el proceso."""
+
+    def __init__(self, size=LOG_SIZE):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, summary):
+        with self._lock:
+            self._entries.append(summary)
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def to_jsonl(self):
+        """Resúmenes en JSON Lines, del más antiguo al más reciente."""
+        return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.entries())
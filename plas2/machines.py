@@ -0,0 +1,103 @@
+"""Operaciones de máquinas sin interfaz: inicializar la BD, altas, ediciones y bajas.
+
+Son las funciones que usan la aplicación Streamlit (que añade los mensajes al
+usuario), la CLI y cualquier script. Lanzan ``sqlite3.Error`` en caso de fallo;
+cada escritura es una transacción del pool con reintentos ante bloqueos. Una
+edición con versión esperada que llega tarde lanza ``StaleMachineError`` y
+una máquina asignada a un perfil que ya no existe, ``MissingProfileError``.
+"""
+
+from datetime import datetime
+
+from . import schema, search
+from .constants import DEFAULT_CATEGORY
+from .db import get_pool
+from .profiles import load_profile
+
+
+def init_db(db_path, check_index=False):
+    """Crea la BD si no existe, aplica las migraciones pendientes y verifica el índice de búsqueda.
+
+    Con la BD al día no se toma el bloqueo de escritura: el índice se comprueba
+    con ``search.index_in_sync`` en una lectura y sólo se reconstruye si no
+    coincide. ``check_index`` hace la verificación completa de FTS5 (lenta con
+    flotas grandes; la usa ``python -m plas2 migrate``). Devuelve las
+    descripciones a reportar al usuario.
+    """
+    pool = get_pool(db_path)
+    with pool.connection() as conn:
+        applied = schema.migrate(conn)
+    if check_index:
+        rebuilt = pool.run_write(lambda conn: search.ensure_index(conn, thorough=True))
+    else:
+        with pool.read() as conn:
+            in_sync = search.index_in_sync(conn)
+        rebuilt = not in_sync and pool.run_write(search.ensure_index) # Se vuelve a comprobar ya con el bloqueo
+    if rebuilt:
+        applied.append("Índice de búsqueda reconstruido (no coincidía con la tabla de máquinas)")
+    return applied
+
+
+class MissingProfileError(Exception):
+    """El perfil asignado a la máquina se eliminó (p. ej. desde otra sesión)."""
+
+    def __init__(self, profile_id):
+        super().__init__(f"El perfil {profile_id} ya no existe.")
+        self.profile_id = profile_id
+
+
+def _prepare(conn, config):
+    category = config.get("category", DEFAULT_CATEGORY) or DEFAULT_CATEGORY
+    profile_id = config.get("profile_id")
+    profile = load_profile(conn, profile_id) if profile_id is not None else None
+    if profile_id is not None and profile is None:
+        raise MissingProfileError(profile_id) # Sin esto se guardaría profile_id = NULL sin avisar
+    return {**config, "category": category}, profile
+
+
+def add_machine(db_path, config):
+    """Inserta una máquina (sólo se guardan los parámetros que sobrescriben su perfil).
+
+    Lanza ``sqlite3.IntegrityError`` si ya existe una máquina con ese nombre.
+    """
+    def write(conn):
+        prepared, profile = _prepare(conn, config)
+        prepared.setdefault("created_at", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        conn.execute(schema.INSERT_MACHINE_SQL, schema.machine_row_values({**prepared, "updated_at": None}, profile))
+    get_pool(db_path).run_write(write)
+
+
+class StaleMachineError(Exception):
+    """La máquina cambió (o se eliminó) desde que se leyó la versión con la que se edita."""
+
+    def __init__(self, name, expected_version, current_version):
+        detail = "ya no existe" if current_version is None else f"está en la versión {current_version}"
+        super().__init__(f"La máquina '{name}' {detail}; se editó la versión {expected_version}.")
+        self.name = name
+        self.expected_version = expected_version
+        self.current_version = current_version # None si se eliminó o se renombró
+
+
+def update_machine(db_path, original_name, config, expected_version=None):
+    """Actualiza la máquina ``original_name`` (puede renombrarse); devuelve si existía.
+
+    Con ``expected_version`` (el ``row_version`` leído al abrir la edición) sólo
+    se escribe si la fila sigue en esa versión; si otra sesión la cambió entre
+    medias lanza ``StaleMachineError`` y no escribe nada.
+    """
+    def write(conn):
+        prepared, profile = _prepare(conn, config)
+        prepared.setdefault("updated_at", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        values = schema.machine_update_values(original_name, prepared, profile)
+        if expected_version is None:
+            return conn.execute(schema.UPDATE_MACHINE_SQL, values).rowcount > 0
+        if conn.execute(schema.UPDATE_MACHINE_IF_VERSION_SQL, (*values, expected_version)).rowcount == 0:
+            row = conn.execute("SELECT row_version FROM machines WHERE name = ?", (original_name,)).fetchone()
+            raise StaleMachineError(original_name, expected_version, row[0] if row else None)
+        return True
+    return get_pool(db_path).run_write(write)
+
+
+def delete_machine(db_path, name):
+    """Elimina una máquina por nombre; devuelve si existía."""
+    return get_pool(db_path).run_write(lambda conn: conn.execute(schema.DELETE_MACHINE_SQL, (name,)).rowcount > 0)
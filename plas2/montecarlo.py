@@ -0,0 +1,131 @@
+"""Simulación Monte Carlo del turno con interrupciones estocásticas.
+
+Cada ensayo simula un turno completo por máquina:
+
+- nº de eventos de cada tipo ~ Poisson(nº planificado) si ``conteos_aleatorios``;
+- duración de cada evento ~ Gamma con media el tiempo configurado y
+  coeficiente de variación ``duracion_cv``. La suma de ``k`` duraciones Gamma
+  iid es otra Gamma (forma ``k·α``), así que cada tipo de evento se muestrea
+  con una sola llamada sea cual sea el nº de eventos;
+- calibración y otros fijos ~ Gamma con coeficiente ``fijas_cv``;
+- ``ratio_productivo`` ~ Beta con la media configurada y desviación ``ratio_sd``.
+
+Todo se calcula sobre matrices ``(máquinas, ensayos)``, por trozos de
+``MACHINES_PER_TASK`` máquinas con su propia semilla derivada
+(``SeedSequence.spawn``). No se usa un pool de procesos: devolver al proceso
+principal las matrices de ensayos cuesta tanto como simularlas, y crear
+procesos desde el servidor multihilo de Streamlit no es seguro.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import engine
+from .constants import ALMUERZO_MIN, DESAYUNO_MIN
+
+PERCENTILES = (10, 50, 90)
+MACHINES_PER_TASK = 50
+
+
+@dataclass
+class Variability:
+    """Parámetros de las distribuciones. Con todo a 0/False la simulación es determinista."""
+    duracion_cv: float = 0.3        # CV de la duración de cada cambio
+    fijas_cv: float = 0.1           # CV de calibración + otros
+    conteos_aleatorios: bool = True # nº de eventos ~ Poisson(planificado)
+    ratio_sd: float = 0.03          # desviación típica de ratio_productivo
+
+
+@dataclass
+class SimulationResult:
+    """Ensayos por máquina: cada campo es ``(n_maquinas, ensayos)``."""
+    names: np.ndarray
+    unidades: np.ndarray
+    peso_kg: np.ndarray
+    eficiencia: np.ndarray
+
+    def percentiles(self, metric, q=PERCENTILES):
+        """Percentiles ``q`` de ``metric`` por máquina: ``(n_maquinas, len(q))``."""
+        return np.percentile(getattr(self, metric), q, axis=1).T
+
+    def total_percentiles(self, metric, rows=None, q=PERCENTILES):
+        """Percentiles del total por ensayo (suma de las máquinas ``rows``, todas por defecto)."""
+        values = getattr(self, metric)
+        totals = (values if rows is None else values[rows]).sum(axis=0)
+        return np.percentile(totals, q)
+
+
+def _gamma(rng, mean, cv, shape_factor=1.0):
+    """Gamma de media ``mean·shape_factor`` y CV ``cv`` (para una unidad); 0 donde la media o el factor son 0."""
+    mean = np.asarray(mean, dtype=float)
+    if cv <= 0:
+        return np.broadcast_to(mean * shape_factor, np.broadcast(mean, shape_factor).shape).copy()
+    alpha = 1.0 / cv ** 2
+    shape = alpha * np.asarray(shape_factor, dtype=float)
+    scale = mean * cv ** 2
+    positive = (shape > 0) & (scale > 0)
+    draws = rng.gamma(np.where(positive, shape, 1.0), np.where(positive, scale, 1.0))
+    return np.where(positive, draws, 0.0)
+
+
+def _beta(rng, mean, sd, size):
+    mean = np.broadcast_to(np.asarray(mean, dtype=float), size)
+    if sd <= 0:
+        return mean.copy()
+    var = sd ** 2
+    valid = (mean > 0) & (mean < 1) & (var < mean * (1 - mean))
+    k = np.where(valid, mean * (1 - mean) / np.where(valid, var, 1.0) - 1, 1.0)
+    draws = rng.beta(np.where(valid, mean * k, 1.0), np.where(valid, (1 - mean) * k, 1.0))
+    return np.where(valid, draws, mean) # ratio 0/1 (p. ej. Automática) o sd imposible: se mantiene fijo
+
+
+def _simulate_chunk(machines, scenario, variability, trials, seed):
+    rng = np.random.default_rng(seed)
+    n = len(machines)
+    size = (n, trials)
+    col = lambda a: np.asarray(a, dtype=float)[:, None]
+
+    turno_minutos = scenario["turno_horas"] * 60
+    comidas = (DESAYUNO_MIN if scenario.get("desayuno") else 0) + (ALMUERZO_MIN if scenario.get("almuerzo") else 0)
+    fijas = _gamma(rng, np.broadcast_to(col(machines.calibracion + machines.otros), size), variability.fijas_cv)
+    variables = np.zeros(size)
+    for j, key in enumerate(engine.EVENT_KEYS):
+        planned = float(scenario.get(key, 0))
+        minutos = np.where(machines.evento_aplica[:, j], machines.minutos_evento[:, j], 0.0)
+        if planned <= 0 or not minutos.any():
+            continue
+        counts = rng.poisson(planned, size) if variability.conteos_aleatorios else np.full(size, planned)
+        variables += _gamma(rng, np.broadcast_to(col(minutos), size), variability.duracion_cv, counts)
+
+    neto = turno_minutos - fijas - comidas - variables
+    ratio = _beta(rng, col(machines.ratio_productivo), variability.ratio_sd, size)
+    efectivo = np.where(neto > 0, neto * ratio, 0.0)
+    unidades = col(machines.unidades_por_minuto) * efectivo
+    peso = col(machines.peso_por_unidad)
+    peso_kg = np.where(peso > 0, unidades * peso / 1000, 0.0)
+    eficiencia = efectivo / turno_minutos * 100 if turno_minutos > 0 else np.zeros(size)
+    return unidades, peso_kg, eficiencia
+
+
+def _slice_batch(machines, start, stop):
+    return engine.MachineBatch(*(getattr(machines, field)[start:stop] for field in engine.MachineBatch.__dataclass_fields__))
+
+
+def simulate(configs, scenario, trials=10_000, variability=None, seed=None):
+    """Simula ``trials`` turnos por máquina con el escenario de la calculadora.
+
+    ``scenario`` usa las mismas claves que ``engine.compute_single``.
+    """
+    variability = variability or Variability()
+    machines = engine.MachineBatch.from_configs(configs)
+    n = len(machines)
+    bounds = [(start, min(start + MACHINES_PER_TASK, n)) for start in range(0, n, MACHINES_PER_TASK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds)) # Una semilla por trozo de máquinas
+    parts = [_simulate_chunk(_slice_batch(machines, start, stop), scenario, variability, trials, chunk_seed)
+             for (start, stop), chunk_seed in zip(bounds, seeds)]
+    if not parts:
+        empty = np.zeros((0, trials))
+        return SimulationResult(machines.names, empty, empty, empty)
+    unidades, peso_kg, eficiencia = (np.concatenate(arrays) for arrays in zip(*parts))
+    return SimulationResult(machines.names, unidades, peso_kg, eficiencia)
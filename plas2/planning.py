@@ -0,0 +1,283 @@
+"""Planificación de capacidad por día sobre un calendario de turnos.
+
+Un ``ShiftCalendar`` da, para cada día del horizonte, la lista de turnos (cada
+uno un escenario como el de la calculadora: ``turno_horas``, comidas y
+cambios previstos). Los festivos no tienen turnos y se puede sustituir el plan
+de cualquier día concreto. Los mantenimientos planificados restan minutos del
+tiempo neto de una máquina en un día.
+
+``CapacityPlan`` calcula la flota completa como matrices ``(máquinas, días)``:
+
+* Los turnos de todos los días se deduplican (un patrón semanal tiene pocos
+  escenarios distintos) y se calculan en una sola pasada de
+  ``engine.compute_shift``; cada día suma las columnas de sus turnos.
+* Por máquina y día se guarda el tiempo neto antes de mantenimiento. Cambiar un
+  día recalcula sólo esa columna, cambiar una máquina sólo su fila y cambiar
+  un mantenimiento sólo esa celda, sin volver a calcular el horizonte.
+
+Por turno, las fórmulas son las del motor: ``efectivo = max(neto, 0) * ratio``,
+unidades = ``efectivo * unidades_por_minuto``. El mantenimiento se descuenta del
+neto del día (nunca por debajo de 0).
+"""
+
+from dataclasses import fields
+from datetime import timedelta
+
+import numpy as np
+
+from . import engine
+from .constants import DEFAULT_CATEGORY
+from .fleet import FleetTable
+
+PERIODS = ("day", "week", "month")
+GROUPS = ("machine", "category", "fleet")
+PLAN_COLUMNS = ("period_start", "key", "unidades", "peso_kg", "tiempo_efectivo", "turno_minutos",
+                "mantenimiento_min", "eficiencia")
+
+
+def _scenario_key(scenario):
+    return (float(scenario["turno_horas"]), bool(scenario.get("desayuno", False)), bool(scenario.get("almuerzo", False)),
+            *(int(scenario.get(key, 0)) for key in engine.EVENT_KEYS))
+
+
+def with_changeovers(shifts, counts):
+    """Copia de ``shifts`` con los nº de cambios de ``counts`` aplicados a cada turno (plan de un día)."""
+    return [{**shift, **counts} for shift in shifts]
+
+
+class ShiftCalendar:
+    """Turnos de cada día del horizonte ``[start, start + days)``.
+
+    ``pattern`` asigna a cada día de la semana (0 = lunes) su lista de turnos;
+    ``overrides`` sustituye la lista de días concretos y ``holidays`` los deja
+    sin turnos.
+    """
+
+    def __init__(self, start, days, pattern, holidays=(), overrides=None):
+        self.dates = [start + timedelta(days=i) for i in range(days)]
+        self.pattern = {weekday: list(pattern.get(weekday, ())) for weekday in range(7)}
+        self.holidays = set(holidays)
+        self.overrides = dict(overrides or {})
+
+    def shifts_for(self, day):
+        if day in self.holidays:
+            return []
+        if day in self.overrides:
+            return list(self.overrides[day])
+        return self.pattern[day.weekday()]
+
+
+def _net_minutes(machines, day_shifts):
+    """Tiempo neto (máquinas, días) y minutos de turno (días,) de una lista de planes diarios."""
+    unique = {}
+    for shifts in day_shifts:
+        for shift in shifts:
+            unique.setdefault(_scenario_key(shift), shift)
+    keys = list(unique)
+    n_days = len(day_shifts)
+    width = max((len(shifts) for shifts in day_shifts), default=0)
+    if not keys or not width:
+        return np.zeros((len(machines), n_days)), np.zeros(n_days)
+    res = engine.compute_shift(machines, engine.ScenarioBatch.from_records(unique.values()))
+    # Columna extra de ceros para rellenar los días con menos turnos
+    neto = np.concatenate([np.maximum(res.tiempo_neto_disponible, 0.0), np.zeros((len(machines), 1))], axis=1)
+    turno = np.append(res.turno_minutos[0] if len(machines) else [s["turno_horas"] * 60 for s in unique.values()], 0.0)
+    position = {key: i for i, key in enumerate(keys)}
+    index = np.full((n_days, width), len(keys))
+    for d, shifts in enumerate(day_shifts):
+        index[d, :len(shifts)] = [position[_scenario_key(shift)] for shift in shifts]
+    return neto[:, index].sum(axis=2), turno[index].sum(axis=1)
+
+
+class CapacityPlan:
+    """Capacidad diaria de una flota sobre un ``ShiftCalendar``, con recálculo incremental.
+
+    ``configs`` es una ``FleetTable`` (o dicts de máquina) y ``maintenance``
+    ``{(nombre, fecha): minutos}``.
+    """
+
+    def __init__(self, configs, calendar, maintenance=None):
+        self.fleet = configs if isinstance(configs, FleetTable) else FleetTable.from_configs(configs)
+        self.machines = self.fleet.machine_batch()
+        self.categories = self.fleet.categories
+        self.index = {name: i for i, name in enumerate(self.machines.names)}
+        self.dates = list(calendar.dates)
+        self.day_index = {day: d for d, day in enumerate(self.dates)}
+        self.shifts = [calendar.shifts_for(day) for day in self.dates]
+        self.neto_base, self.turno_minutos = _net_minutes(self.machines, self.shifts)
+        self.mantenimiento = np.zeros_like(self.neto_base)
+        for (name, day), minutes in (maintenance or {}).items():
+            if name in self.index and day in self.day_index:
+                self.mantenimiento[self.index[name], self.day_index[day]] = minutes
+        self.tiempo_efectivo = np.empty_like(self.neto_base)
+        self._refresh(slice(None), slice(None))
+
+    def _refresh(self, rows, cols):
+        """Recalcula el tiempo efectivo del bloque ``rows × cols`` (``rows`` slice; ``cols`` slice o lista)."""
+        neto = np.maximum(self.neto_base[rows, cols] - self.mantenimiento[rows, cols], 0.0)
+        self.tiempo_efectivo[rows, cols] = neto * self.machines.ratio_productivo[rows, None]
+
+    # --- Cambios incrementales ---
+
+    def set_days(self, plans):
+        """Sustituye los turnos de varios días (``{fecha: turnos}``) y recalcula sólo esas columnas."""
+        if not plans:
+            return
+        cols = [self.day_index[day] for day in plans]
+        for d, shifts in zip(cols, plans.values()):
+            self.shifts[d] = list(shifts)
+        neto, turno = _net_minutes(self.machines, [self.shifts[d] for d in cols])
+        self.neto_base[:, cols] = neto
+        self.turno_minutos[cols] = turno
+        self._refresh(slice(None), cols)
+
+    def set_day(self, day, shifts):
+        self.set_days({day: shifts})
+
+    def set_maintenance(self, name, day, minutes):
+        """Fija los minutos de mantenimiento de una máquina en un día (0 lo elimina)."""
+        m, d = self.index[name], self.day_index[day]
+        self.mantenimiento[m, d] = minutes
+        self._refresh(slice(m, m + 1), slice(d, d + 1))
+
+    def set_machine(self, config):
+        """Añade o actualiza una máquina y recalcula sólo su fila."""
+        one = engine.MachineBatch.from_configs([config])
+        neto, _ = _net_minutes(one, self.shifts)
+        name = config["name"]
+        if name in self.index:
+            m = self.index[name]
+            for field in fields(engine.MachineBatch):
+                getattr(self.machines, field.name)[m] = getattr(one, field.name)[0]
+            self.categories[m] = config.get("category") or DEFAULT_CATEGORY
+            self.neto_base[m] = neto[0]
+        else:
+            m = self.index[name] = len(self.machines)
+            self.machines = engine.MachineBatch(*(np.concatenate([getattr(self.machines, f.name), getattr(one, f.name)])
+                                                  for f in fields(engine.MachineBatch)))
+            self.categories = np.append(self.categories, config.get("category") or DEFAULT_CATEGORY)
+            self.neto_base = np.vstack([self.neto_base, neto])
+            self.mantenimiento = np.vstack([self.mantenimiento, np.zeros((1, len(self.dates)))])
+            self.tiempo_efectivo = np.vstack([self.tiempo_efectivo, np.zeros((1, len(self.dates)))])
+        self._refresh(slice(m, m + 1), slice(None))
+
+    def remove_machine(self, name):
+        m = self.index.pop(name)
+        keep = np.arange(len(self.machines)) != m
+        self.machines = engine.MachineBatch(*(getattr(self.machines, f.name)[keep] for f in fields(engine.MachineBatch)))
+        self.categories = self.categories[keep]
+        self.neto_base, self.mantenimiento, self.tiempo_efectivo = (
+            a[keep] for a in (self.neto_base, self.mantenimiento, self.tiempo_efectivo))
+        self.index = {n: i for i, n in enumerate(self.machines.names)}
+
+    # --- Aplicar un plan editado: sólo se recalcula lo que cambió ---
+
+    def apply_calendar(self, calendar):
+        """Recalcula los días cuyo plan difiere de ``calendar``; devuelve cuántos."""
+        changed = {}
+        for d, day in enumerate(self.dates):
+            shifts = calendar.shifts_for(day)
+            if [_scenario_key(s) for s in shifts] != [_scenario_key(s) for s in self.shifts[d]]:
+                changed[day] = shifts
+        self.set_days(changed)
+        return len(changed)
+
+    def apply_maintenance(self, maintenance):
+        """Sincroniza los mantenimientos con ``{(nombre, fecha): minutos}``; devuelve las celdas cambiadas."""
+        wanted = np.zeros_like(self.mantenimiento)
+        for (name, day), minutes in maintenance.items():
+            if name in self.index and day in self.day_index:
+                wanted[self.index[name], self.day_index[day]] = minutes
+        rows, cols = np.nonzero(wanted != self.mantenimiento)
+        for m, d in zip(rows, cols):
+            self.mantenimiento[m, d] = wanted[m, d]
+            self._refresh(slice(m, m + 1), slice(d, d + 1))
+        return len(rows)
+
+    def apply_machines(self, configs):
+        """Sincroniza la flota con ``configs`` (altas, cambios y bajas); devuelve las máquinas recalculadas.
+
+        Con la misma ``FleetTable`` de la última sincronización no hay nada que
+        hacer; con otra, los cambios se detectan comparando columnas.
+        """
+        fleet = configs if isinstance(configs, FleetTable) else FleetTable.from_configs(configs)
+        if fleet is self.fleet:
+            return 0
+        removed = [name for name in self.index if name not in fleet]
+        for name in removed:
+            self.remove_machine(name)
+        new = fleet.machine_batch()
+        rows = np.array([self.index.get(name, -1) for name in new.names.tolist()], dtype=np.intp)
+        known = rows >= 0
+        differs = self.categories[rows[known]] != fleet.categories[known]
+        for field in fields(engine.MachineBatch):
+            diff = getattr(self.machines, field.name)[rows[known]] != getattr(new, field.name)[known]
+            differs |= diff.any(axis=1) if diff.ndim > 1 else diff
+        changed = ~known
+        changed[known] = differs
+        for row in np.flatnonzero(changed):
+            self.set_machine(fleet.config(row))
+        self.fleet = fleet
+        return len(removed) + int(changed.sum())
+
+    # --- Resultados ---
+
+    @property
+    def unidades(self):
+        return self.tiempo_efectivo * self.machines.unidades_por_minuto[:, None]
+
+    @property
+    def peso_kg(self):
+        return self.unidades * self.machines.peso_por_unidad[:, None] / 1000
+
+    def _period_starts(self, period):
+        if period == "day":
+            return self.dates
+        if period == "week":
+            return [day - timedelta(days=day.weekday()) for day in self.dates]
+        if period == "month":
+            return [day.replace(day=1) for day in self.dates]
+        raise ValueError(f"Periodo no válido: {period}")
+
+    def table(self, period="week", group="machine"):
+        """Capacidad agregada por periodo y máquina/categoría/flota, como dict de columnas (``PLAN_COLUMNS``)."""
+        if group not in GROUPS:
+            raise ValueError(f"Agrupación no válida: {group}")
+        starts = self._period_starts(period)
+        # Los días son consecutivos: cada periodo es un tramo contiguo de columnas
+        bounds = [0] + [d for d in range(1, len(starts)) if starts[d] != starts[d - 1]]
+        labels = [starts[b] for b in bounds]
+        if not self.dates:
+            return {column: np.array([]) for column in PLAN_COLUMNS}
+        # Primero por periodo (máquinas × periodos) y después, ya reducido, por grupo. Unidades
+        # y kg son proporcionales al tiempo efectivo de cada máquina: se derivan tras reducir
+        efectivo = np.add.reduceat(self.tiempo_efectivo, bounds, axis=1)
+        unidades = efectivo * self.machines.unidades_por_minuto[:, None]
+        columns = {"unidades": unidades, "peso_kg": unidades * self.machines.peso_por_unidad[:, None] / 1000,
+                   "tiempo_efectivo": efectivo, "mantenimiento_min": np.add.reduceat(self.mantenimiento, bounds, axis=1)}
+        turno = np.add.reduceat(self.turno_minutos, bounds)
+        if group == "machine":
+            keys = self.machines.names
+            turno = np.broadcast_to(turno, (len(keys), len(labels)))
+        else:
+            if group == "category":
+                keys, inverse = np.unique(self.categories.astype(str), return_inverse=True)
+            else:
+                keys, inverse = np.array(["Flota"], dtype=object), np.zeros(len(self.machines), dtype=int)
+            for name, matrix in columns.items():
+                grouped = np.zeros((len(keys), matrix.shape[1]))
+                np.add.at(grouped, inverse, matrix)
+                columns[name] = grouped
+            turno = np.bincount(inverse, minlength=len(keys))[:, None] * turno # Minutos de turno de todas sus máquinas
+        n_keys, n_periods = len(keys), len(labels)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            eficiencia = np.where(turno > 0, columns["tiempo_efectivo"] / turno * 100, 0.0)
+        flat = lambda a: np.asarray(a).T.reshape(-1) # Orden: periodo, luego clave
+        return {
+            "period_start": np.repeat(np.array(labels, dtype=object), n_keys),
+            "key": np.tile(np.asarray(keys, dtype=object), n_periods),
+            **{name: flat(columns[name]) for name in ("unidades", "peso_kg", "tiempo_efectivo")},
+            "turno_minutos": flat(turno),
+            "mantenimiento_min": flat(columns["mantenimiento_min"]),
+            "eficiencia": flat(eficiencia),
+        }
@@ -0,0 +1,106 @@
+"""Plantas: una base de datos SQLite por planta.
+
+Cada planta es un fichero propio, y por tanto tiene su propio pool, su
+repositorio en memoria, su WAL y su bloqueo de escritura: escribir en una
+planta nunca bloquea lecturas ni escrituras de otra, y añadir una planta no
+cambia nada en las existentes. La planta por defecto es el fichero histórico
+(``production_data_v3.db``); las demás son ``<planta>.db`` dentro de
+``PLANTS_DIR``.
+
+Los informes de toda la flota consultan cada planta en paralelo (un hilo y
+una conexión de lectura por BD; SQLite libera el GIL mientras ejecuta) y
+combinan los agregados en Python. Se descartó ``ATTACH``: una sola conexión
+serializa las lecturas y queda limitada a ``SQLITE_MAX_ATTACHED`` plantas.
+"""
+
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from . import queries
+from .db import get_pool
+from .machines import init_db
+
+DEFAULT_PLANT = "Principal"
+PLANTS_DIR = "plantas"
+MAX_WORKERS = 8
+REPORT_COLUMNS = ("plant", "category", "machines", "unidades_hora", "kg_hora", "max_kg_hora")
+_NAME_RE = re.compile(r"^\w[\w\- ]{0,39}$") # El nombre es también el nombre del fichero
+
+
+def plant_databases(default_db, plants_dir=PLANTS_DIR):
+    """``{planta: fichero}``: la planta por defecto y cada ``<planta>.db`` de ``plants_dir``, por nombre."""
+    plants = {DEFAULT_PLANT: default_db}
+    if os.path.isdir(plants_dir):
+        for entry in sorted(os.listdir(plants_dir), key=str.lower):
+            name, ext = os.path.splitext(entry)
+            if ext == ".db" and name != DEFAULT_PLANT and _NAME_RE.match(name):
+                plants[name] = os.path.join(plants_dir, entry)
+    return plants
+
+
+def create_plant(name, plants_dir=PLANTS_DIR):
+    """Crea la BD de una planta nueva con el esquema al día; devuelve su fichero.
+
+    Lanza ``ValueError`` si el nombre no es válido o la planta ya existe.
+    """
+    name = name.strip()
+    if not _NAME_RE.match(name):
+        raise ValueError("Use letras, números, espacios, '-' o '_' (máx. 40 caracteres).")
+    path = os.path.join(plants_dir, f"{name}.db")
+    if name == DEFAULT_PLANT or os.path.exists(path):
+        raise ValueError(f"La planta '{name}' ya existe.")
+    os.makedirs(plants_dir, exist_ok=True)
+    init_db(path)
+    return path
+
+
+def query_plants(plants, fn, max_workers=None):
+    """Ejecuta ``fn(conn)`` en cada planta en paralelo, con una conexión de lectura de su pool.
+
+    Devuelve ``({planta: resultado}, {planta: mensaje de error})``: una planta
+    que falla no impide el informe de las demás.
+    """
+    def run(path):
+        with get_pool(path).read() as conn:
+            return fn(conn)
+
+    results, errors = {}, {}
+    if not plants:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(plants), MAX_WORKERS),
+                            thread_name_prefix="plas2-plant") as executor:
+        futures = {plant: executor.submit(run, path) for plant, path in plants.items()}
+        for plant, future in futures.items():
+            try:
+                results[plant] = future.result()
+            except sqlite3.Error as e:
+                errors[plant] = str(e)
+    return results, errors
+
+
+def fleet_report(plants, max_workers=None):
+    """Capacidad por planta y categoría (filas ``REPORT_COLUMNS``), consultando las plantas en paralelo.
+
+    Devuelve ``(filas, errores)``; las filas siguen el orden de ``plants``.
+    """
+    results, errors = query_plants(plants, queries.fleet_capacity, max_workers)
+    rows = [(plant, *row) for plant in plants if plant in results for row in results[plant]]
+    return rows, errors
+
+
+def rollup_report(rows, by="plant"):
+    """Combina filas de ``fleet_report`` por ``"plant"`` o por ``"category"`` (sumas y máximo).
+
+    El resultado tiene las mismas columnas; la otra clave queda como None.
+    """
+    key_index = REPORT_COLUMNS.index(by)
+    totals = {}
+    for row in rows:
+        key = row[key_index]
+        machines, units, kg, best = totals.get(key, (0, 0.0, 0.0, None))
+        totals[key] = (machines + row[2], units + (row[3] or 0.0), kg + (row[4] or 0.0),
+                       row[5] if best is None or (row[5] is not None and row[5] > best) else best)
+    keys = totals if by == "plant" else sorted(totals)
+    return [(key, None, *totals[key]) if by == "plant" else (None, key, *totals[key]) for key in keys]
@@ -0,0 +1,138 @@
+"""Perfiles de parámetros compartidos entre máquinas.
+
+Un perfil guarda una configuración de setup/producción una sola vez. Las
+máquinas que lo referencian (``machines.profile_id``) heredan cada parámetro
+que tengan a NULL (salvo los que su tipo no tiene, p. ej. ``empaque`` en una
+Semi-Automática) y pueden sobrescribir los demás. Como la combinación se hace
+en la vista ``machines_effective``, cambiar un perfil es un único UPDATE que
+afecta a todas sus máquinas dentro de la misma transacción.
+"""
+
+from datetime import datetime
+
+from .schema import PARAM_KEYS, PRODUCTION_PARAM_KEYS, SETUP_PARAM_KEYS, effective_param_sql, params_from_values
+
+PROFILE_COLUMNS = ("id", "name", "description", "created_at", "updated_at") + PARAM_KEYS
+
+SELECT_PROFILES_SQL = f"""
+    SELECT {', '.join(f'p.{col}' for col in PROFILE_COLUMNS)},
+           (SELECT COUNT(*) FROM machines m WHERE m.profile_id = p.id) AS machines
+    FROM parameter_profiles p
+    ORDER BY p.name
+"""
+SELECT_PROFILE_SQL = f"SELECT {', '.join(PROFILE_COLUMNS)} FROM parameter_profiles WHERE id = ?"
+INSERT_PROFILE_SQL = (
+    f"INSERT INTO parameter_profiles (name, description, created_at, {', '.join(PARAM_KEYS)}) "
+    f"VALUES (?, ?, ?, {', '.join('?' for _ in PARAM_KEYS)})"
+)
+UPDATE_PROFILE_SQL = (
+    f"UPDATE parameter_profiles SET name = ?, description = ?, updated_at = ?, "
+    f"{', '.join(f'{key} = ?' for key in PARAM_KEYS)} WHERE id = ?"
+)
+# Asignar perfil: los parámetros iguales a los del perfil pasan a heredarse (NULL)
+ASSIGN_PROFILE_SQL = f"""
+    UPDATE machines
+    SET profile_id = :profile_id,
+        {', '.join(
+            f"{key} = CASE WHEN {key} IS (SELECT {key} FROM parameter_profiles WHERE id = :profile_id) "
+            f"THEN NULL ELSE {key} END"
+            for key in PARAM_KEYS
+        )},
+        row_version = row_version + 1
+    WHERE name = :name
+"""
+# Desvincular: se materializan en la máquina los valores heredados del perfil
+DETACH_PROFILE_SQL = f"""
+    UPDATE machines
+    SET {', '.join(
+            f"{key} = "
+            f"{effective_param_sql(key, 'machines', f'(SELECT {key} FROM parameter_profiles p WHERE p.id = machines.profile_id)')}"
+            for key in PARAM_KEYS
+        )},
+        profile_id = NULL,
+        row_version = row_version + 1
+    WHERE profile_id = ?
+"""
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _param_values(setup_params, production_params):
+    return tuple(setup_params.get(key) for key in SETUP_PARAM_KEYS) + \
+        tuple(production_params.get(key) for key in PRODUCTION_PARAM_KEYS)
+
+
+def _profile_from_row(row):
+    n_base = 5
+    profile = dict(zip(PROFILE_COLUMNS[:n_base], row[:n_base]))
+    profile["setup_params"], profile["production_params"] = params_from_values(row[n_base:n_base + len(PARAM_KEYS)])
+    return profile
+
+
+def load_profiles(conn):
+    """Devuelve ``{id: perfil}``; cada perfil se construye una sola vez por carga."""
+    profiles = {}
+    for row in conn.execute(SELECT_PROFILES_SQL):
+        profile = _profile_from_row(row)
+        profile["machines"] = row[-1]
+        profiles[profile["id"]] = profile
+    return profiles
+
+
+def load_profile(conn, profile_id):
+    """Devuelve el perfil ``profile_id`` (sin el recuento de máquinas) o None si no existe."""
+    row = conn.execute(SELECT_PROFILE_SQL, (profile_id,)).fetchone()
+    return _profile_from_row(row) if row else None
+
+
+def create_profile(conn, name, setup_params, production_params, description=None):
+    """Crea un perfil y devuelve su id."""
+    cursor = conn.execute(INSERT_PROFILE_SQL, (name, description, _now(), *_param_values(setup_params, production_params)))
+    return cursor.lastrowid
+
+
+def update_profile(conn, profile_id, name, setup_params, production_params, description=None):
+    """Actualiza un perfil: todas sus máquinas ven el cambio con este único UPDATE."""
+    conn.execute(UPDATE_PROFILE_SQL, (name, description, _now(), *_param_values(setup_params, production_params), profile_id))
+
+
+def assign_profile(conn, machine_names, profile_id):
+    """Asigna un perfil a varias máquinas, conservando como override lo que difiera del perfil."""
+    conn.executemany(ASSIGN_PROFILE_SQL, [{"profile_id": profile_id, "name": name} for name in machine_names])
+
+
+def delete_profile(conn, profile_id):
+    """Elimina un perfil tras copiar sus valores en las máquinas que lo usan (no cambian sus parámetros)."""
+    conn.execute(DETACH_PROFILE_SQL, (profile_id,))
+    conn.execute("DELETE FROM parameter_profiles WHERE id = ?", (profile_id,))
+
+
+def group_identical_configurations(conn, min_machines=2):
+    """Crea un perfil por cada configuración de parámetros repetida en máquinas sin perfil.
+
+    Las máquinas agrupadas pasan a referenciar el perfil sin overrides. Devuelve
+    ``[(nombre_perfil, nº_máquinas)]``. Pensado para ejecutarse en una sola
+    transacción de escritura.
+    """
+    groups = {}
+    for row in conn.execute(f"SELECT name, {', '.join(PARAM_KEYS)} FROM machines WHERE profile_id IS NULL ORDER BY name"):
+        groups.setdefault(tuple(row[1:]), []).append(row[0])
+    existing = {row[0] for row in conn.execute("SELECT name FROM parameter_profiles")}
+    created = []
+    for values, names in groups.items():
+        if len(names) < min_machines:
+            continue
+        profile_name = f"Perfil {names[0]}"
+        suffix = 2
+        while profile_name in existing:
+            profile_name = f"Perfil {names[0]} ({suffix})"
+            suffix += 1
+        existing.add(profile_name)
+        setup, production = params_from_values(values)
+        profile_id = create_profile(conn, profile_name, setup, production,
+                                    description=f"Configuración común de {len(names)} máquinas")
+        assign_profile(conn, names, profile_id)
+        created.append((profile_name, len(names)))
+    return created
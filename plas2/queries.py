@@ -0,0 +1,148 @@
+"""Consultas de flota resueltas dentro de SQLite sobre las columnas tipadas.
+
+Se consultan los parámetros efectivos (vista ``machines_effective``: override
+de la máquina o, si no hay, valor de su perfil), o las constantes de capacidad
+ya derivadas de ellos (tabla ``machine_capacity``, ver ``schema.py``).
+
+Ejemplos: todas las máquinas de la categoría X con más de 40 unidades/min, y
+las 10 que más kg/min netos producen en esa categoría::
+
+    find_machines(conn, category="X", unidades_por_minuto=(40, None))
+    top_capacity(conn, "kg_por_minuto", categories=["X"], limit=10)
+"""
+
+from .schema import (CAPACITY_COLUMNS, CAPACITY_METRICS, CAPACITY_SELECT_SQL, EFFECTIVE_COLUMNS, PARAM_KEYS,
+                     machine_from_row)
+
+
+def find_machines(conn, category=None, machine_type=None, **param_ranges):
+    """Máquinas filtradas por categoría, tipo y rangos ``param=(mínimo, máximo)``.
+
+    Cualquiera de los extremos del rango puede ser None. Los límites se aplican
+    con ``>``/``<`` estrictos sobre el mínimo/máximo respectivamente, para que
+    ``(40, None)`` signifique "más de 40".
+    """
+    clauses = []
+    params = []
+    if category is not None:
+        clauses.append("category = ?")
+        params.append(category)
+    if machine_type is not None:
+        clauses.append("type = ?")
+        params.append(machine_type)
+    for key, (low, high) in param_ranges.items():
+        if key not in PARAM_KEYS: # Los nombres de columna no pueden ir como parámetros SQL
+            raise ValueError(f"Parámetro desconocido: {key}")
+        if low is not None:
+            clauses.append(f"{key} > ?")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{key} < ?")
+            params.append(high)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"SELECT {', '.join(EFFECTIVE_COLUMNS)} FROM machines_effective {where} ORDER BY category, name"
+    return [machine_from_row(row) for row in conn.execute(sql, params)]
+
+
+CATEGORY_AGGREGATES_SQL = """
+    SELECT COALESCE(category, 'General') AS category,
+           COUNT(*) AS machines,
+           SUM(type = 'Manual') AS manual,
+           SUM(type = 'Semi-Automática') AS semi,
+           SUM(type = 'Automática') AS auto,
+           AVG(unidades_por_minuto) AS avg_upm,
+           MAX(unidades_por_minuto) AS max_upm,
+           AVG(peso_por_unidad) AS avg_peso_g,
+           AVG(COALESCE(ratio_productivo, 1.0)) AS avg_ratio,
+           SUM(unidades_por_minuto * COALESCE(ratio_productivo, 1.0) * peso_por_unidad) / 1000.0
+               AS kg_por_min_nominal
+    FROM machines_effective
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+
+def category_aggregates(conn):
+    """Agregados por categoría calculados en SQL (sin cargar las máquinas en Python)."""
+    cursor = conn.execute(CATEGORY_AGGREGATES_SQL)
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+# --- Capacidad materializada ---
+
+def _check_metric(metric):
+    if metric not in CAPACITY_METRICS: # Va en ORDER BY: no puede ser parámetro SQL
+        raise ValueError(f"Métrica desconocida: {metric}")
+
+
+def top_capacity(conn, metric="kg_por_minuto", categories=None, limit=10):
+    """Las ``limit`` máquinas con mayor ``metric`` (de ``CAPACITY_METRICS``), opcionalmente de ``categories``."""
+    _check_metric(metric)
+    where = f"WHERE category IN ({', '.join('?' for _ in categories)})" if categories else ""
+    cursor = conn.execute(f"""
+        SELECT {', '.join(CAPACITY_COLUMNS)} FROM machine_capacity {where}
+        ORDER BY {metric} DESC, name LIMIT ?
+    """, (*(categories or ()), limit))
+    return [dict(zip(CAPACITY_COLUMNS, row)) for row in cursor]
+
+
+def machine_capacity(conn, name, metric="kg_por_minuto"):
+    """Constantes de una máquina más su puesto por ``metric`` dentro de su categoría (None si no existe)."""
+    _check_metric(metric)
+    row = conn.execute(f"SELECT {', '.join(CAPACITY_COLUMNS)} FROM machine_capacity WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    capacity = dict(zip(CAPACITY_COLUMNS, row))
+    ahead, total = conn.execute(f"""
+        SELECT SUM({metric} > ?), COUNT(*) FROM machine_capacity WHERE category = ?
+    """, (capacity[metric], capacity["category"])).fetchone()
+    return {**capacity, "rank": ahead + 1, "category_machines": total}
+
+
+def category_capacity(conn, metric="kg_por_minuto"):
+    """``{categoría: (máximo, suma)}`` de ``metric``, resuelto sobre el índice ``(category, metric)``."""
+    _check_metric(metric)
+    cursor = conn.execute(f"SELECT category, MAX({metric}), SUM({metric}) FROM machine_capacity GROUP BY category")
+    return {category: (maximum, total) for category, maximum, total in cursor}
+
+
+def fleet_capacity(conn):
+    """Por categoría: ``(categoría, máquinas, uds/h netas, kg/h, kg/h de la mejor máquina)``.
+
+    Agregados sumables entre BD (ver ``plants.fleet_report``).
+    """
+    cursor = conn.execute("""
+        SELECT category, COUNT(*), SUM(unidades_por_minuto_neto) * 60, SUM(kg_por_minuto) * 60, MAX(kg_por_minuto) * 60
+        FROM machine_capacity GROUP BY category ORDER BY category
+    """)
+    return cursor.fetchall()
+
+
+def stale_capacity(conn):
+    """Nombres cuya fila de ``machine_capacity`` falta, sobra o no coincide con sus parámetros actuales."""
+    columns = ", ".join(CAPACITY_COLUMNS)
+    cursor = conn.execute(f"""
+        SELECT name FROM ({CAPACITY_SELECT_SQL} EXCEPT SELECT {columns} FROM machine_capacity)
+        UNION
+        SELECT name FROM (SELECT {columns} FROM machine_capacity EXCEPT {CAPACITY_SELECT_SQL})
+    """)
+    return [row[0] for row in cursor]
+
+
+def rebuild_capacity(conn, names=None):
+    """Recalcula las filas de ``names`` (todas si es None); devuelve cuántas se recalcularon.
+
+    ``conn`` debe estar dentro de una transacción de escritura.
+    """
+    columns = ", ".join(CAPACITY_COLUMNS)
+    if names is None:
+        conn.execute("DELETE FROM machine_capacity")
+        return conn.execute(f"INSERT INTO machine_capacity ({columns}) {CAPACITY_SELECT_SQL}").rowcount
+    names = list(names)
+    for start in range(0, len(names), 500): # Límite de parámetros por sentencia
+        chunk = names[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        conn.execute(f"DELETE FROM machine_capacity WHERE name IN ({placeholders})", chunk)
+        conn.execute(f"INSERT INTO machine_capacity ({columns}) {CAPACITY_SELECT_SQL} WHERE name IN ({placeholders})", chunk)
+    return len(names)
@@ -0,0 +1,80 @@
+"""HTML propio de la aplicación: tarjetas de máquina y tablas de resultados.
+
+Cada función se memoriza en una LRU acotada (``functools.lru_cache``, segura
+entre hilos): la tarjeta de una máquina por sus campos visibles, cuya versión
+marca ``updated_at``, y las tablas por sus entradas. Vive en el paquete y no en
+``main.py`` porque Streamlit reejecuta el script en cada rerun (y con él sus
+definiciones); aquí la caché dura todo el proceso y la comparten las sesiones.
+Cada fila se arma en una lista y se une una sola vez.
+"""
+
+import functools
+
+from .constants import DEFAULT_CATEGORY
+
+RENDER_CACHE_SIZE = 4096 # Entradas por caché: más que las tarjetas de la página más grande
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_analysis_table(turno_minutos, tiempo_productivo, tiempo_perdido, eficiencia):
+    eficiencia_percent = float(eficiencia) if eficiencia else 0.0
+    progress_bar_html = f'''<div class="progress"><div class="progress-bar" style="width: {eficiencia_percent:.2f}%; min-width: 50px;">{eficiencia_percent:.2f}%</div></div>'''
+    html = f'''<table class="custom-table"><thead><tr><th>Métrica</th><th>Valor</th></tr></thead><tbody><tr><td>Tiempo Total Turno</td><td>{turno_minutos:.2f} min</td></tr><tr><td>Tiempo Productivo</td><td>{tiempo_productivo:.2f} min</td></tr><tr><td>Tiempo Perdido</td><td>{tiempo_perdido:.2f} min</td></tr><tr><td>Eficiencia</td><td>{progress_bar_html}</td></tr></tbody></table>'''
+    return html
+
+
+def render_machine_card(config):
+    """Tarjeta HTML de una máquina, memorizada: sólo se reconstruye si cambia (nuevo ``updated_at``)."""
+    return machine_card_html(config["name"], config.get("updated_at"), config["created_at"], config["type"],
+                             config.get("category", DEFAULT_CATEGORY), config.get("description"), config.get("profile"))
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def machine_card_html(name, updated_at, created_at, machine_type, category, description, profile):
+    # La clave son todos los campos visibles: nombre + updated_at identifican la versión de la
+    # máquina, y el resto cubre las que nunca se editaron y el renombrado de su perfil
+    machine_class = "machine-card"
+    if machine_type == "Manual": machine_class += " machine-manual"
+    elif machine_type == "Semi-Automática": machine_class += " machine-semi"
+    else: machine_class += " machine-auto"
+    updated_info = f"<p><small><i>Actualizada: {updated_at}</i></small></p>" if updated_at else ""
+    # Mostrar categoría dentro de la tarjeta (opcional)
+    category_info = f"<p><small>Categoría: {category}</small></p>"
+    if profile:
+        category_info += f"<p><small>Perfil: {profile}</small></p>"
+    return f"""
+    <div class="{machine_class}">
+        <h3>{name}</h3>
+        <p><strong>Tipo:</strong> {machine_type}</p>
+        {category_info}
+        <p><strong>Descripción:</strong> {description or "N/A"}</p>
+        <p><small>Creada: {created_at}</small></p>
+        {updated_info}
+    </div>
+    """
+
+
+def render_interruptions_table(interrupciones_dict, turno_minutos):
+    """Tabla HTML de interrupciones, memorizada por ``(interrupciones, turno)``."""
+    return interruptions_table_html(tuple(interrupciones_dict.items()), turno_minutos)
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def interruptions_table_html(interrupciones, turno_minutos):
+    rows = []
+    total_interrupcion_min = 0
+    for tipo, tiempo in interrupciones:
+        tiempo_float = float(tiempo)
+        if tiempo_float > 0:
+            porcentaje = (tiempo_float / turno_minutos) * 100 if turno_minutos > 0 else 0
+            rows.append(f"<tr><td>{tipo}</td><td>{tiempo_float:.2f} min</td><td>{porcentaje:.2f}%</td></tr>")
+            total_interrupcion_min += tiempo_float
+    total_porcentaje = (total_interrupcion_min / turno_minutos) * 100 if turno_minutos > 0 else 0
+    rows.append(f"<tr style='font-weight: bold; background-color: #e9ecef;'><td>Total Interrupciones</td><td>{total_interrupcion_min:.2f} min</td><td>{total_porcentaje:.2f}%</td></tr>")
+    return f'''<table class="custom-table"><thead><tr><th>Tipo</th><th>Tiempo (min)</th><th>% Turno</th></tr></thead><tbody>{"".join(rows)}</tbody></table>'''
+
+
+def cache_stats():
+    """``(aciertos, construcciones)`` sumados de las cachés de render del proceso."""
+    infos = [cache.cache_info() for cache in (machine_card_html, render_analysis_table, interruptions_table_html)]
+    return sum(info.hits for info in infos), sum(info.misses for info in infos)
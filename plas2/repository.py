@@ -0,0 +1,191 @@
+"""Repositorio de máquinas en memoria, compartido por todo el proceso.
+
+Streamlit re-ejecuta el script en cada interacción, pero los módulos de
+``plas2`` se importan una sola vez por proceso, así que el repositorio vive
+entre reruns y entre sesiones. La tabla ``machines`` se lee una sola vez;
+después sólo se consulta un contador de cambios
+(``db_meta.machines_version``) que los triggers de la BD incrementan en cada
+INSERT/UPDATE/DELETE, venga de este proceso o de otro.
+
+Cuando el contador cambia, el repositorio lee del registro ``machine_changes``
+los nombres cambiados desde su última carga y sólo esas filas; si la edición
+es estructural (altas, bajas, renombrados, cambios de categoría) o el registro
+ya no llega tan atrás, recarga la tabla completa.
+"""
+
+import sqlite3
+import threading
+from types import MappingProxyType
+
+from .db import get_pool
+from .fleet import FleetTable, load_fleet
+from .profiles import load_profiles
+from .schema import EFFECTIVE_COLUMNS, VERSION_KEY
+
+MAX_PATCH_ROWS = 2000 # Con más filas cambiadas sale más a cuenta recargar la tabla
+
+
+def read_version(conn):
+    """Devuelve el valor actual del contador de cambios (None si no existe)."""
+    try:
+        row = conn.execute("SELECT value FROM db_meta WHERE key = ?", (VERSION_KEY,)).fetchone()
+    except sqlite3.OperationalError: # BD sin inicializar
+        return None
+    return row[0] if row else None
+
+
+def read_change_seq(conn):
+    """Última ``seq`` del registro de cambios (None si la BD no lo tiene)."""
+    try:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM machine_changes").fetchone()[0]
+    except sqlite3.OperationalError: # BD sin migrar
+        return None
+
+
+def read_changes(conn, since, limit=MAX_PATCH_ROWS):
+    """``(nombres, última seq)`` de los cambios posteriores a ``since``.
+
+    Devuelve None si el registro ya no llega a ``since`` (entradas podadas) o si
+    hay más de ``limit`` cambios.
+    """
+    rows = conn.execute("SELECT seq, name FROM machine_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                        (since, limit + 1)).fetchall()
+    if not rows:
+        return set(), since
+    if rows[0][0] != since + 1 or len(rows) > limit:
+        return None
+    return {name for _, name in rows}, rows[-1][0]
+
+
+def load_rows(conn, names):
+    """Filas de ``machines_effective`` (orden de ``EFFECTIVE_COLUMNS``) de ``names`` que aún existen."""
+    names = list(names)
+    rows = []
+    for start in range(0, len(names), 500): # Límite de parámetros por sentencia
+        chunk = names[start:start + 500]
+        rows += conn.execute(f"SELECT {', '.join(EFFECTIVE_COLUMNS)} FROM machines_effective "
+                             f"WHERE name IN ({', '.join('?' for _ in chunk)})", chunk).fetchall()
+    return rows
+
+
+def load_machines(conn):
+    """Lee todas las máquinas como ``FleetTable``, ordenadas por categoría y nombre.
+
+    Devuelve ``(machines, errores)``; ``errores`` lista los parámetros que no se
+    pudieron leer como número.
+    """
+    return load_fleet(conn)
+
+
+class MachineRepository:
+    """Caché de la tabla ``machines`` (y de los perfiles) para un fichero de BD.
+
+    ``get_all()`` sólo recarga cuando el contador de cambios de la BD difiere
+    del de la última carga. Devuelve una ``fleet.FleetTable`` compartida entre
+    sesiones (columnar e inmutable; ver ``plas2/fleet.py``).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._version = None
+        self._machines = FleetTable.from_rows([])[0]
+        self._profiles = MappingProxyType({})
+        self._seq = None # Última entrada de ``machine_changes`` incorporada
+        self.errors = []
+        self.loads = 0 # Nº de recargas completas (diagnóstico)
+        self.patches = 0 # Nº de refrescos incrementales (diagnóstico)
+
+    def _load_changes(self, conn):
+        """Tabla con los cambios posteriores a ``self._seq`` aplicados, o None si hay que recargarla."""
+        if self._seq is None or self.errors:
+            return None
+        changes = read_changes(conn, self._seq)
+        if changes is None:
+            return None
+        names, seq = changes
+        if not names: # Sólo cambiaron perfiles sin máquinas
+            return self._machines, seq
+        rows = load_rows(conn, names)
+        if len(rows) != len(names): # Alguna se eliminó o se renombró
+            return None
+        machines, errors = self._machines.patched(rows)
+        if machines is None or errors:
+            return None
+        return machines, seq
+
+    def _refresh(self):
+        with get_pool(self.db_path).read() as conn:
+            version = read_version(conn)
+            if version is not None and version == self._version:
+                return
+            with self._lock:
+                if version is not None and version == self._version: # Otro hilo ya recargó
+                    return
+                conn.execute("BEGIN") # Misma instantánea para versión, perfiles y máquinas
+                try:
+                    version = read_version(conn)
+                    profiles = load_profiles(conn)
+                    patch = self._load_changes(conn)
+                    if patch is None:
+                        seq = read_change_seq(conn)
+                        machines, errors = load_machines(conn)
+                    else:
+                        (machines, seq), errors = patch, []
+                finally:
+                    conn.execute("COMMIT")
+                self._profiles = MappingProxyType(profiles)
+                machines.by_category() # Índice de grupos listo antes de publicar la tabla
+                self._machines = machines
+                self.errors = errors
+                self._version = version
+                self._seq = seq
+                if patch is None:
+                    self.loads += 1
+                else:
+                    self.patches += 1
+
+    def get_all(self):
+        """Devuelve todas las máquinas, recargando sólo si la BD cambió."""
+        self._refresh()
+        return self._machines
+
+    def get_by_category(self):
+        """Devuelve ``{categoría: (nombres...)}`` en orden alfabético, calculado una vez por recarga."""
+        self._refresh()
+        return self._machines.by_category()
+
+    def get_profiles(self):
+        """Devuelve ``{id: perfil}`` con la misma política de recarga que ``get_all()``."""
+        self._refresh()
+        return self._profiles
+
+    def get_snapshot(self):
+        """Devuelve ``(versión, máquinas)`` de la misma carga (para claves de caché coherentes)."""
+        self._refresh()
+        with self._lock:
+            return self._version, self._machines
+
+    @property
+    def version(self):
+        """Versión de la BD correspondiente a la última carga."""
+        return self._version
+
+    def invalidate(self):
+        """Fuerza la recarga completa en la próxima llamada a ``get_all()``."""
+        with self._lock:
+            self._version = None
+            self._seq = None
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(db_path):
+    """Devuelve el repositorio único del proceso para ``db_path``."""
+    with _repositories_lock:
+        repo = _repositories.get(db_path)
+        if repo is None:
+            repo = _repositories[db_path] = MachineRepository(db_path)
+        return repo
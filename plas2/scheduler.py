@@ -0,0 +1,369 @@
+"""Programación de pedidos de producción con cambios de producto.
+
+Asigna y secuencia pedidos (producto, cantidad en unidades o kg, fecha de
+entrega) entre las máquinas de una categoría minimizando
+``peso_cambios * minutos de cambio + peso_retraso * minutos de retraso``.
+
+Modelo:
+
+* Cada máquina produce a ``unidades_por_minuto * ratio_productivo`` por minuto
+  de tiempo neto; los kg se pasan a unidades con su ``peso_por_unidad``.
+* El tiempo neto de un día sale del motor (``engine.compute_shift``) para los
+  turnos diarios indicados; el tiempo de producción se reparte uniformemente
+  a lo largo del día de calendario.
+* Pasar de un producto a otro (y arrancar el primer pedido) cuesta
+  ``cambio_producto`` minutos de la máquina; pedidos consecutivos del mismo
+  producto no tienen cambio.
+
+Optimizador: construcción voraz por fecha de entrega (vectorizada sobre las
+máquinas) y después búsqueda local con recocido simulado (mover un pedido a
+otra posición o máquina, preferentemente junto a pedidos del mismo producto, o
+intercambiar dos) hasta agotar ``time_budget`` segundos. Cada movimiento sólo
+reevalúa las dos secuencias afectadas.
+"""
+
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import numpy as np
+
+from . import engine
+
+ORDER_UNITS = ("uds", "kg")
+TIME_BUDGET = 2.0 # s
+DAY_MINUTES = 24 * 60
+SCHEDULE_COLUMNS = ("machine", "kind", "order", "product", "start", "end", "due", "late_min")
+UTILIZATION_COLUMNS = ("machine", "pedidos", "produccion_min", "cambio_min", "libre_min", "utilizacion")
+
+
+@dataclass
+class Order:
+    id: str
+    product: str
+    quantity: float
+    unit: str # "uds" o "kg"
+    due: object # datetime
+
+
+class SchedulingProblem:
+    """Datos precalculados por máquina y por pedido para evaluar secuencias rápidamente."""
+
+    def __init__(self, configs, orders, start, day_shifts, changeover_weight=1.0, lateness_weight=1.0):
+        self.orders = list(orders)
+        self.start = start
+        self.changeover_weight = changeover_weight
+        self.lateness_weight = lateness_weight
+        for order in self.orders:
+            if order.unit not in ORDER_UNITS:
+                raise ValueError(f"Unidad no válida en el pedido {order.id}: {order.unit}")
+            if order.quantity <= 0:
+                raise ValueError(f"Cantidad no válida en el pedido {order.id}: {order.quantity}")
+        machines = engine.MachineBatch.from_configs(configs)
+        self.names = list(machines.names)
+        if day_shifts and len(machines):
+            res = engine.compute_shift(machines, engine.ScenarioBatch.from_records(day_shifts))
+            net_per_day = np.maximum(res.tiempo_neto_disponible, 0.0).sum(axis=1)
+        else:
+            net_per_day = np.zeros(len(machines))
+        rate = machines.unidades_por_minuto * machines.ratio_productivo
+        usable = (net_per_day > 0) & (rate > 0)
+        with np.errstate(divide="ignore"):
+            # Minutos de calendario por minuto neto, minutos netos por unidad y unidades por kg
+            self.stretch = np.where(usable, DAY_MINUTES / net_per_day, np.inf).tolist()
+            self.minutes_per_unit = np.where(usable, 1.0 / rate, np.inf).tolist()
+            self.units_per_kg = np.where(machines.peso_por_unidad > 0, 1000.0 / machines.peso_por_unidad, 0.0).tolist()
+        self.setup = machines.minutos_evento[:, engine.EVENT_KEYS.index("cambios_producto")].tolist()
+        self.net_per_day = net_per_day
+        products = {}
+        self.product = [products.setdefault(o.product, len(products)) for o in self.orders]
+        self.products = list(products)
+        self.units = [o.quantity if o.unit == "uds" else 0.0 for o in self.orders]
+        self.kg = [o.quantity if o.unit == "kg" else 0.0 for o in self.orders]
+        self.due = [(o.due - start).total_seconds() / 60 for o in self.orders]
+        self.eligible = [
+            [m for m in range(len(self.names)) if math.isfinite(self.proc(o, m))] for o in range(len(self.orders))
+        ]
+        self.eligible_set = [set(machines) for machines in self.eligible]
+
+    def proc(self, o, m):
+        """Minutos netos de producción del pedido ``o`` en la máquina ``m`` (``inf`` si no puede hacerlo)."""
+        if self.kg[o] and not self.units_per_kg[m]:
+            return math.inf # Pedido en kg y máquina sin peso por unidad
+        return (self.units[o] + self.kg[o] * self.units_per_kg[m]) * self.minutes_per_unit[m]
+
+    def evaluate(self, m, seq):
+        """Coste (minutos ponderados) y fin en minutos de calendario de una secuencia en la máquina ``m``."""
+        t = setups = late = 0.0
+        last = -1
+        setup, stretch, product, due = self.setup[m], self.stretch[m], self.product, self.due
+        units, kg, units_per_kg, minutes_per_unit = self.units, self.kg, self.units_per_kg[m], self.minutes_per_unit[m]
+        for o in seq: # Sólo pedidos que la máquina puede hacer: proc() en línea, finito
+            if product[o] != last:
+                t += setup
+                setups += setup
+                last = product[o]
+            t += (units[o] + kg[o] * units_per_kg) * minutes_per_unit
+            tardiness = t * stretch - due[o]
+            if tardiness > 0:
+                late += tardiness
+        return self.changeover_weight * setups + self.lateness_weight * late, t * stretch
+
+    def sequence_cost(self, m, seq):
+        return self.evaluate(m, seq)[0]
+
+    def critical(self, m, seq):
+        """Pedidos de la secuencia que llegan tarde o abren un cambio de producto."""
+        t, last, found = 0.0, -1, []
+        stretch, product, due = self.stretch[m], self.product, self.due
+        for o in seq:
+            opens = product[o] != last
+            if opens:
+                t += self.setup[m]
+                last = product[o]
+            t += self.proc(o, m)
+            if opens or t * stretch > due[o]:
+                found.append(o)
+        return found
+
+
+def greedy(problem):
+    """Construcción inicial: pedidos por fecha de entrega, cada uno a la máquina de menor coste marginal."""
+    n_machines = len(problem.names)
+    end = np.zeros(n_machines)
+    last = np.full(n_machines, -1)
+    setup = np.array(problem.setup)
+    stretch = np.array(problem.stretch)
+    minutes_per_unit = np.array(problem.minutes_per_unit)
+    units_per_kg = np.array(problem.units_per_kg)
+    sequences = [[] for _ in range(n_machines)]
+    unassigned = []
+    for o in sorted(range(len(problem.orders)), key=lambda o: (problem.due[o], problem.product[o])):
+        with np.errstate(invalid="ignore"):
+            proc = (problem.units[o] + problem.kg[o] * units_per_kg) * minutes_per_unit
+        if problem.kg[o]:
+            proc[units_per_kg == 0] = np.inf
+        change = np.where(last != problem.product[o], setup, 0.0)
+        finish = end + change + proc
+        with np.errstate(invalid="ignore"):
+            cost = (problem.changeover_weight * change
+                    + problem.lateness_weight * np.maximum(finish * stretch - problem.due[o], 0.0)
+                    + 1e-6 * finish * stretch) # Desempate: la que termine antes
+        cost[~np.isfinite(cost)] = np.inf
+        m = int(np.argmin(cost))
+        if not np.isfinite(cost[m]):
+            unassigned.append(o)
+            continue
+        sequences[m].append(o)
+        end[m] = finish[m]
+        last[m] = problem.product[o]
+    return sequences, unassigned
+
+
+def _neighbor(problem, sequences, where, ends, orders, running, o, rnd):
+    """Propone un movimiento de ``o``; devuelve ``(a, b, nueva_a, nueva_b)`` o ``None``.
+
+    Movimientos: reubicar ``o`` o todo su tramo de pedidos consecutivos del mismo
+    producto en otra máquina (de las menos cargadas o que ya hacen ese producto)
+    o en otra posición de la suya (por fecha de entrega o junto a su producto),
+    o intercambiarlo con otro pedido.
+    """
+    a = where[o]
+    seq_a = sequences[a]
+    product = problem.product
+    r = rnd.random()
+    if r < 0.15: # Intercambio
+        p = seq_a[rnd.randrange(len(seq_a))] if rnd.random() < 0.5 else orders[rnd.randrange(len(orders))]
+        b = where[p]
+        if p == o or (a != b and (b not in problem.eligible_set[o] or a not in problem.eligible_set[p])):
+            return None
+        new_a = list(seq_a)
+        i = new_a.index(o)
+        if a == b:
+            j = new_a.index(p)
+            new_a[i], new_a[j] = p, o
+            return a, a, new_a, new_a
+        new_b = list(sequences[b])
+        new_a[i] = p
+        new_b[new_b.index(p)] = o
+        return a, b, new_a, new_b
+    i = seq_a.index(o)
+    block = [o]
+    if r < 0.35: # Todo el tramo del mismo producto
+        lo, hi = i, i + 1
+        while lo > 0 and product[seq_a[lo - 1]] == product[o]:
+            lo -= 1
+        while hi < len(seq_a) and product[seq_a[hi]] == product[o]:
+            hi += 1
+        block = seq_a[lo:hi]
+    eligible = problem.eligible[o]
+    choice = rnd.random()
+    same_product = running.get(product[o])
+    if choice < 0.2:
+        b = a
+    elif choice < 0.6 and same_product: # Una que ya hace este producto
+        b = rnd.choice(same_product)
+    elif choice < 0.8: # La menos cargada de una muestra
+        b = min(rnd.sample(eligible, min(8, len(eligible))), key=ends.__getitem__)
+    else:
+        b = rnd.choice(eligible)
+    if any(b not in problem.eligible_set[x] for x in block):
+        return None
+    blocked = set(block)
+    new_a = [x for x in seq_a if x not in blocked]
+    new_b = new_a if b == a else list(sequences[b])
+    same = [j for j, x in enumerate(new_b) if product[x] == product[o]]
+    mode = rnd.random()
+    if same and mode < 0.5:
+        pos = rnd.choice(same) + 1
+    elif mode < 0.8: # Por fecha de entrega
+        due = problem.due[o]
+        pos = next((j for j, x in enumerate(new_b) if problem.due[x] > due), len(new_b))
+    else:
+        pos = rnd.randint(0, len(new_b))
+    new_b[pos:pos] = block
+    return (a, a, new_b, new_b) if b == a else (a, b, new_a, new_b)
+
+
+def improve(problem, sequences, time_budget=TIME_BUDGET, seed=0):
+    """Recocido simulado sobre ``sequences`` hasta agotar ``time_budget``; devuelve la mejor y las iteraciones.
+
+    La mitad de las veces se mueve un pedido con retraso o que abre un cambio de
+    producto; el resto, uno al azar. Esa lista y el índice producto → máquinas
+    que lo fabrican se refrescan cada 256 iteraciones.
+    """
+    rnd = random.Random(seed)
+    evaluated = [problem.evaluate(m, seq) for m, seq in enumerate(sequences)]
+    costs = [e[0] for e in evaluated]
+    ends = [e[1] for e in evaluated]
+    best, best_cost = [list(seq) for seq in sequences], sum(costs)
+    current = best_cost
+    where = {o: m for m, seq in enumerate(sequences) for o in seq}
+    if len(where) < 2:
+        return best, 0
+    orders = list(where)
+    started = time.perf_counter()
+    deadline = started + time_budget
+    temperature0 = 0.1 * max(1.0, float(np.mean(problem.setup))) # ~1/10 de cambio: casi descenso puro
+    temperature = temperature0
+    iterations = 0
+    while True:
+        if iterations % 256 == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            temperature = temperature0 * (1 - (now - started) / time_budget) + 1e-9
+            targets = [o for m, seq in enumerate(sequences) for o in problem.critical(m, seq)] or orders
+            running = {}
+            for m, seq in enumerate(sequences):
+                for product in {problem.product[o] for o in seq}:
+                    running.setdefault(product, []).append(m)
+        iterations += 1
+        o = rnd.choice(targets) if rnd.random() < 0.5 else orders[rnd.randrange(len(orders))]
+        move = _neighbor(problem, sequences, where, ends, orders, running, o, rnd)
+        if move is None:
+            continue
+        a, b, new_a, new_b = move
+        cost_a, end_a = problem.evaluate(a, new_a)
+        cost_b, end_b = (cost_a, end_a) if b == a else problem.evaluate(b, new_b)
+        delta = (cost_a - costs[a]) + (0.0 if b == a else cost_b - costs[b])
+        if delta <= 0 or rnd.random() < math.exp(-delta / temperature):
+            sequences[a], costs[a], ends[a] = new_a, cost_a, end_a
+            if b != a:
+                sequences[b], costs[b], ends[b] = new_b, cost_b, end_b
+                for x in new_b:
+                    where[x] = b
+                for x in new_a: # Intercambios: el otro pedido pasa a ``a``
+                    where[x] = a
+            current += delta
+            if current < best_cost - 1e-9:
+                best_cost = current
+                best = [list(seq) for seq in sequences]
+    return best, iterations
+
+
+@dataclass
+class Schedule:
+    problem: SchedulingProblem
+    sequences: list
+    unassigned: list
+    iterations: int = 0
+    changeover_min: float = 0.0
+    lateness_min: float = 0.0
+    late_orders: int = 0
+    _rows: list = field(default=None, repr=False)
+
+    def __post_init__(self):
+        p = self.problem
+        rows = []
+        for m, seq in enumerate(self.sequences):
+            t, last = 0.0, -1
+            for o in seq:
+                if p.product[o] != last:
+                    rows.append((m, "cambio", None, p.products[p.product[o]], t, t + p.setup[m], None, 0.0))
+                    t += p.setup[m]
+                    self.changeover_min += p.setup[m]
+                    last = p.product[o]
+                begin, t = t, t + p.proc(o, m)
+                late = max(0.0, t * p.stretch[m] - p.due[o])
+                self.lateness_min += late
+                self.late_orders += late > 0
+                rows.append((m, "pedido", o, p.orders[o].product, begin, t, p.orders[o].due, late))
+        self._rows = rows
+
+    @property
+    def cost(self):
+        return self.problem.changeover_weight * self.changeover_min + self.problem.lateness_weight * self.lateness_min
+
+    def _when(self, m, net_minutes):
+        return self.problem.start + timedelta(minutes=net_minutes * self.problem.stretch[m])
+
+    def rows(self):
+        """Tramos del diagrama de Gantt (cambios y pedidos) como dict de columnas (``SCHEDULE_COLUMNS``)."""
+        p = self.problem
+        return {
+            "machine": [p.names[r[0]] for r in self._rows],
+            "kind": [r[1] for r in self._rows],
+            "order": [p.orders[r[2]].id if r[2] is not None else None for r in self._rows],
+            "product": [r[3] for r in self._rows],
+            "start": [self._when(r[0], r[4]) for r in self._rows],
+            "end": [self._when(r[0], r[5]) for r in self._rows],
+            "due": [r[6] for r in self._rows],
+            "late_min": [r[7] for r in self._rows],
+        }
+
+    def utilization(self):
+        """Uso de cada máquina hasta el fin del último pedido (en minutos netos), como dict de columnas."""
+        p = self.problem
+        n = len(p.names)
+        production, changeover, count, busy_until = np.zeros(n), np.zeros(n), np.zeros(n, dtype=int), 0.0
+        for m, kind, _, _, begin, end, _, _ in self._rows:
+            (changeover if kind == "cambio" else production)[m] += end - begin
+            count[m] += kind == "pedido"
+            busy_until = max(busy_until, end * p.stretch[m])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            available = np.where(np.isfinite(p.stretch), busy_until / np.array(p.stretch), 0.0)
+            busy = production + changeover
+            return {
+                "machine": list(p.names), "pedidos": count, "produccion_min": production, "cambio_min": changeover,
+                "libre_min": np.maximum(available - busy, 0.0),
+                "utilizacion": np.where(available > 0, busy / available * 100, 0.0),
+            }
+
+
+def schedule(configs, orders, start, day_shifts, time_budget=TIME_BUDGET, changeover_weight=1.0,
+             lateness_weight=1.0, seed=0):
+    """Asigna y secuencia ``orders`` entre las máquinas ``configs``; devuelve un ``Schedule``.
+
+    ``day_shifts`` son los turnos de cada día (escenarios como los de la
+    calculadora, sin cambios de producto: esos los decide el programador).
+    ``time_budget`` incluye la construcción inicial; la búsqueda local usa el resto.
+    """
+    started = time.perf_counter()
+    problem = SchedulingProblem(configs, orders, start, day_shifts, changeover_weight, lateness_weight)
+    sequences, unassigned = greedy(problem)
+    remaining = time_budget - (time.perf_counter() - started)
+    sequences, iterations = improve(problem, sequences, remaining, seed) if remaining > 0 else (sequences, 0)
+    return Schedule(problem, sequences, unassigned, iterations)
@@ -0,0 +1,680 @@
+"""Esquema de la BD y migraciones en sitio.
+
+La versión del esquema se guarda en ``PRAGMA user_version``. ``migrate()``
+aplica en orden las migraciones pendientes, cada una en su propia transacción
+``BEGIN IMMEDIATE``, de modo que varios procesos arrancando a la vez no
+migran dos veces.
+
+Desde la versión 2 los parámetros de setup y producción ya no se guardan como
+texto JSON sino en columnas tipadas de ``machines``. Un parámetro que la
+máquina no tiene (p. ej. ``cambio_cuchillo`` en una Automática) es NULL, y
+desde la versión 9 tampoco lo hereda de su perfil.
+"""
+
+from .constants import DEFAULT_CATEGORY, PRODUCTION_PARAM_KEYS, SETUP_PARAM_KEYS, TYPE_SPECIFIC_PARAMS
+
+VERSION_KEY = "machines_version"
+
+# Tablas cuyas escrituras cambian las máquinas efectivas. Un trigger por tabla y
+# evento incrementa el contador de cambios, de modo que cualquier escritura (desde
+# la app, otro proceso o un script) invalida las cachés de todos los procesos.
+VERSIONED_TABLES = ("machines", "parameter_profiles")
+
+# Afinidad de cada parámetro: INTEGER para los que el formulario trata como
+# enteros (SQLite conserva 10 como entero y 10.5 como real), REAL para el resto.
+PARAM_COLUMN_TYPES = {
+    "calibracion": "INTEGER",
+    "otros": "INTEGER",
+    "cambio_rollo": "INTEGER",
+    "cambio_producto": "INTEGER",
+    "cambio_cuchillo": "INTEGER",
+    "cambio_perforador": "INTEGER",
+    "cambio_paquete": "INTEGER",
+    "empaque": "INTEGER", # segundos
+    "unidades_por_minuto": "INTEGER",
+    "peso_por_unidad": "REAL", # gramos
+    "ciclo_total": "INTEGER", # segundos
+    "ciclo_productivo": "INTEGER", # segundos
+    "ratio_productivo": "REAL",
+}
+PARAM_KEYS = SETUP_PARAM_KEYS + PRODUCTION_PARAM_KEYS
+BASE_COLUMNS = ("name", "type", "description", "category", "created_at", "updated_at")
+# Columnas almacenadas en 'machines'. Con perfil asignado, un parámetro NULL se hereda del perfil.
+MACHINE_COLUMNS = BASE_COLUMNS + PARAM_KEYS + ("profile_id",)
+# Columnas de la vista 'machines_effective' (parámetros ya combinados con el perfil)
+EFFECTIVE_COLUMNS = BASE_COLUMNS + PARAM_KEYS + ("profile_id", "profile", "row_version")
+
+_param_columns_ddl = ",\n    ".join(f"{key} {PARAM_COLUMN_TYPES[key]}" for key in PARAM_KEYS)
+CREATE_MACHINES_V2_SQL = f"""
+CREATE TABLE machines (
+    name TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    description TEXT,
+    category TEXT DEFAULT '{DEFAULT_CATEGORY}',
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    {_param_columns_ddl}
+)
+"""
+
+SELECT_MACHINES_SQL = (
+    f"SELECT {', '.join(EFFECTIVE_COLUMNS)} FROM machines_effective "
+    f"ORDER BY COALESCE(category, '{DEFAULT_CATEGORY}'), name"
+)
+INSERT_MACHINE_SQL = (
+    f"INSERT INTO machines ({', '.join(MACHINE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in MACHINE_COLUMNS)})"
+)
+UPDATE_MACHINE_SQL = (
+    f"UPDATE machines SET {', '.join(f'{col} = ?' for col in MACHINE_COLUMNS if col != 'created_at')}, "
+    f"row_version = row_version + 1 WHERE name = ?"
+)
+# Escritura optimista: sólo si nadie cambió la fila desde que se leyó su ``row_version``
+UPDATE_MACHINE_IF_VERSION_SQL = f"{UPDATE_MACHINE_SQL} AND row_version = ?"
+DELETE_MACHINE_SQL = "DELETE FROM machines WHERE name = ?"
+
+
+def _sql_list(values):
+    return ", ".join(f"'{value}'" for value in values)
+
+
+def effective_param_sql(key, machine="m", profile_value=None):
+    """Expresión SQL del valor efectivo de ``key``: el de la máquina o, si es NULL, el del perfil.
+
+    Un parámetro que el tipo de la máquina no tiene (``TYPE_SPECIFIC_PARAMS``)
+    no se hereda: una Automática con perfil no recibe su ``cambio_cuchillo``.
+    """
+    inherited = f"COALESCE({machine}.{key}, {profile_value or f'p.{key}'})"
+    types = TYPE_SPECIFIC_PARAMS.get(key)
+    if types is None:
+        return inherited
+    return f"CASE WHEN {machine}.type IN ({_sql_list(types)}) THEN {inherited} ELSE {machine}.{key} END"
+
+
+def split_overrides(params, profile_params, keys):
+    """Valores de ``params`` que difieren del perfil (el resto se hereda y se guarda como NULL).
+
+    Un parámetro que el tipo de la máquina no tiene queda a NULL y no se
+    hereda (ver ``effective_param_sql``).
+    """
+    return {key: params.get(key) if params.get(key) != profile_params.get(key) else None for key in keys}
+
+
+def machine_row_values(config, profile=None):
+    """Convierte un dict de máquina en la tupla de valores de ``MACHINE_COLUMNS``.
+
+    Si la máquina tiene perfil (``profile`` con sus ``setup_params`` y
+    ``production_params``), sólo se guardan los parámetros que lo sobrescriben.
+    """
+    setup = config.get("setup_params") or {}
+    production = config.get("production_params") or {}
+    if profile is not None:
+        setup = split_overrides(setup, profile["setup_params"], SETUP_PARAM_KEYS)
+        production = split_overrides(production, profile["production_params"], PRODUCTION_PARAM_KEYS)
+    return (
+        config["name"],
+        config["type"],
+        config.get("description", None),
+        config.get("category", DEFAULT_CATEGORY) or DEFAULT_CATEGORY,
+        config.get("created_at"),
+        config.get("updated_at"),
+        *(setup.get(key) for key in SETUP_PARAM_KEYS),
+        *(production.get(key) for key in PRODUCTION_PARAM_KEYS),
+        config.get("profile_id") if profile is not None else None,
+    )
+
+
+def machine_update_values(original_name, config, profile=None):
+    """Parámetros de ``UPDATE_MACHINE_SQL`` (todas las columnas salvo ``created_at``)."""
+    values = machine_row_values(config, profile)
+    return values[:4] + values[5:] + (original_name,)
+
+
+def params_from_values(values):
+    """Separa una secuencia ordenada como ``PARAM_KEYS`` en (setup, producción), omitiendo NULLs."""
+    n_setup = len(SETUP_PARAM_KEYS)
+    setup = {key: value for key, value in zip(SETUP_PARAM_KEYS, values[:n_setup]) if value is not None}
+    production = {key: value for key, value in zip(PRODUCTION_PARAM_KEYS, values[n_setup:]) if value is not None}
+    return setup, production
+
+
+def machine_from_row(row):
+    """Reconstruye el dict de máquina (con ``setup_params``/``production_params``) desde una fila.
+
+    ``row`` sigue el orden de ``EFFECTIVE_COLUMNS``. Los parámetros NULL se omiten
+    de los dicts, igual que faltaban en el JSON original.
+    """
+    n_base = len(BASE_COLUMNS)
+    n_params = len(PARAM_KEYS)
+    machine = dict(zip(BASE_COLUMNS, row[:n_base]))
+    if machine["category"] is None: # Si la categoría es NULL en la BD
+        machine["category"] = DEFAULT_CATEGORY
+    machine["setup_params"], machine["production_params"] = params_from_values(row[n_base:n_base + n_params])
+    machine["profile_id"], machine["profile"], machine["row_version"] = row[n_base + n_params:n_base + n_params + 3]
+    return machine
+
+
+# --- Migraciones ---
+# Cada migración recibe la conexión (ya dentro de una transacción) y devuelve una
+# descripción para el usuario, o None si no hay nada que reportar.
+
+def _table_columns(conn, table):
+    return [info[1] for info in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _migration_1_base(conn):
+    """Tabla original con parámetros JSON y columna 'category'."""
+    columns = _table_columns(conn, "machines")
+    if not columns:
+        conn.execute(f"""
+            CREATE TABLE machines (
+                name TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                description TEXT,
+                setup_params TEXT NOT NULL,
+                production_params TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT,
+                category TEXT DEFAULT '{DEFAULT_CATEGORY}'
+            )
+        """)
+        return None
+    if "category" not in columns:
+        conn.execute(f"ALTER TABLE machines ADD COLUMN category TEXT DEFAULT '{DEFAULT_CATEGORY}'")
+        return "Añadida columna 'category'"
+    return None
+
+
+def _migration_2_typed_params(conn):
+    """Parámetros JSON -> columnas tipadas, con índices por categoría y tipo."""
+    columns = _table_columns(conn, "machines")
+    if "setup_params" not in columns: # Ya migrada (p. ej. por otro proceso antes de fijar user_version)
+        return None
+    n_rows = conn.execute("SELECT COUNT(*) FROM machines").fetchone()[0]
+    # Un JSON ilegible no detiene la migración, pero sus parámetros quedan a NULL: se informa
+    invalid = [row[0] for row in conn.execute(
+        "SELECT name FROM machines WHERE json_valid(setup_params) IS NOT 1 OR json_valid(production_params) IS NOT 1 "
+        "ORDER BY name"
+    )]
+    conn.execute("ALTER TABLE machines RENAME TO machines_json")
+    conn.execute(CREATE_MACHINES_V2_SQL)
+    extract = ", ".join(
+        f"CASE WHEN json_valid({source}) THEN json_extract({source}, '$.{key}') END"
+        for source, keys in (("setup_params", SETUP_PARAM_KEYS), ("production_params", PRODUCTION_PARAM_KEYS))
+        for key in keys
+    )
+    conn.execute(f"""
+        INSERT INTO machines ({', '.join(BASE_COLUMNS + PARAM_KEYS)})
+        SELECT {', '.join(BASE_COLUMNS)}, {extract} FROM machines_json
+    """)
+    conn.execute("DROP TABLE machines_json") # Elimina también los triggers de la tabla vieja
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_machines_category ON machines (category, name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_machines_type ON machines (type)")
+    if invalid:
+        shown = ", ".join(invalid[:5]) + (f" y {len(invalid) - 5} más" if len(invalid) > 5 else "")
+        return (f"Parámetros migrados a columnas tipadas ({n_rows} máquinas); {len(invalid)} con JSON inválido "
+                f"quedan sin parámetros: {shown}")
+    return f"Parámetros migrados a columnas tipadas ({n_rows} máquinas)" if n_rows else None
+
+
+def _migration_3_profiles(conn):
+    """Perfiles de parámetros compartidos; los parámetros de la máquina pasan a ser overrides."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS parameter_profiles (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT,
+            {_param_columns_ddl}
+        )
+    """)
+    if "profile_id" not in _table_columns(conn, "machines"):
+        conn.execute("ALTER TABLE machines ADD COLUMN profile_id INTEGER REFERENCES parameter_profiles (id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_machines_profile ON machines (profile_id)")
+    _create_effective_view(conn)
+    return None
+
+
+def _create_effective_view(conn, extra_columns=()):
+    """(Re)crea la vista ``machines_effective``; ``extra_columns`` son columnas de ``machines`` añadidas al final."""
+    effective_params = ", ".join(f"{effective_param_sql(key)} AS {key}" for key in PARAM_KEYS)
+    extra = "".join(f", m.{col} AS {col}" for col in extra_columns)
+    conn.execute("DROP VIEW IF EXISTS machines_effective")
+    conn.execute(f"""
+        CREATE VIEW machines_effective AS
+        SELECT {', '.join(f'm.{col}' for col in BASE_COLUMNS)}, {effective_params},
+               m.profile_id AS profile_id, p.name AS profile{extra}
+        FROM machines m LEFT JOIN parameter_profiles p ON p.id = m.profile_id
+    """)
+
+
+# Dos índices FTS5 de contenido externo sobre ``machines``: uno sólo con el nombre
+# y otro con categoría/descripción. Separados, la búsqueda por nombre no necesita
+# filtro de columna (que obliga a FTS5 a recorrer también las coincidencias de las
+# otras columnas) y cada consulta puede parar en cuanto tiene suficientes filas.
+SEARCH_INDEXES = {
+    "machines_fts_name": ("name",),
+    "machines_fts_text": ("category", "description"),
+}
+SEARCH_PREFIX_LENGTHS = (1, 2, 3, 4, 5, 6, 7, 8)
+
+
+def install_search_index_triggers(conn):
+    """Triggers que mantienen los índices de búsqueda sincronizados con ``machines``."""
+    for index, columns in SEARCH_INDEXES.items():
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{col}" for col in columns)
+        old_values = ", ".join(f"old.{col}" for col in columns)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {index}_ins AFTER INSERT ON machines BEGIN
+                INSERT INTO {index} (rowid, {cols}) VALUES (new.rowid, {new_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {index}_del AFTER DELETE ON machines BEGIN
+                INSERT INTO {index} ({index}, rowid, {cols}) VALUES ('delete', old.rowid, {old_values});
+            END
+        """)
+        # Sólo reindexar si cambian columnas indexadas (editar parámetros no toca el índice)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {index}_upd AFTER UPDATE OF {cols} ON machines BEGIN
+                INSERT INTO {index} ({index}, rowid, {cols}) VALUES ('delete', old.rowid, {old_values});
+                INSERT INTO {index} (rowid, {cols}) VALUES (new.rowid, {new_values});
+            END
+        """)
+
+
+def _migration_4_search_index(conn):
+    """Índices FTS5 de nombre y de categoría/descripción, con índices de prefijo para búsqueda incremental."""
+    for index, columns in SEARCH_INDEXES.items():
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                {', '.join(columns)},
+                content = 'machines',
+                content_rowid = 'rowid',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '{' '.join(map(str, SEARCH_PREFIX_LENGTHS))}'
+            )
+        """)
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+    install_search_index_triggers(conn)
+    return None
+
+
+# Historial de cálculos. No está en VERSIONED_TABLES: registrar un cálculo no
+# cambia las máquinas y no debe invalidar las cachés.
+HISTORY_SCENARIO_COLUMNS = ("turno_horas", "desayuno", "almuerzo", "cambios_rollo", "cambios_producto",
+                            "cambios_cuchillo", "cambios_perforador", "cambios_paquete", "cambios_empaque")
+HISTORY_RESULT_COLUMNS = ("unidades", "peso_kg", "eficiencia", "tiempo_efectivo", "tiempo_perdido", "valido")
+ROLLUP_PERIODS = {
+    "day": "date({col})",
+    "week": "date({col}, 'weekday 0', '-6 days')", # Lunes de la semana
+}
+ROLLUP_SCOPES = ("machine", "category") # Columnas de calc_history por las que se agrega
+
+
+def install_rollup_trigger(conn):
+    """Trigger que acumula cada fila de ``calc_history`` en sus agregados diarios/semanales."""
+    upserts = []
+    for period, start_sql in ROLLUP_PERIODS.items():
+        for scope in ROLLUP_SCOPES:
+            upserts.append(f"""
+                INSERT INTO calc_rollups (period, scope, key, period_start, calculations, unidades_sum,
+                                          peso_kg_sum, eficiencia_sum, unidades_min, unidades_max, invalidas)
+                VALUES ('{period}', '{scope}', new.{scope}, {start_sql.format(col='new.calculated_at')}, 1,
+                        new.unidades, new.peso_kg, new.eficiencia, new.unidades, new.unidades, NOT new.valido)
+                ON CONFLICT (period, scope, key, period_start) DO UPDATE SET
+                    calculations = calculations + 1,
+                    unidades_sum = unidades_sum + excluded.unidades_sum,
+                    peso_kg_sum = peso_kg_sum + excluded.peso_kg_sum,
+                    eficiencia_sum = eficiencia_sum + excluded.eficiencia_sum,
+                    unidades_min = min(unidades_min, excluded.unidades_min),
+                    unidades_max = max(unidades_max, excluded.unidades_max),
+                    invalidas = invalidas + excluded.invalidas;""")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS calc_history_rollup AFTER INSERT ON calc_history BEGIN
+            {''.join(upserts)}
+        END
+    """)
+
+
+def _migration_5_calc_history(conn):
+    """Historial de cálculos con agregados diarios/semanales por máquina y categoría."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS calc_history (
+            id INTEGER PRIMARY KEY,
+            calculated_at TEXT NOT NULL,
+            source TEXT NOT NULL,
+            run_id TEXT,
+            machine TEXT NOT NULL,
+            category TEXT NOT NULL,
+            snapshot_version INTEGER,
+            turno_horas REAL NOT NULL,
+            desayuno INTEGER NOT NULL,
+            almuerzo INTEGER NOT NULL,
+            {', '.join(f'{col} INTEGER NOT NULL DEFAULT 0' for col in HISTORY_SCENARIO_COLUMNS[3:])},
+            unidades REAL NOT NULL,
+            peso_kg REAL NOT NULL,
+            eficiencia REAL NOT NULL,
+            tiempo_efectivo REAL NOT NULL,
+            tiempo_perdido REAL NOT NULL,
+            valido INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_machine ON calc_history (machine, calculated_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_category ON calc_history (category, calculated_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_time ON calc_history (calculated_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS calc_rollups (
+            period TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            calculations INTEGER NOT NULL,
+            unidades_sum REAL NOT NULL,
+            peso_kg_sum REAL NOT NULL,
+            eficiencia_sum REAL NOT NULL,
+            unidades_min REAL NOT NULL,
+            unidades_max REAL NOT NULL,
+            invalidas INTEGER NOT NULL,
+            PRIMARY KEY (period, scope, key, period_start)
+        ) WITHOUT ROWID
+    """)
+    install_rollup_trigger(conn)
+    return None
+
+
+# Telemetría real (eventos de producción y paradas). Tampoco está versionada:
+# llega continuamente y no cambia la configuración de las máquinas.
+EVENT_KINDS = ("produccion", "parada")
+
+
+def install_actuals_trigger(conn):
+    """Trigger que acumula cada evento en el agregado de su máquina y turno (``production_actuals``)."""
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS production_events_actuals AFTER INSERT ON production_events BEGIN
+            INSERT INTO production_actuals (machine, shift, first_at, last_at, events, unidades, peso_kg,
+                                            unidades_sin_peso, paradas, parada_min)
+            VALUES (new.machine, new.shift, new.event_at, new.event_at, 1, new.unidades, coalesce(new.peso_kg, 0),
+                    CASE WHEN new.peso_kg IS NULL THEN new.unidades ELSE 0 END,
+                    new.kind = 'parada', CASE WHEN new.kind = 'parada' THEN new.minutos ELSE 0 END)
+            ON CONFLICT (machine, shift) DO UPDATE SET
+                first_at = min(first_at, excluded.first_at),
+                last_at = max(last_at, excluded.last_at),
+                events = events + 1,
+                unidades = unidades + excluded.unidades,
+                peso_kg = peso_kg + excluded.peso_kg,
+                unidades_sin_peso = unidades_sin_peso + excluded.unidades_sin_peso,
+                paradas = paradas + excluded.paradas,
+                parada_min = parada_min + excluded.parada_min;
+        END
+    """)
+
+
+def _migration_6_telemetry(conn):
+    """Eventos reales de producción, agregados por máquina y turno, y posiciones de ingesta."""
+    kinds = ", ".join(f"'{kind}'" for kind in EVENT_KINDS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS production_events (
+            id INTEGER PRIMARY KEY,
+            machine TEXT NOT NULL,
+            event_at TEXT NOT NULL,
+            shift TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ({kinds})),
+            unidades REAL NOT NULL DEFAULT 0,
+            peso_kg REAL,
+            minutos REAL NOT NULL DEFAULT 0,
+            source TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_machine ON production_events (machine, event_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS production_actuals (
+            machine TEXT NOT NULL,
+            shift TEXT NOT NULL,
+            first_at TEXT NOT NULL,
+            last_at TEXT NOT NULL,
+            events INTEGER NOT NULL,
+            unidades REAL NOT NULL,
+            peso_kg REAL NOT NULL,
+            unidades_sin_peso REAL NOT NULL, -- unidades de eventos sin peso: se convierten con peso_por_unidad
+            paradas INTEGER NOT NULL,
+            parada_min REAL NOT NULL,
+            PRIMARY KEY (machine, shift)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_offsets (
+            source TEXT PRIMARY KEY,
+            offset INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    install_actuals_trigger(conn)
+    return None
+
+
+# Constantes de capacidad de cada máquina, independientes del turno, derivadas de
+# sus parámetros efectivos con las mismas fórmulas que ``engine.compute_shift``.
+# Las mantiene al día un trigger por escritura (en ``machines`` y en
+# ``parameter_profiles``), así que las consultas de flota ("máx. kg/h de la
+# categoría X", "las N máquinas más productivas") son búsquedas en un índice.
+# Tampoco está en VERSIONED_TABLES: es un derivado de tablas que ya lo están.
+CAPACITY_COLUMNS = ("name", "category", "type", "interrupciones_fijas", "ratio_productivo",
+                    "unidades_por_minuto", "unidades_por_minuto_neto", "kg_por_minuto")
+CAPACITY_METRICS = ("kg_por_minuto", "unidades_por_minuto_neto") # Indexadas, también por categoría
+CAPACITY_SELECT_SQL = f"""
+    SELECT name, COALESCE(category, '{DEFAULT_CATEGORY}'), type,
+           COALESCE(calibracion, 0) + COALESCE(otros, 0),
+           COALESCE(ratio_productivo, 1.0),
+           COALESCE(unidades_por_minuto, 0),
+           COALESCE(unidades_por_minuto, 0) * COALESCE(ratio_productivo, 1.0),
+           CASE WHEN peso_por_unidad > 0
+                THEN COALESCE(unidades_por_minuto, 0) * COALESCE(ratio_productivo, 1.0) * peso_por_unidad / 1000.0
+                ELSE 0.0 END
+    FROM machines_effective"""
+# Columnas de 'machines' que intervienen en las constantes (editar la descripción no las recalcula)
+_CAPACITY_SOURCE_COLUMNS = ("name", "type", "category", "calibracion", "otros", "unidades_por_minuto",
+                            "peso_por_unidad", "ratio_productivo", "profile_id")
+
+
+def install_capacity_triggers(conn):
+    """Triggers que recalculan las filas de ``machine_capacity`` afectadas por cada escritura.
+
+    Borran e insertan en lugar de ``INSERT OR REPLACE``: dentro de un trigger la
+    política de conflicto la impone la sentencia externa (p. ej. el upsert de la
+    importación masiva), que anularía el REPLACE.
+    """
+    insert = f"INSERT INTO machine_capacity ({', '.join(CAPACITY_COLUMNS)}) {CAPACITY_SELECT_SQL}"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS machine_capacity_ins AFTER INSERT ON machines BEGIN
+            DELETE FROM machine_capacity WHERE name = new.name;
+            {insert} WHERE name = new.name;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS machine_capacity_upd AFTER UPDATE OF {', '.join(_CAPACITY_SOURCE_COLUMNS)} ON machines BEGIN
+            DELETE FROM machine_capacity WHERE name IN (old.name, new.name);
+            {insert} WHERE name = new.name;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS machine_capacity_del AFTER DELETE ON machines BEGIN
+            DELETE FROM machine_capacity WHERE name = old.name;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS machine_capacity_profile AFTER UPDATE ON parameter_profiles BEGIN
+            DELETE FROM machine_capacity WHERE name IN (SELECT name FROM machines WHERE profile_id = new.id);
+            {insert} WHERE profile_id = new.id;
+        END
+    """)
+
+
+def _migration_7_capacity(conn):
+    """Constantes de capacidad derivadas, materializadas e indexadas."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS machine_capacity (
+            name TEXT PRIMARY KEY,
+            category TEXT NOT NULL,
+            type TEXT NOT NULL,
+            interrupciones_fijas REAL NOT NULL,    -- calibracion + otros (min por turno)
+            ratio_productivo REAL NOT NULL,
+            unidades_por_minuto REAL NOT NULL,     -- por minuto productivo
+            unidades_por_minuto_neto REAL NOT NULL, -- por minuto neto disponible (x ratio_productivo)
+            kg_por_minuto REAL NOT NULL            -- por minuto neto disponible
+        ) WITHOUT ROWID
+    """)
+    for metric in CAPACITY_METRICS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_capacity_{metric} ON machine_capacity ({metric})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_capacity_category_{metric} ON machine_capacity (category, {metric})")
+    conn.execute("DELETE FROM machine_capacity")
+    conn.execute(f"INSERT INTO machine_capacity ({', '.join(CAPACITY_COLUMNS)}) {CAPACITY_SELECT_SQL}")
+    install_capacity_triggers(conn)
+    return None
+
+
+# Versión por fila y registro de cambios. ``row_version`` sube con cada escritura
+# de la máquina (o de su perfil): guardar con ``UPDATE_MACHINE_IF_VERSION_SQL``
+# detecta que otra sesión la cambió desde que se abrió el formulario. Cada cambio
+# de versión, alta o baja deja el nombre en ``machine_changes``, de modo que un
+# proceso con la flota en memoria lee sólo las filas cambiadas desde su última
+# ``seq`` (ver ``repository.py``). El registro conserva las últimas
+# ``CHANGE_LOG_SIZE`` entradas; quien se quede más atrás recarga la tabla entera.
+CHANGE_LOG_SIZE = 20000
+
+
+def install_row_version_triggers(conn):
+    """Triggers de ``row_version`` y del registro de cambios ``machine_changes``.
+
+    Las sentencias de la aplicación ya incrementan ``row_version``; el trigger
+    lo hace por las que no (scripts, otros programas), y al cambiar un perfil
+    sube la versión de todas sus máquinas: sus parámetros efectivos cambiaron.
+    """
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS machines_row_version AFTER UPDATE ON machines
+        WHEN new.row_version = old.row_version BEGIN
+            UPDATE machines SET row_version = old.row_version + 1 WHERE rowid = new.rowid;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS parameter_profiles_row_version AFTER UPDATE ON parameter_profiles BEGIN
+            UPDATE machines SET row_version = row_version + 1 WHERE profile_id = new.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS machine_changes_ins AFTER INSERT ON machines BEGIN
+            INSERT INTO machine_changes (name) VALUES (new.name);
+        END
+    """)
+    # Se registra una vez por cambio de versión; un renombrado registra ambos nombres
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS machine_changes_upd AFTER UPDATE ON machines
+        WHEN new.row_version <> old.row_version BEGIN
+            INSERT INTO machine_changes (name) VALUES (old.name);
+            INSERT INTO machine_changes (name) SELECT new.name WHERE new.name <> old.name;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS machine_changes_del AFTER DELETE ON machines BEGIN
+            INSERT INTO machine_changes (name) VALUES (old.name);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS machine_changes_prune AFTER INSERT ON machine_changes BEGIN
+            DELETE FROM machine_changes WHERE seq <= new.seq - {CHANGE_LOG_SIZE};
+        END
+    """)
+
+
+def _migration_8_row_versions(conn):
+    """Versión por fila en ``machines`` y registro de cambios para refrescos incrementales."""
+    if "row_version" not in _table_columns(conn, "machines"):
+        conn.execute("ALTER TABLE machines ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1")
+    _create_effective_view(conn, ("row_version",))
+    # AUTOINCREMENT: una seq nunca se reutiliza, aunque se poden las entradas antiguas
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS machine_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL
+        )
+    """)
+    install_row_version_triggers(conn)
+    return None
+
+
+def install_change_counter(conn):
+    """Crea (si faltan) la tabla ``db_meta`` y los triggers del contador de cambios."""
+    conn.execute("CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute(f"INSERT OR IGNORE INTO db_meta (key, value) VALUES ('{VERSION_KEY}', 0)")
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in VERSIONED_TABLES:
+        if table not in existing:
+            continue
+        for suffix, event in (("ins", "INSERT"), ("upd", "UPDATE"), ("del", "DELETE")):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table}
+                BEGIN UPDATE db_meta SET value = value + 1 WHERE key = '{VERSION_KEY}'; END
+            """)
+
+
+def _migration_9_type_specific_params(conn):
+    """Los parámetros que el tipo de máquina no tiene dejan de heredarse del perfil."""
+    not_inherited = " OR ".join(
+        f"(m.{key} IS NULL AND p.{key} IS NOT NULL AND m.type NOT IN ({_sql_list(types)}))"
+        for key, types in TYPE_SPECIFIC_PARAMS.items()
+    )
+    affected = conn.execute(f"""
+        SELECT COUNT(*) FROM machines m JOIN parameter_profiles p ON p.id = m.profile_id WHERE {not_inherited}
+    """).fetchone()[0]
+    _create_effective_view(conn, ("row_version",))
+    if affected:
+        return f"{affected} máquinas dejan de heredar de su perfil parámetros que su tipo no tiene"
+    return None
+
+
+MIGRATIONS = (
+    (1, _migration_1_base),
+    (2, _migration_2_typed_params),
+    (3, _migration_3_profiles),
+    (4, _migration_4_search_index),
+    (5, _migration_5_calc_history),
+    (6, _migration_6_telemetry),
+    (7, _migration_7_capacity),
+    (8, _migration_8_row_versions),
+    (9, _migration_9_type_specific_params),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Aplica las migraciones pendientes y devuelve las descripciones a reportar.
+
+    ``conn`` debe estar en modo autocommit (como las conexiones de ``plas2.db``).
+    Tras cada migración se reinstalan los triggers del contador de cambios,
+    porque reconstruir una tabla los elimina.
+    """
+    applied = []
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return applied
+    for version, migration in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version: # Otro proceso la aplicó mientras esperábamos
+                conn.execute("COMMIT")
+                continue
+            description = migration(conn)
+            install_change_counter(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if description:
+            applied.append(description)
+    return applied
@@ -0,0 +1,192 @@
+"""Búsqueda incremental de máquinas sobre los índices FTS5 de ``schema.SEARCH_INDEXES``.
+
+Los índices los mantienen los triggers de ``machines`` (ver
+``schema.install_search_index_triggers``), así que cualquier alta, edición,
+baja o importación masiva queda indexada en la misma transacción.
+
+Para el selector con búsqueda mientras se escribe, cada término se busca como
+prefijo y las consultas no ordenan por ``rank``: así FTS5 puede parar en
+cuanto tiene ``limit`` resultados, en vez de puntuar todas las coincidencias
+(con prefijos cortos pueden ser decenas de miles). Primero se devuelven las
+coincidencias en el nombre y después las de categoría/descripción. Si aún no
+hay ``limit`` resultados, se buscan las máquinas en las que cada término está
+en algún campo, no necesariamente el mismo ("extrusora norte": nombre y
+categoría), incluido el nombre del perfil (como ``fleet.SEARCH_FIELDS``).
+
+Los prefijos más largos que el mayor índice de prefijo se buscan por sus
+primeros caracteres y se comprueban en Python: un prefijo sin índice obliga a
+FTS5 a fusionar las listas de todos los términos que empiezan por él antes de
+devolver la primera fila.
+"""
+
+import re
+import sqlite3
+import unicodedata
+
+from .schema import SEARCH_INDEXES, SEARCH_PREFIX_LENGTHS
+
+MAX_PREFIX = max(SEARCH_PREFIX_LENGTHS)
+CROSS_FIELD_PROBE = 100 # Coincidencias por campo que se cuentan para elegir el término más selectivo
+
+_TERM_RE = re.compile(r"[^\W_]+", re.UNICODE) # Mismos separadores que el tokenizador unicode61
+
+
+def normalize(text):
+    """Minúsculas y sin diacríticos, como ``unicode61 remove_diacritics 2``."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def search_terms(text):
+    """Términos buscables del texto del usuario, ya normalizados."""
+    return _TERM_RE.findall(normalize(text))
+
+
+def build_match_query(terms):
+    """Consulta FTS5 de prefijos (AND entre términos), recortando cada término a ``MAX_PREFIX``.
+
+    Los términos van entre comillas: el texto del usuario nunca se interpreta
+    como operadores FTS5.
+    """
+    return " ".join(f'"{term[:MAX_PREFIX]}"*' for term in terms)
+
+
+def _matches_long_terms(values, long_terms):
+    """Si cada término es prefijo de algún token de ``values``."""
+    tokens = [token for value in values for token in _TERM_RE.findall(normalize(value))]
+    return all(any(token.startswith(term) for token in tokens) for term in long_terms)
+
+
+def _search_index(conn, index, terms, limit, exclude):
+    columns = SEARCH_INDEXES[index]
+    long_terms = [term for term in terms if len(term) > MAX_PREFIX]
+    sql = (f"SELECT m.name, {', '.join(f'm.{col}' for col in columns)} "
+           f"FROM {index} f JOIN machines m ON m.rowid = f.rowid WHERE {index} MATCH ?")
+    found = []
+    # Se itera el cursor y se abandona al llegar a ``limit``: SQLite no calcula más filas
+    for name, *values in conn.execute(sql, (build_match_query(terms),)):
+        if name in exclude or (long_terms and not _matches_long_terms(values, long_terms)):
+            continue
+        found.append(name)
+        if len(found) >= limit:
+            break
+    return found
+
+
+def _term_sources(term, profile_ids):
+    """Consultas ``(sql, parámetros)`` de los rowid con ``term`` en cada campo: los índices y el perfil."""
+    sources = [(f"SELECT rowid FROM {index} WHERE {index} MATCH ?", (build_match_query([term]),)) for index in SEARCH_INDEXES]
+    if profile_ids:
+        sources.append((f"SELECT rowid FROM machines WHERE profile_id IN ({', '.join('?' for _ in profile_ids)})",
+                        tuple(profile_ids)))
+    return sources
+
+
+def _search_across_fields(conn, terms, limit, exclude):
+    """Máquinas en las que cada término aparece en algún campo de ``fleet.SEARCH_FIELDS``.
+
+    Se cuentan las coincidencias de cada término hasta ``CROSS_FIELD_PROBE``
+    (si alguno no tiene ninguna no hay resultados) y se recorren las filas del
+    más selectivo, comprobando el resto de términos en Python, hasta tener
+    ``limit`` resultados.
+    """
+    profiles = {pid: _TERM_RE.findall(normalize(name)) for pid, name in conn.execute("SELECT id, name FROM parameter_profiles")}
+    best = None
+    for term in dict.fromkeys(terms):
+        profile_ids = [pid for pid, tokens in profiles.items() if any(token.startswith(term[:MAX_PREFIX]) for token in tokens)]
+        sources = _term_sources(term, profile_ids)
+        matches = sum(conn.execute(f"SELECT COUNT(*) FROM ({sql} LIMIT {CROSS_FIELD_PROBE})", params).fetchone()[0]
+                      for sql, params in sources)
+        if not matches:
+            return []
+        key = (matches, -len(term)) # A igualdad, el término más largo suele ser el más selectivo
+        if best is None or key < best[0]:
+            best = (key, sources)
+    found, seen = [], set()
+    for sql, params in best[1]:
+        cursor = conn.execute(f"""
+            SELECT m.rowid, m.name, m.category, m.description, p.name
+            FROM ({sql}) s JOIN machines m ON m.rowid = s.rowid LEFT JOIN parameter_profiles p ON p.id = m.profile_id
+        """, params)
+        for rowid, name, *values in cursor:
+            if rowid in seen or name in exclude:
+                continue
+            seen.add(rowid)
+            if _matches_long_terms([name, *values], terms):
+                found.append(name)
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def search_machines(conn, text, limit=20):
+    """Devuelve hasta ``limit`` nombres de máquina que coinciden con ``text``.
+
+    Primero las coincidencias en el nombre; si no llegan a ``limit``, se
+    completan con coincidencias en categoría o descripción y, después, con las
+    máquinas cuyos términos están repartidos entre campos (o en su perfil).
+    """
+    terms = search_terms(text)
+    names = []
+    if not terms:
+        return names
+    for index in SEARCH_INDEXES:
+        names.extend(_search_index(conn, index, terms, limit - len(names), set(names)))
+        if len(names) >= limit:
+            return names
+    names.extend(_search_across_fields(conn, terms, limit - len(names), set(names)))
+    return names
+
+
+def rebuild_index(conn):
+    """Reconstruye los índices desde ``machines`` (p. ej. tras un VACUUM, que puede renumerar rowids)."""
+    for index in SEARCH_INDEXES:
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+
+
+def check_index(conn):
+    """Verifica que los índices coinciden con la tabla; lanza ``sqlite3.DatabaseError`` si no.
+
+    Es la comprobación completa de FTS5 (recorre todo el índice: ~1 s con 100k
+    máquinas); al arrancar basta con ``index_in_sync``.
+    """
+    for index in SEARCH_INDEXES:
+        conn.execute(f"INSERT INTO {index} ({index}, rank) VALUES ('integrity-check', 1)")
+
+
+def _rowid_summary(conn, table, column):
+    # Subconsultas separadas: así SQLite resuelve cada agregado sin recorrer la tabla
+    return conn.execute(f"SELECT (SELECT COUNT(*) FROM {table}), (SELECT MIN({column}) FROM {table}), "
+                        f"(SELECT MAX({column}) FROM {table})").fetchone()
+
+
+def index_in_sync(conn):
+    """Comprobación barata (<1 ms) de que los índices cubren las mismas filas que ``machines``.
+
+    Compara el número de filas y el rowid mínimo y máximo con la tabla
+    ``*_docsize`` de cada índice: un VACUUM que renumera los rowid los cambia.
+    Basta una transacción de lectura.
+    """
+    machines = _rowid_summary(conn, "machines", "rowid")
+    return all(_rowid_summary(conn, f"{index}_docsize", "id") == machines for index in SEARCH_INDEXES)
+
+
+def ensure_index(conn, thorough=False):
+    """Reconstruye los índices si no coinciden con ``machines``; devuelve si se reconstruyeron.
+
+    ``conn`` debe estar dentro de una transacción de escritura. Un VACUUM puede
+    renumerar los rowid de ``machines`` (su clave primaria es TEXT) y dejar los
+    índices de contenido externo apuntando a otras filas. Con ``thorough`` se
+    usa ``check_index`` en lugar de ``index_in_sync`` (p. ej. en ``migrate``).
+    """
+    if not thorough:
+        if index_in_sync(conn):
+            return False
+    else:
+        try:
+            check_index(conn)
+            return False
+        except sqlite3.DatabaseError:
+            pass
+    rebuild_index(conn)
+    return True
@@ -0,0 +1,156 @@
+"""Barrido de escenarios y sensibilidad sobre los parámetros del turno.
+
+Una ``SweepGrid`` define valores para cada eje (duración del turno, comidas y
+nº de cada evento variable) y representa su producto cartesiano completo. Los
+escenarios no se materializan de golpe: ``run_sweep`` recorre la rejilla por
+trozos de índices planos, los convierte en un ``ScenarioBatch`` con
+``np.unravel_index`` y los calcula con ``engine.compute_shift`` contra todas
+las máquinas a la vez. Por cada punto se guarda el total de la selección
+(unidades y kg sumados, eficiencia media), así que la memoria es la de la
+rejilla y no la de ``máquinas × rejilla``.
+
+Los trozos se reparten en un pool de hilos (NumPy libera el GIL en las
+operaciones sobre arrays). ``tornado`` y ``heatmap`` son cortes de la rejilla
+ya calculada alrededor de un escenario base.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import engine
+
+AXES = ("turno_horas", "desayuno", "almuerzo") + engine.EVENT_KEYS
+METRICS = ("unidades", "peso_kg", "eficiencia")
+MAX_POINTS = 5_000_000
+CHUNK_ELEMENTS = 500_000 # Pares máquina × escenario por trozo (acota la memoria intermedia)
+
+
+@dataclass
+class SweepGrid:
+    """Valores de cada eje; el barrido es su producto cartesiano en el orden de ``AXES``."""
+    values: dict # eje -> np.ndarray 1D
+
+    @classmethod
+    def from_ranges(cls, **axes):
+        """Construye la rejilla; los ejes omitidos quedan fijos (turno 8 h, con comidas, 0 eventos)."""
+        unknown = set(axes) - set(AXES)
+        if unknown:
+            raise ValueError(f"Ejes desconocidos: {', '.join(sorted(unknown))}")
+        defaults = {"turno_horas": [8.0], "desayuno": [True], "almuerzo": [True]}
+        values = {}
+        for axis in AXES:
+            raw = axes.get(axis, defaults.get(axis, [0]))
+            array = np.unique(np.atleast_1d(np.asarray(raw, dtype=bool if axis in ("desayuno", "almuerzo") else float)))
+            if array.size == 0:
+                raise ValueError(f"El eje '{axis}' no tiene valores")
+            values[axis] = array
+        grid = cls(values)
+        if grid.size > MAX_POINTS:
+            raise ValueError(f"La rejilla tiene {grid.size:,} puntos (máximo {MAX_POINTS:,})")
+        return grid
+
+    @property
+    def shape(self):
+        return tuple(len(self.values[axis]) for axis in AXES)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def varying_axes(self):
+        return tuple(axis for axis in AXES if len(self.values[axis]) > 1)
+
+    def scenarios(self, start, stop):
+        """``ScenarioBatch`` de los puntos con índice plano en ``[start, stop)``."""
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        columns = {axis: self.values[axis][idx] for axis, idx in zip(AXES, index)}
+        eventos = {key: columns[key] for key in engine.EVENT_KEYS}
+        return engine.ScenarioBatch.from_arrays(columns["turno_horas"], columns["desayuno"], columns["almuerzo"], **eventos)
+
+    def nearest_index(self, base):
+        """Índice de rejilla más cercano a un escenario base (dict con valores por eje)."""
+        index = []
+        for axis in AXES:
+            values = self.values[axis].astype(float)
+            target = float(base.get(axis, values[0]))
+            index.append(int(np.abs(values - target).argmin()))
+        return tuple(index)
+
+
+@dataclass
+class SweepResult:
+    """Totales de la selección en cada punto de la rejilla; cada métrica tiene ``grid.shape``."""
+    grid: SweepGrid
+    machines: int
+    unidades: np.ndarray
+    peso_kg: np.ndarray
+    eficiencia: np.ndarray # % medio entre máquinas
+
+
+def run_sweep(configs, grid, progress=None, max_workers=None):
+    """Calcula todos los puntos de ``grid`` para las máquinas ``configs``.
+
+    ``progress(hechos, total)`` se llama tras cada trozo (desde los hilos del pool).
+    """
+    machines = engine.MachineBatch.from_configs(configs)
+    if not len(machines):
+        raise ValueError("No hay máquinas para el barrido")
+    total = grid.size
+    chunk = max(1, CHUNK_ELEMENTS // len(machines))
+    bounds = [(start, min(start + chunk, total)) for start in range(0, total, chunk)]
+    out = {metric: np.empty(total) for metric in METRICS}
+    done = [0]
+
+    def work(bound):
+        start, stop = bound
+        res = engine.compute_shift(machines, grid.scenarios(start, stop))
+        out["unidades"][start:stop] = res.unidades.sum(axis=0)
+        out["peso_kg"][start:stop] = res.peso_kg.sum(axis=0)
+        out["eficiencia"][start:stop] = res.eficiencia.mean(axis=0)
+        done[0] += stop - start # Sólo informativo: una carrera aquí no afecta a los resultados
+        if progress:
+            progress(done[0], total)
+
+    workers = min(len(bounds), max_workers or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(work, bounds)) # list(): propaga excepciones de los hilos
+    return SweepResult(grid, len(machines), *(out[metric].reshape(grid.shape) for metric in METRICS))
+
+
+def tornado(result, metric, base_index):
+    """Sensibilidad de ``metric`` a cada eje variable, con el resto fijo en ``base_index``.
+
+    Devuelve ``[{axis, low_value, high_value, low, high, base}]`` (valor de la
+    métrica con el eje en su mínimo y en su máximo) ordenado de mayor a menor
+    rango, como las barras de un gráfico de tornado.
+    """
+    values = getattr(result, metric)
+    base = float(values[base_index])
+    rows = []
+    for position, axis in enumerate(AXES):
+        axis_values = result.grid.values[axis]
+        if len(axis_values) < 2:
+            continue
+        index = list(base_index)
+        index[position] = slice(None)
+        line = values[tuple(index)]
+        rows.append({"axis": axis, "low_value": axis_values[0].item(), "high_value": axis_values[-1].item(),
+                     "low": float(line[0]), "high": float(line[-1]), "base": base})
+    rows.sort(key=lambda row: abs(row["high"] - row["low"]), reverse=True)
+    return rows
+
+
+def heatmap(result, metric, x_axis, y_axis, base_index):
+    """Matriz ``(len(y), len(x))`` de ``metric`` variando dos ejes, con el resto fijo en ``base_index``."""
+    if x_axis == y_axis:
+        raise ValueError("Los ejes del mapa de calor deben ser distintos")
+    index = list(base_index)
+    x_pos, y_pos = AXES.index(x_axis), AXES.index(y_axis)
+    index[x_pos] = slice(None)
+    index[y_pos] = slice(None)
+    matrix = getattr(result, metric)[tuple(index)]
+    return matrix if y_pos < x_pos else matrix.T # Tras el corte quedan en el orden de AXES
@@ -0,0 +1,368 @@
+"""Ingesta de telemetría real (producción y paradas) y comparación con las estimaciones.
+
+Cada evento es una línea CSV (con cabecera) o JSONL con los campos::
+
+    machine, event_at, kind, unidades, peso_kg, minutos, shift
+
+``kind`` es ``produccion`` (``unidades`` y, opcionalmente, ``peso_kg``) o
+``parada`` (``minutos`` de parada). ``shift`` identifica el turno; si falta se
+usa la fecha de ``event_at``.
+
+Un único hilo escritor (``Ingestor``) agrupa los eventos de todas las fuentes
+y los inserta en transacciones de hasta ``BATCH_SIZE`` filas; el trigger
+``production_events_actuals`` mantiene en la misma transacción los agregados
+por máquina y turno que lee la calculadora. Con WAL las lecturas de la
+aplicación no esperan a las escrituras.
+
+Fuentes:
+
+* ``DirectoryTailer``: sigue los ``*.csv``/``*.jsonl`` de un directorio. La
+  posición leída de cada fichero se guarda en ``ingest_offsets`` en la misma
+  transacción que sus eventos, así que al reiniciar no se pierde ni se duplica
+  nada.
+* ``SocketSource``: servidor TCP local que acepta líneas JSONL (p. ej. de un
+  simulador). Sin posiciones: lo que no se haya escrito al parar se pierde.
+"""
+
+import csv
+import io
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from .db import get_pool
+from .schema import EVENT_KINDS
+
+EVENT_FIELDS = ("machine", "event_at", "kind", "unidades", "peso_kg", "minutos", "shift")
+BATCH_SIZE = 5000
+FLUSH_INTERVAL = 0.5 # s: máximo que un evento espera en memoria
+POLL_INTERVAL = 0.5 # s entre pasadas por el directorio
+READ_BYTES = 1024 * 1024 # Bytes leídos de un fichero por pasada
+FINGERPRINT_BYTES = 4096 # Primera línea (cabecera) con la que se reconoce un fichero reemplazado
+QUEUE_BATCHES = 64 # Lotes pendientes antes de frenar a las fuentes
+ACTUAL_SHIFTS = 30 # Turnos recientes que se promedian en la calculadora
+
+INSERT_EVENT_SQL = (
+    "INSERT INTO production_events (machine, event_at, shift, kind, unidades, peso_kg, minutos, source) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+UPSERT_OFFSET_SQL = (
+    "INSERT INTO ingest_offsets (source, offset, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (source) DO UPDATE SET offset = excluded.offset, updated_at = excluded.updated_at"
+)
+ACTUALS_COLUMNS = ("shift", "first_at", "last_at", "events", "unidades", "peso_kg", "unidades_sin_peso",
+                   "paradas", "parada_min")
+ACTUALS_SQL = f"""
+    SELECT {', '.join(ACTUALS_COLUMNS)} FROM production_actuals
+    WHERE machine = ? ORDER BY last_at DESC LIMIT ?
+"""
+
+
+class InvalidEvent(ValueError):
+    pass
+
+
+def _number(record, key, required=False):
+    value = record.get(key)
+    if value is None or value == "":
+        if required:
+            raise InvalidEvent(f"falta '{key}'")
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise InvalidEvent(f"'{key}' no es numérico: {value!r}") from None
+    if value < 0:
+        raise InvalidEvent(f"'{key}' no puede ser negativo")
+    return value
+
+
+def parse_event(record, source=None):
+    """Valida un evento (dict) y devuelve la tupla para ``INSERT_EVENT_SQL``."""
+    machine = str(record.get("machine") or "").strip()
+    if not machine:
+        raise InvalidEvent("falta 'machine'")
+    event_at = str(record.get("event_at") or "").strip().replace("T", " ")[:19]
+    try:
+        datetime.fromisoformat(event_at)
+    except ValueError:
+        raise InvalidEvent(f"'event_at' no es una fecha ISO: {record.get('event_at')!r}") from None
+    kind = str(record.get("kind") or "").strip().lower()
+    if kind not in EVENT_KINDS:
+        raise InvalidEvent(f"'kind' debe ser {' o '.join(EVENT_KINDS)}: {record.get('kind')!r}")
+    unidades = _number(record, "unidades", required=kind == "produccion") or 0.0
+    minutos = _number(record, "minutos", required=kind == "parada") or 0.0
+    shift = str(record.get("shift") or "").strip() or event_at[:10]
+    return (machine, event_at, shift, kind, unidades, _number(record, "peso_kg"), minutos, source)
+
+
+def parse_lines(lines, fmt, header=None, source=None):
+    """Parsea líneas ``csv`` (con ``header``) o ``jsonl``; devuelve ``(filas, errores)``.
+
+    En ``csv`` las líneas deben conservar su salto de línea (p. ej. un
+    ``io.StringIO(texto, newline="")``) para no alterar los campos entre comillas.
+    """
+    rows, errors = [], []
+    if fmt == "csv":
+        records = (dict(zip(header, values)) for values in csv.reader(lines))
+    else:
+        def load(line):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                return None
+            return data if isinstance(data, dict) else None
+        records = (load(line) for line in lines if line.strip())
+    for record in records:
+        try:
+            if record is None:
+                raise InvalidEvent("línea JSON inválida")
+            rows.append(parse_event(record, source))
+        except InvalidEvent as e:
+            errors.append(f"{source or 'evento'}: {e}")
+    return rows, errors
+
+
+class Ingestor:
+    """Escritor único: agrupa lo que envían las fuentes y lo inserta en transacciones por lotes."""
+
+    def __init__(self, db_path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.pool = get_pool(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=QUEUE_BATCHES)
+        self._stop = threading.Event()
+        self._thread = None
+        self.events = 0
+        self.batches = 0
+        self.rejected = 0
+        self.errors = deque(maxlen=20) # Últimos rechazos, para informar
+        self._errors_lock = threading.Lock() # ``submit`` se llama desde varios hilos (conexiones del socket)
+        self.failure = None # Error de BD que detuvo al escritor
+
+    def submit(self, rows, errors=(), offset=None):
+        """Encola eventos ya parseados; ``offset=(fuente, posición)`` se guarda con ellos."""
+        if errors:
+            with self._errors_lock:
+                self.rejected += len(errors)
+                self.errors.extend(errors)
+        if rows or offset:
+            while True: # Si el escritor falla, no dejar a la fuente bloqueada con la cola llena
+                if self.failure is not None:
+                    raise self.failure
+                try:
+                    self._queue.put((rows, offset), timeout=self.flush_interval)
+                    return
+                except queue.Full:
+                    pass
+
+    def _write(self, rows, offsets):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def write(conn):
+            conn.executemany(INSERT_EVENT_SQL, rows)
+            conn.executemany(UPSERT_OFFSET_SQL, [(source, offset, now) for source, offset in offsets.items()])
+        self.pool.run_write(write)
+        self.events += len(rows)
+        self.batches += 1
+
+    def _run(self):
+        rows, offsets = [], {}
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                new_rows, offset = item
+                rows.extend(new_rows)
+                if offset:
+                    offsets[offset[0]] = offset[1]
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            stopping = self._stop.is_set() and self._queue.empty()
+            due = item is None or stopping or len(rows) >= self.batch_size or time.monotonic() >= deadline
+            if (rows or offsets) and due:
+                try:
+                    self._write(rows, offsets)
+                except Exception as e: # El hilo no debe morir en silencio
+                    self.failure = e
+                    return
+                rows, offsets, deadline = [], {}, None
+            if stopping and not rows:
+                return
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="plas2-ingest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        self._stop.set()
+        self._queue.put(([], None)) # Despertar al escritor
+        self._thread.join()
+        if self.failure is not None:
+            raise self.failure
+
+
+class DirectoryTailer:
+    """Sigue los ficheros ``*.csv``/``*.jsonl`` de ``directory`` desde la última posición guardada."""
+
+    FORMATS = {".csv": "csv", ".jsonl": "jsonl"}
+
+    def __init__(self, ingestor, directory, poll_interval=POLL_INTERVAL):
+        self.ingestor = ingestor
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._headers = {}
+        self._files = {} # fuente -> (dispositivo, inodo, primera línea) del fichero que se está leyendo
+        with ingestor.pool.read() as conn:
+            self._offsets = dict(conn.execute("SELECT source, offset FROM ingest_offsets"))
+
+    def _replaced(self, source, f, stat):
+        """Si ``f`` ya no es el fichero que se leía: truncado, rotado (otro inodo) o reescrito (otra primera línea)."""
+        if stat.st_size < self._offsets.get(source, 0):
+            return True
+        known = self._files.get(source)
+        return known is not None and (known[:2] != (stat.st_dev, stat.st_ino) or
+                                      f.readline(FINGERPRINT_BYTES) != known[2])
+
+    @staticmethod
+    def _complete(data, fmt):
+        """Bytes de ``data`` que forman registros completos (en CSV, un salto entre comillas no cierra el registro)."""
+        if fmt != "csv":
+            return data.rfind(b"\n") + 1
+        end = pos = quotes = 0
+        while True:
+            newline = data.find(b"\n", pos)
+            if newline < 0:
+                return end
+            quotes += data.count(b'"', pos, newline)
+            pos = newline + 1
+            if quotes % 2 == 0:
+                end = pos
+
+    def _read_file(self, path, fmt):
+        """Lee los registros completos nuevos de ``path``; devuelve si queda más por leer."""
+        source = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self._files.get(source)
+        if known and known[:2] == (stat.st_dev, stat.st_ino) and stat.st_size == self._offsets.get(source, 0):
+            return False
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno()) # El que se abrió, aunque lo hayan cambiado tras el ``stat``
+            if self._replaced(source, f, stat): # Empezar de nuevo, cabecera incluida
+                self._offsets[source] = 0
+                self._headers.pop(source, None)
+                self._files.pop(source, None)
+            f.seek(0)
+            first = f.readline() if fmt == "csv" else f.readline(FINGERPRINT_BYTES)
+            if not first.endswith(b"\n") and (fmt == "csv" or len(first) < FINGERPRINT_BYTES):
+                return False # Primera línea (cabecera) aún incompleta
+            self._files[source] = (stat.st_dev, stat.st_ino, first[:FINGERPRINT_BYTES])
+            offset = self._offsets.get(source, 0)
+            if fmt == "csv":
+                if source not in self._headers:
+                    self._headers[source] = next(csv.reader([first.decode("utf-8-sig")]))
+                offset = max(offset, len(first))
+            f.seek(offset)
+            data = f.read(READ_BYTES)
+        end = self._complete(data, fmt)
+        if not end:
+            return False # Sólo hay un registro a medio escribir
+        text = data[:end].decode("utf-8", errors="replace")
+        lines = io.StringIO(text, newline="") if fmt == "csv" else text.splitlines()
+        rows, errors = parse_lines(lines, fmt, self._headers.get(source), os.path.basename(path))
+        self._offsets[source] = offset + end
+        self.ingestor.submit(rows, errors, (source, offset + end))
+        return offset + end < stat.st_size
+
+    def poll(self):
+        """Una pasada por el directorio; devuelve si algún fichero tiene más datos pendientes."""
+        pending = False
+        for name in sorted(os.listdir(self.directory)):
+            fmt = self.FORMATS.get(os.path.splitext(name)[1].lower())
+            path = os.path.join(self.directory, name)
+            if fmt and os.path.isfile(path):
+                pending |= self._read_file(path, fmt)
+        return pending
+
+    def run(self, stop_event=None, once=False):
+        """Sigue el directorio hasta ``stop_event``; con ``once`` termina al ponerse al día."""
+        while stop_event is None or not stop_event.is_set():
+            if self.ingestor.failure is not None:
+                return
+            if not self.poll():
+                if once:
+                    return
+                time.sleep(self.poll_interval)
+
+
+class _EventHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        ingestor = self.server.ingestor
+        source = f"socket:{self.client_address[0]}"
+        pending = b""
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                break
+            pending += data
+            end = pending.rfind(b"\n") + 1
+            if end:
+                rows, errors = parse_lines(pending[:end].decode("utf-8", errors="replace").splitlines(),
+                                           "jsonl", source=source)
+                ingestor.submit(rows, errors)
+                pending = pending[end:]
+        if pending.strip():
+            ingestor.submit(*parse_lines([pending.decode("utf-8", errors="replace")], "jsonl", source=source))
+
+
+class SocketSource(socketserver.ThreadingTCPServer):
+    """Servidor TCP local: cada conexión envía eventos JSONL, uno por línea."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, ingestor, host="127.0.0.1", port=8790):
+        super().__init__((host, port), _EventHandler)
+        self.ingestor = ingestor
+
+
+def actuals(conn, machine, shifts=ACTUAL_SHIFTS):
+    """Agregados reales de los últimos ``shifts`` turnos de ``machine`` (el más reciente primero)."""
+    return [dict(zip(ACTUALS_COLUMNS, row)) for row in conn.execute(ACTUALS_SQL, (machine, shifts))]
+
+
+def compare(estimate, shifts, peso_por_unidad):
+    """Compara una estimación (``engine.compute_single``) con la media real por turno.
+
+    Los kg de eventos sin peso se calculan con ``peso_por_unidad`` (gramos). La
+    eficiencia real se deriva de la estimada: en el modelo es proporcional a
+    las unidades, así que ``eficiencia_real = eficiencia * unidades_real / unidades``.
+    Devuelve ``None`` si no hay turnos registrados.
+    """
+    if not shifts:
+        return None
+    n = len(shifts)
+    unidades = sum(s["unidades"] for s in shifts) / n
+    peso_kg = sum(s["peso_kg"] + s["unidades_sin_peso"] * peso_por_unidad / 1000 for s in shifts) / n
+    eficiencia = estimate["eficiencia"] * unidades / estimate["unidades"] if estimate["unidades"] > 0 else 0.0
+    return {"turnos": n, "unidades": unidades, "peso_kg": peso_kg, "eficiencia": eficiencia,
+            "parada_min": sum(s["parada_min"] for s in shifts) / n, "ultimo_evento": shifts[0]["last_at"]}
+
+
+def report(ingestor, out=sys.stderr):
+    """Imprime el progreso de la ingesta y los rechazos nuevos."""
+    while ingestor.errors:
+        print(f"Rechazado: {ingestor.errors.popleft()}", file=out)
+    print(f"Eventos: {ingestor.events:,} en {ingestor.batches:,} lotes; rechazados: {ingestor.rejected:,}", file=out)